@@ -0,0 +1,136 @@
+# benchmarks/bench_face_stream.py
+"""
+Throughput of the /face/stream WebSocket on a synthetic webcam clip.
+
+A face photo from images/ drifts across a 640x480 (or --resolution)
+background. Frames are sent at --fps for --seconds while the replies are
+read concurrently. The report gives the processed frame rate, dropped
+frames, per-frame processing latency and how many embeddings + searches
+ran - one per tracked face, against one per frame for /face/search.
+
+Usage (from the backend folder):
+    python benchmarks/bench_face_stream.py
+    python benchmarks/bench_face_stream.py --fps 30 --seconds 10 --resolution 1280x720 --output stream.json
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)  # main.py resolves images/ and documents.db relatively
+os.environ.setdefault("GROQ_API_KEY", "benchmark")  # main.py refuses to import without it
+
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+
+import main
+from deepface_service import face_search_service
+
+
+def make_clip(width: int, height: int, count: int, seed: int = 0):
+    """`count` JPEG frames of one face moving slowly over a noisy background"""
+    samples = sorted(glob.glob(os.path.join(BACKEND_DIR, "images", "**", "*.jpg"), recursive=True))
+    if not samples:
+        raise SystemExit("No face photo in images/ to build the clip from")
+    face = cv2.imread(samples[seed % len(samples)])
+    face_h = height // 2
+    face = cv2.resize(face, (int(face.shape[1] * face_h / face.shape[0]), face_h))
+
+    rng = np.random.default_rng(seed)
+    background = np.full((height, width, 3), (90, 110, 120), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        img = cv2.add(background, rng.integers(0, 8, background.shape, dtype=np.uint8))
+        # Back and forth over the free width, a few pixels per frame
+        span = width - face.shape[1]
+        x = int(abs((i * 4) % (2 * span) - span)) if span > 0 else 0
+        y = (height - face_h) // 2
+        img[y:y + face_h, x:x + face.shape[1]] = face
+        success, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        frames.append(encoded.tobytes())
+    return frames
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="/face/stream throughput")
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--resolution", default="640x480")
+    parser.add_argument("--output", help="write the JSON report to this path")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.resolution.split("x"))
+    frames = make_clip(width, height, int(args.fps * args.seconds))
+    print(f"📹 {len(frames)} frames {width}x{height} at {args.fps:g} fps")
+
+    # Cost of the per-request path, for comparison: one embedding per frame
+    start = time.perf_counter()
+    face_search_service.extract_embedding_from_bytes(frames[0])
+    per_frame_embedding_ms = (time.perf_counter() - start) * 1000
+
+    messages = []
+    with TestClient(main.app) as client, client.websocket_connect("/face/stream") as ws:
+        def sender():
+            interval = 1 / args.fps
+            next_at = time.perf_counter()
+            for frame in frames:
+                ws.send_bytes(frame)
+                next_at += interval
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+
+        start = time.perf_counter()
+        thread = threading.Thread(target=sender)
+        thread.start()
+        # Every frame is either processed or dropped, and the last one is never dropped
+        while True:
+            message = ws.receive_json()
+            messages.append(message)
+            if message["type"] == "frame" and message["frame"] + message["dropped_frames"] >= len(frames):
+                break
+        elapsed = time.perf_counter() - start
+        thread.join()
+
+    frame_messages = [m for m in messages if m["type"] == "frame"]
+    identities = [m for m in messages if m["type"] == "identity"]
+    processing = [m["processing_ms"] for m in frame_messages]
+    report = {
+        "resolution": args.resolution,
+        "frames_sent": len(frames),
+        "send_fps": args.fps,
+        "frames_processed": len(frame_messages),
+        "frames_dropped": frame_messages[-1]["dropped_frames"] if frame_messages else 0,
+        "processed_fps": len(frame_messages) / elapsed,
+        "frame_ms_p50": percentile(processing, 50),
+        "frame_ms_p95": percentile(processing, 95),
+        "tracks": len({f["track_id"] for m in frame_messages for f in m["faces"]}),
+        "searches": len(identities),
+        "identify_ms_p50": percentile([m["identify_ms"] for m in identities], 50),
+        "per_frame_embedding_ms": per_frame_embedding_ms,
+        "errors": [m for m in messages if m["type"] == "error"][:5],
+    }
+
+    print(f"Processed {report['frames_processed']}/{report['frames_sent']} frames "
+          f"({report['processed_fps']:.1f} fps), {report['frames_dropped']} dropped")
+    print(f"Frame processing p50 {report['frame_ms_p50']:.1f} ms, p95 {report['frame_ms_p95']:.1f} ms")
+    print(f"{report['tracks']} track(s), {report['searches']} embedding+search "
+          f"(p50 {report['identify_ms_p50']:.1f} ms) - per-frame path would have run "
+          f"{report['frames_sent']} x {per_frame_embedding_ms:.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,182 @@
+# benchmarks/bench_memory.py
+"""
+Peak memory per request for large photo uploads.
+
+Each (endpoint, resolution) pair runs in a fresh process: the app is
+imported, warmed up with a small card, then one request is sent with a
+synthetic photo of the given size. The report gives the growth of the
+process peak RSS caused by that single request, next to the upload size.
+
+/ocr runs against benchmarks/fake_groq.py, started automatically.
+
+Usage (from the backend folder, on a scratch copy - /ocr stages uploads):
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --megapixels 2 12 48 --endpoints ocr extract_photo --output mem.json
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+ENDPOINTS = ("ocr", "ocr_card", "extract_photo", "face_search")
+ASPECT_RATIO = 4 / 3  # phone camera
+
+
+def _status_mb(field: str) -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1]) / 1024  # kB
+    raise KeyError(field)
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS mark (Linux >= 4.0), so imports and warm-up do not hide the request"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    try:
+        return _status_mb("VmHWM:")
+    except (OSError, KeyError):
+        # ru_maxrss is in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mb() -> float:
+    try:
+        return _status_mb("VmRSS:")
+    except (OSError, KeyError):
+        return peak_rss_mb()
+
+
+def photo_size(megapixels: float):
+    height = int((megapixels * 1_000_000 / ASPECT_RATIO) ** 0.5)
+    return int(height * ASPECT_RATIO), height
+
+
+def run_child(endpoint: str, photo_path: str) -> Dict:
+    """Runs inside the child process: one measured request"""
+    os.chdir(BACKEND_DIR)
+    from fastapi.testclient import TestClient
+    from benchmarks.synthetic import make_card_image
+    import main
+
+    # The photo is generated by the parent: building it here would raise the peak before the request
+    with open(photo_path, "rb") as f:
+        photo = f.read()
+    small = make_card_image(640, 480)
+
+    def request(client, image):
+        if endpoint == "ocr":
+            return client.post("/ocr", files={"file": ("cin.jpg", image, "image/jpeg")})
+        if endpoint == "ocr_card":
+            return client.post("/ocr/card", files={"recto": ("recto.jpg", image, "image/jpeg"),
+                                                  "verso": ("verso.jpg", image, "image/jpeg")})
+        if endpoint == "extract_photo":
+            return client.post("/extract-photo", files={"file": ("cin.jpg", image, "image/jpeg")})
+        return client.post("/face/search", files={"file": ("face.jpg", image, "image/jpeg")})
+
+    client = TestClient(main.app)
+    request(client, small)  # warm-up: cascades, model, lazy imports
+
+    baseline = current_rss_mb() if reset_peak_rss() else peak_rss_mb()
+    start = time.perf_counter()
+    response = request(client, photo)
+    elapsed = time.perf_counter() - start
+    return {
+        "endpoint": endpoint,
+        "upload_mb": len(photo) / (1024 * 1024),
+        "status": response.status_code,
+        "latency_ms": elapsed * 1000,
+        "peak_rss_growth_mb": max(0.0, peak_rss_mb() - baseline),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS per request for large uploads")
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[2, 12, 48])
+    parser.add_argument("--endpoints", nargs="+", default=["ocr", "extract_photo"], choices=ENDPOINTS)
+    parser.add_argument("--output", help="write the JSON report to this path")
+    parser.add_argument("--child", nargs=2, metavar=("ENDPOINT", "PHOTO"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(*args.child)))
+        return
+
+    from benchmarks.synthetic import make_card_image
+    photo_dir = tempfile.mkdtemp(prefix="bench_memory_")
+    photos = {}
+    for megapixels in args.megapixels:
+        width, height = photo_size(megapixels)
+        photos[megapixels] = os.path.join(photo_dir, f"{megapixels:g}mp.jpg")
+        with open(photos[megapixels], "wb") as f:
+            f.write(make_card_image(width, height))
+
+    port = free_port()
+    fake_groq = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "fake_groq.py"),
+         "--port", str(port), "--latency-ms", "0", "--jitter-ms", "0"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    env = {**os.environ, "GROQ_BASE_URL": f"http://127.0.0.1:{port}",
+           "GROQ_API_KEY": os.getenv("GROQ_API_KEY", "benchmark")}
+    results = []
+    try:
+        time.sleep(2)  # let the fake server start
+        for endpoint in args.endpoints:
+            for megapixels in args.megapixels:
+                print(f"⏱️  {endpoint} @ {megapixels:g} MP ...", end=" ", flush=True)
+                child = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--child", endpoint, photos[megapixels]],
+                    env=env, capture_output=True, text=True
+                )
+                if child.returncode != 0:
+                    print(f"❌\n{child.stderr[-2000:]}")
+                    continue
+                result = json.loads(child.stdout.strip().splitlines()[-1])
+                width, height = photo_size(megapixels)
+                result.update({"megapixels": megapixels, "resolution": f"{width}x{height}"})
+                results.append(result)
+                print(f"HTTP {result['status']}, upload {result['upload_mb']:.1f} MB, "
+                      f"peak RSS +{result['peak_rss_growth_mb']:.1f} MB")
+    finally:
+        fake_groq.terminate()
+        shutil.rmtree(photo_dir, ignore_errors=True)
+
+    print(f"\n{'endpoint':14} {'resolution':>11} {'upload MB':>10} {'peak +MB':>9} {'x upload':>9} {'ms':>8}")
+    for r in results:
+        ratio = r["peak_rss_growth_mb"] / r["upload_mb"] if r["upload_mb"] else 0.0
+        print(f"{r['endpoint']:14} {r['resolution']:>11} {r['upload_mb']:>10.1f} "
+              f"{r['peak_rss_growth_mb']:>9.1f} {ratio:>9.1f} {r['latency_ms']:>8.0f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
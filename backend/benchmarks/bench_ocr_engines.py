@@ -0,0 +1,154 @@
+# benchmarks/bench_ocr_engines.py
+"""
+Per-engine OCR latency and field accuracy on a labelled sample set.
+
+A sample set is a folder of images, each with a ground-truth JSON file of
+the same name (card_001.jpg + card_001.json, same keys as the OCR output).
+
+Usage (from the backend folder):
+    python benchmarks/bench_ocr_engines.py --samples path/to/cards --engines local groq local_first
+    python benchmarks/bench_ocr_engines.py --generate-synthetic 20 --samples /tmp/cards   # offline sample set
+
+Groq-backed engines need GROQ_API_KEY (or GROQ_BASE_URL pointing at benchmarks/fake_groq.py).
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import unicodedata
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ocr import build_ocr_extractor
+from benchmarks.synthetic import make_card_image, make_cin_fields
+
+# Fields scored for accuracy - those readable on the recto
+SCORED_FIELDS = ("numero_cin", "nom", "prenoms", "date_naissance", "lieu_naissance", "sexe")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def normalize(value) -> str:
+    """Case, accent and whitespace insensitive comparison key"""
+    text = unicodedata.normalize("NFKD", str(value or "")).encode("ascii", "ignore").decode()
+    return " ".join(text.lower().split())
+
+
+def load_samples(folder: str) -> List[Dict]:
+    samples = []
+    for image_path in sorted(glob.glob(os.path.join(folder, "*"))):
+        stem, extension = os.path.splitext(image_path)
+        if extension.lower() not in IMAGE_EXTENSIONS or not os.path.exists(f"{stem}.json"):
+            continue
+        with open(f"{stem}.json", "r", encoding="utf-8") as f:
+            truth = json.load(f)
+        with open(image_path, "rb") as f:
+            image_bytes = f.read()
+        content_type = "image/png" if extension.lower() == ".png" else "image/jpeg"
+        samples.append({"name": os.path.basename(stem), "image": image_bytes,
+                        "content_type": content_type, "truth": truth})
+    return samples
+
+
+def generate_synthetic(folder: str, count: int):
+    """Write `count` synthetic cards with their ground truth"""
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        fields = make_cin_fields(rng)
+        with open(os.path.join(folder, f"card_{i:03d}.jpg"), "wb") as f:
+            f.write(make_card_image(1280, 808, seed=i, fields=fields))
+        with open(os.path.join(folder, f"card_{i:03d}.json"), "w", encoding="utf-8") as f:
+            json.dump(fields, f, indent=2, ensure_ascii=False)
+    print(f"✅ {count} synthetic cards written to {folder}")
+
+
+def evaluate(engine_name: str, samples: List[Dict], args) -> Dict:
+    extractor = build_ocr_extractor(
+        engine_name,
+        api_key=os.getenv("GROQ_API_KEY"),
+        min_confidence=args.min_confidence,
+        tesseract_lang=args.lang
+    )
+
+    latencies, confidences = [], []
+    correct = {field: 0 for field in SCORED_FIELDS}
+    failures = 0
+    engines_used: Dict[str, int] = {}
+
+    for sample in samples:
+        try:
+            result = extractor.extract(sample["image"], sample["content_type"])
+        except Exception as e:
+            print(f"   ❌ {sample['name']}: {str(e)}")
+            failures += 1
+            continue
+        latencies.append(result.latency * 1000)
+        confidences.append(result.confidence)
+        engines_used[result.engine] = engines_used.get(result.engine, 0) + 1
+        for field in SCORED_FIELDS:
+            if normalize(result.data.get(field)) == normalize(sample["truth"].get(field)):
+                correct[field] += 1
+
+    scored = len(samples) - failures
+    field_accuracy = {field: (count / scored if scored else 0.0) for field, count in correct.items()}
+    return {
+        "samples": len(samples),
+        "failures": failures,
+        "p50_ms": float(np.percentile(latencies, 50)) if latencies else None,
+        "p95_ms": float(np.percentile(latencies, 95)) if latencies else None,
+        "mean_confidence": float(np.mean(confidences)) if confidences else None,
+        "field_accuracy": field_accuracy,
+        "accuracy": float(np.mean(list(field_accuracy.values()))),
+        "answered_by": engines_used,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR engines on a labelled sample set")
+    parser.add_argument("--samples", required=True, help="folder of images + ground-truth JSON")
+    parser.add_argument("--engines", nargs="+", default=["local", "groq", "local_first"],
+                        choices=["local", "groq", "local_first"])
+    parser.add_argument("--min-confidence", type=float, default=0.75, help="escalation threshold for local_first")
+    parser.add_argument("--lang", default="fra", help="Tesseract language(s)")
+    parser.add_argument("--generate-synthetic", type=int, metavar="N",
+                        help="first write N synthetic cards into --samples")
+    parser.add_argument("--output", help="write the JSON report to this path")
+    args = parser.parse_args()
+
+    if args.generate_synthetic:
+        generate_synthetic(args.samples, args.generate_synthetic)
+
+    samples = load_samples(args.samples)
+    if not samples:
+        sys.exit(f"No labelled samples in {args.samples}")
+
+    report = {}
+    for engine_name in args.engines:
+        print(f"⏱️  {engine_name} on {len(samples)} samples ...")
+        try:
+            report[engine_name] = evaluate(engine_name, samples, args)
+        except (RuntimeError, ValueError) as e:
+            print(f"   ⚠️ Skipped: {str(e)}")
+            continue
+
+    print(f"\n{'engine':12} {'p50 ms':>9} {'p95 ms':>9} {'accuracy':>9} {'confidence':>11} {'failures':>9}")
+    for engine_name, r in report.items():
+        if r["p50_ms"] is None:
+            print(f"{engine_name:12} {'-':>9} {'-':>9} {'-':>9} {'-':>11} {r['failures']:>9}")
+            continue
+        print(f"{engine_name:12} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['accuracy']:>9.1%} "
+              f"{r['mean_confidence']:>11.2f} {r['failures']:>9}")
+        print(f"{'':12}   fields: " + ", ".join(f"{k} {v:.0%}" for k, v in r["field_accuracy"].items()))
+        print(f"{'':12}   answered by: {r['answered_by']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# benchmarks/bench_pipeline.py
+"""
+CPU microbenchmarks for the image and face pipeline.
+
+Measures ops/sec, p50/p99 latency and peak traced memory for:
+    - extract_face_photo / detect_photo_region  (synthetic cards, several resolutions)
+    - parse_ocr_response                        (typical LLM answer)
+    - FaceSearchService.compare_faces           (one pair)
+    - FaceSearchService.search_similar_faces    (synthetic embedding sets, 1k -> 100k, 1M with --full)
+    - SharedFaceIndex.search                    (same sets, memory-mapped index, unfiltered and 10% pre-filtered)
+
+Usage (from the backend folder):
+    python benchmarks/bench_pipeline.py                              # run, write JSON
+    python benchmarks/bench_pipeline.py --save-baseline              # store as baseline
+    python benchmarks/bench_pipeline.py --baseline benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --full                       # also the 1M embedding set
+    python benchmarks/bench_pipeline.py --sizes 1000 10000 100000 1000000
+
+The default run stops at 100k embeddings to stay within a few minutes;
+the 1M set (~0.5 GB of vectors, several minutes) only runs with --full or
+an explicit --sizes. The committed benchmarks/baseline.json is a default
+run; its header records the machine it was measured on - compare against
+it only on similar hardware, or save a local baseline first.
+
+Exits with status 1 when a benchmark's p50 regressed beyond --tolerance.
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# main.py opens documents.db, images/, face_embeddings/ and the upload
+# staging area on import: point them all at a scratch directory so a run
+# never touches the real data
+LAUNCH_DIR = os.getcwd()  # relative --output / --baseline paths are resolved from here
+SCRATCH_DIR = tempfile.mkdtemp(prefix="bench_pipeline_")
+atexit.register(shutil.rmtree, SCRATCH_DIR, ignore_errors=True)
+os.chdir(SCRATCH_DIR)
+os.environ["UPLOAD_STAGING_DIR"] = os.path.join(SCRATCH_DIR, "staging")
+os.environ.setdefault("GROQ_API_KEY", "benchmark")  # main.py refuses to import without it
+
+import cv2
+import numpy as np
+
+from main import extract_face_photo, detect_photo_region
+from ocr import parse_ocr_response
+from deepface_service import FaceSearchService
+from face_index import SharedFaceIndex
+from benchmarks.synthetic import make_card_image, make_cin_fields, make_llm_response
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmarks", "baseline.json")
+
+CARD_RESOLUTIONS = [(640, 404), (1280, 808), (2560, 1616), (4000, 2525)]
+EMBEDDING_SIZES = [1_000, 10_000, 100_000]
+FULL_EMBEDDING_SIZES = EMBEDDING_SIZES + [1_000_000]
+EMBEDDING_DIM = 128  # Facenet
+
+SAMPLE_LLM_RESPONSE = make_llm_response(make_cin_fields(np.random.default_rng(0)))
+
+
+# ============================================================================
+# SYNTHETIC DATA
+# ============================================================================
+def make_embeddings(count: int, seed: int = 0) -> Dict[int, np.ndarray]:
+    """Random Facenet-sized embeddings keyed by document id"""
+    rng = np.random.default_rng(seed)
+    matrix = rng.standard_normal((count, EMBEDDING_DIM))
+    return {doc_id: matrix[doc_id] for doc_id in range(count)}
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+def measure(fn: Callable[[], object], min_runs: int = 5, max_runs: int = 1000,
+            max_seconds: float = 3.0) -> Dict:
+    """Run fn repeatedly and return throughput, latency percentiles and peak memory"""
+    fn()  # warm-up (cascade loading, caches)
+
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < max_runs:
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+        if len(latencies) >= min_runs and time.perf_counter() - started >= max_seconds:
+            break
+    total = sum(latencies)
+
+    # Peak memory is measured on a separate call: tracing slows everything down
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "runs": len(latencies),
+        "ops_per_sec": len(latencies) / total if total else 0.0,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def run_benchmarks(sizes: List[int], max_seconds: float) -> Dict[str, Dict]:
+    results = {}
+
+    def record(name: str, fn: Callable[[], object], **kwargs):
+        print(f"⏱️  {name} ...", end=" ", flush=True)
+        results[name] = measure(fn, max_seconds=max_seconds, **kwargs)
+        r = results[name]
+        print(f"{r['ops_per_sec']:.1f} ops/s, p50 {r['p50_ms']:.3f} ms, "
+              f"p99 {r['p99_ms']:.3f} ms, peak {r['peak_memory_kb']:.0f} KB")
+
+    for width, height in CARD_RESOLUTIONS:
+        card = make_card_image(width, height)
+        record(f"extract_face_photo[{width}x{height}]", lambda: extract_face_photo(card))
+        record(f"detect_photo_region[{width}x{height}]", lambda: detect_photo_region(card))
+
+    record("parse_ocr_response", lambda: parse_ocr_response(SAMPLE_LLM_RESPONSE))
+
+    service = FaceSearchService()
+    rng = np.random.default_rng(42)
+    a, b = rng.standard_normal(EMBEDDING_DIM), rng.standard_normal(EMBEDDING_DIM)
+    record("compare_faces", lambda: service.compare_faces(a, b))
+
+    query = rng.standard_normal(EMBEDDING_DIM)
+    for size in sizes:
+        database = make_embeddings(size)
+        record(f"search_similar_faces[{size}]",
+               lambda: service.search_similar_faces(query, database, threshold=0.4, top_k=10),
+               min_runs=3)
+
+        with tempfile.TemporaryDirectory() as index_dir:
+            index = SharedFaceIndex(os.path.join(index_dir, "index.bin"), dim=EMBEDDING_DIM)
+            index.add_many(list(database), np.stack(list(database.values())))
+            record(f"face_index_search[{size}]",
+                   lambda: index.search(query, threshold=0.4, top_k=10),
+                   min_runs=3)
+            # Metadata pre-filter keeping ~10% of the ids
+            candidates = np.sort(rng.choice(list(database), size=max(1, size // 10), replace=False))
+            record(f"face_index_search_filtered[{size}]",
+                   lambda: index.search(query, threshold=0.4, top_k=10, candidate_ids=candidates),
+                   min_runs=3)
+            del index
+        del database
+
+    return results
+
+
+# ============================================================================
+# BASELINE COMPARISON
+# ============================================================================
+def compare_to_baseline(results: Dict[str, Dict], baseline: Dict[str, Dict],
+                        tolerance: float) -> List[str]:
+    """Return the names of benchmarks whose p50 got slower than baseline * (1 + tolerance)"""
+    regressions = []
+    print(f"\n{'benchmark':45} {'baseline p50':>14} {'current p50':>14} {'change':>9}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:45} {'-':>14} {current['p50_ms']:>11.3f} ms {'new':>9}")
+            continue
+        change = (current["p50_ms"] - previous["p50_ms"]) / previous["p50_ms"] if previous["p50_ms"] else 0.0
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = " ❌"
+        print(f"{name:45} {previous['p50_ms']:>11.3f} ms {current['p50_ms']:>11.3f} ms {change:>+8.1%}{flag}")
+    return regressions
+
+
+def cpu_model() -> str:
+    """CPU model name (platform.processor() is often empty on Linux)"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU microbenchmarks for the image and face pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=EMBEDDING_SIZES,
+                        help="embedding set sizes for search_similar_faces (e.g. 1000 ... 1000000)")
+    parser.add_argument("--full", action="store_true", help="full run: embedding sets up to 1M")
+    parser.add_argument("--max-seconds", type=float, default=3.0, help="time budget per benchmark")
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+    args.baseline = os.path.join(LAUNCH_DIR, args.baseline)
+    if args.output:
+        args.output = os.path.join(LAUNCH_DIR, args.output)
+
+    results = run_benchmarks(FULL_EMBEDDING_SIZES if args.full else args.sizes, args.max_seconds)
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "results": results,
+    }
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results written to {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Baseline saved to {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regression against baseline")
+    else:
+        print(f"ℹ️  No baseline at {args.baseline} (run with --save-baseline to create one)")
+
+
+if __name__ == "__main__":
+    main()
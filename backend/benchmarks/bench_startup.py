@@ -0,0 +1,166 @@
+# benchmarks/bench_startup.py
+"""
+Cold start per deployment profile: import time, startup time and RSS.
+
+Each profile runs in a fresh process with its environment:
+    documents     FACE_SEARCH=off      - no face routes, the face model is never loaded
+    lazy          FACE_SEARCH=lazy     - default, model loaded by the first face search
+    face_preload  FACE_SEARCH=preload  - model loaded and index synced at startup
+    eager         lazy + every heavy dependency imported up front, the way
+                  main.py used to start (reference point)
+
+Reported per profile: `import main` time, startup events time, RSS once
+started, the first GET /documents/db, the first POST /face/search (face
+profiles) and which heavy modules ended up loaded.
+
+/face/search embeds its query photo with the real model when DeepFace is
+installed: its first call includes the model load in the lazy profile.
+
+Reference run (median of 3, 1 vCPU, Python 3.12, tensorflow-cpu 2.21,
+tf-keras 2.21, deepface 0.0.102, real packages, no stubs):
+
+    profile       import ms  startup ms  RSS MB  final RSS MB
+    documents          1953          70      98            98
+    lazy               1895          66      98           940
+    face_preload       2073       10560     939          1042
+    eager             11099         100     792           942
+
+The Facenet weights could not be downloaded on that machine, so every
+/face/search answered 503 before the model was built. TensorFlow and
+DeepFace were really imported (that cost is in the RSS and startup
+columns above), but the first face search time and the memory of the
+built model were NOT measured.
+
+Usage (from the backend folder):
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --profiles documents lazy --runs 5 --output startup.json
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+PROFILES = {
+    "documents": {"FACE_SEARCH": "off"},
+    "lazy": {"FACE_SEARCH": "lazy"},
+    "face_preload": {"FACE_SEARCH": "preload"},
+    "eager": {"FACE_SEARCH": "lazy"},
+}
+# Imported before main.py by the "eager" profile
+EAGER_IMPORTS = ("tensorflow", "deepface", "groq", "cv2", "pyarrow")
+HEAVY_MODULES = ("tensorflow", "deepface", "groq", "cv2", "pyarrow", "PIL")
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024  # kB
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(profile: str) -> Dict:
+    """Runs inside the child process: one cold start"""
+    os.chdir(BACKEND_DIR)
+    result = {"profile": profile, "rss_before_mb": rss_mb()}
+
+    start = time.perf_counter()
+    if profile == "eager":
+        for name in EAGER_IMPORTS:
+            try:
+                __import__(name)
+            except ImportError:
+                pass
+    import main
+    result["import_ms"] = (time.perf_counter() - start) * 1000
+    result["rss_imported_mb"] = rss_mb()
+
+    from fastapi.testclient import TestClient
+    start = time.perf_counter()
+    with TestClient(main.app) as client:
+        result["startup_ms"] = (time.perf_counter() - start) * 1000
+        result["rss_started_mb"] = rss_mb()
+
+        start = time.perf_counter()
+        status = client.get("/documents/db").status_code
+        result["first_documents_ms"] = (time.perf_counter() - start) * 1000
+        result["first_documents_status"] = status
+
+        samples = sorted(glob.glob(os.path.join("images", "**", "*.jpg"), recursive=True))
+        if main.FACE_SEARCH != "off" and samples:
+            with open(samples[0], "rb") as f:
+                photo = f.read()
+            start = time.perf_counter()
+            status = client.post("/face/search", files={"file": ("face.jpg", photo, "image/jpeg")}).status_code
+            result["first_face_search_ms"] = (time.perf_counter() - start) * 1000
+            result["first_face_search_status"] = status
+        result["rss_final_mb"] = rss_mb()
+
+    result["loaded_modules"] = [name for name in HEAVY_MODULES if name in sys.modules]
+    return result
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Cold start per deployment profile")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--runs", type=int, default=3, help="cold starts per profile, the median is reported")
+    parser.add_argument("--output", help="write the JSON report to this path")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child)))
+        return
+
+    report = []
+    for profile in args.profiles:
+        env = {**os.environ, **PROFILES[profile], "GROQ_API_KEY": os.getenv("GROQ_API_KEY", "benchmark")}
+        runs = []
+        for _ in range(args.runs):
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", profile],
+                env=env, capture_output=True, text=True
+            )
+            if child.returncode != 0:
+                print(f"❌ {profile}\n{child.stderr[-2000:]}")
+                break
+            runs.append(json.loads(child.stdout.strip().splitlines()[-1]))
+        if not runs:
+            continue
+
+        # Median run by total time to a started server
+        runs.sort(key=lambda r: r["import_ms"] + r["startup_ms"])
+        result = runs[len(runs) // 2]
+        result["runs"] = len(runs)
+        report.append(result)
+        print(f"⏱️  {profile}: import {result['import_ms']:.0f} ms, startup {result['startup_ms']:.0f} ms, "
+              f"RSS {result['rss_started_mb']:.0f} MB")
+
+    print(f"\n{'profile':13} {'import ms':>10} {'startup ms':>11} {'RSS MB':>7} {'1st /documents':>15} "
+          f"{'1st /face/search':>17} {'final RSS':>10}  loaded")
+    for r in report:
+        face = f"{r['first_face_search_ms']:.0f} ms" if "first_face_search_ms" in r else "-"
+        print(f"{r['profile']:13} {r['import_ms']:>10.0f} {r['startup_ms']:>11.0f} {r['rss_started_mb']:>7.0f} "
+              f"{r['first_documents_ms']:>12.0f} ms {face:>17} {r['rss_final_mb']:>10.0f}  "
+              f"{', '.join(r['loaded_modules']) or '-'}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main_bench()
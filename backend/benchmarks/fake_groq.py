@@ -0,0 +1,115 @@
+# benchmarks/fake_groq.py
+"""
+Local stand-in for the Groq chat-completions API, for offline load tests.
+
+Answers POST /openai/v1/chat/completions with a realistic CIN answer
+(Markdown + ```json block) after a configurable latency, and can inject
+server errors and 429 rate limits.
+
+Usage (from the backend folder):
+    python benchmarks/fake_groq.py --port 8900 --latency-ms 1200 --jitter-ms 400 \\
+        --error-rate 0.01 --rate-limit-rate 0.02
+
+Then point the backend at it (the Groq SDK honours GROQ_BASE_URL):
+    GROQ_BASE_URL=http://127.0.0.1:8900 GROQ_API_KEY=fake python main.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import make_cin_fields, make_llm_response
+
+app = FastAPI(title="Fake Groq")
+config = argparse.Namespace(latency_ms=1000.0, jitter_ms=300.0, error_rate=0.0, rate_limit_rate=0.0)
+rng = np.random.default_rng()
+stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    delay = max(0.0, rng.normal(config.latency_ms, config.jitter_ms)) / 1000
+    await asyncio.sleep(delay)
+
+    roll = rng.random()
+    if roll < config.rate_limit_rate:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": "1"},
+            content={"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+        )
+    if roll < config.rate_limit_rate + config.error_rate:
+        stats["errors"] += 1
+        return JSONResponse(
+            status_code=500,
+            content={"error": {"message": "Internal server error", "type": "internal_server_error"}},
+        )
+
+    # Two images = recto + verso in one call (/ocr/card): answer with both sides
+    images = sum(
+        1 for message in body.get("messages", [])
+        if isinstance(message.get("content"), list)
+        for part in message["content"] if part.get("type") == "image_url"
+    )
+    content = make_llm_response(make_cin_fields(rng), card=images >= 2)
+    prompt_tokens = 800 + 1200 * images
+    completion_tokens = len(content) // 4
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake-model"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+            "logprobs": None,
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "queue_time": 0.0,
+            "prompt_time": 0.0,
+            "completion_time": delay,
+            "total_time": delay,
+        },
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Groq chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=1000.0, help="mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=300.0, help="latency standard deviation")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of HTTP 500 answers")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of HTTP 429 answers")
+    args = parser.parse_args()
+
+    for key in ("latency_ms", "jitter_ms", "error_rate", "rate_limit_rate"):
+        setattr(config, key, getattr(args, key))
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# benchmarks/load_test.py
+"""
+End-to-end load test: drives a running backend with a mixed
+/ocr, /save, /face/search and /documents/db workload. `save` posts the
+image again as base64 (older clients); `save_staged` is the current UI
+flow: /ocr, then /save with the returned upload_id.
+
+Start the fake LLM and the backend (use a scratch copy of the backend folder:
+/save really writes to documents.db and images/):
+    python benchmarks/fake_groq.py --latency-ms 1200 --jitter-ms 400
+    GROQ_BASE_URL=http://127.0.0.1:8900 GROQ_API_KEY=fake python main.py
+
+Then:
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --concurrency 16 --duration 60
+    python benchmarks/load_test.py --mix ocr=4,save=2,face_search=1,documents=3 --output load.json
+    python benchmarks/load_test.py --mix save_staged=4,documents=3   # /ocr + /save by upload_id
+    python benchmarks/load_test.py --mix ocr_card=2,save=2,documents=3   # recto+verso in one call
+    python benchmarks/load_test.py --mix ocr_job=4,documents=3   # queued OCR, submit + poll until done
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import make_card_image, make_cin_fields
+
+ENDPOINTS = ("ocr", "ocr_card", "ocr_job", "save", "save_staged", "face_search", "documents")
+OCR_ENDPOINTS = ("ocr", "ocr_card", "ocr_job", "save_staged")  # each one is a card read
+JOB_POLL_SECONDS = 0.25
+DEFAULT_MIX = {"ocr": 4, "save": 1, "save_staged": 2, "face_search": 1, "documents": 3}
+
+
+class LoadTest:
+    """Closed-loop load generator: `concurrency` workers each fire requests back to back"""
+
+    def __init__(self, base_url: str, mix: Dict[str, int], card_size: tuple, seed: int = 0):
+        self.base_url = base_url.rstrip("/")
+        self.endpoints = list(mix)
+        weights = np.array([mix[name] for name in self.endpoints], dtype=float)
+        self.weights = weights / weights.sum()
+        self.rng = np.random.default_rng(seed)
+        self.cards = [make_card_image(*card_size, seed=i) for i in range(8)]
+        self.latencies: Dict[str, List[float]] = {name: [] for name in self.endpoints}
+        self.errors: Dict[str, Dict[str, int]] = {name: {} for name in self.endpoints}
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+    def _card(self) -> bytes:
+        return self.cards[self.rng.integers(len(self.cards))]
+
+    async def ocr(self, client: httpx.AsyncClient) -> httpx.Response:
+        files = {"file": ("cin.jpg", self._card(), "image/jpeg")}
+        return await client.post("/ocr", files=files)
+
+    async def ocr_card(self, client: httpx.AsyncClient) -> httpx.Response:
+        files = {
+            "recto": ("recto.jpg", self._card(), "image/jpeg"),
+            "verso": ("verso.jpg", self._card(), "image/jpeg"),
+        }
+        return await client.post("/ocr/card", files=files)
+
+    async def ocr_job(self, client: httpx.AsyncClient) -> httpx.Response:
+        """Submit to /jobs/ocr and poll until the job is finished - latency is end to end"""
+        files = {"file": ("cin.jpg", self._card(), "image/jpeg")}
+        response = await client.post("/jobs/ocr", files=files)
+        if response.status_code >= 400:
+            return response
+        job_id = response.json()["job_id"]
+        while True:
+            await asyncio.sleep(JOB_POLL_SECONDS)
+            response = await client.get(f"/jobs/{job_id}")
+            if response.status_code >= 400:
+                return response
+            status = response.json()["status"]
+            if status == "done":
+                return response
+            if status == "failed":
+                return httpx.Response(500, request=response.request)
+
+    async def save(self, client: httpx.AsyncClient) -> httpx.Response:
+        payload = {
+            "data": make_cin_fields(self.rng),  # random CIN so the duplicate check does not short-circuit
+            "image_base64": base64.b64encode(self._card()).decode("utf-8"),
+            "filename": "cin.jpg",
+        }
+        return await client.post("/save", json=payload)
+
+    async def save_staged(self, client: httpx.AsyncClient) -> httpx.Response:
+        """/ocr then /save with the upload_id: the image is sent once - latency is end to end"""
+        files = {"file": ("cin.jpg", self._card(), "image/jpeg")}
+        response = await client.post("/ocr", files=files)
+        if response.status_code >= 400:
+            return response
+        payload = {
+            "data": make_cin_fields(self.rng),
+            "upload_id": response.json()["upload_id"],
+            "filename": "cin.jpg",
+        }
+        return await client.post("/save", json=payload)
+
+    async def face_search(self, client: httpx.AsyncClient) -> httpx.Response:
+        files = {"file": ("face.jpg", self._card(), "image/jpeg")}
+        return await client.post("/face/search", files=files, params={"threshold": 0.4, "top_k": 10})
+
+    async def documents(self, client: httpx.AsyncClient) -> httpx.Response:
+        return await client.get("/documents/db", params={"skip": int(self.rng.integers(0, 5)) * 20, "limit": 20})
+
+    # ------------------------------------------------------------------
+    # Driver
+    # ------------------------------------------------------------------
+    async def worker(self, client: httpx.AsyncClient, deadline: float):
+        while time.perf_counter() < deadline:
+            name = self.endpoints[self.rng.choice(len(self.endpoints), p=self.weights)]
+            start = time.perf_counter()
+            try:
+                response = await getattr(self, name)(client)
+                outcome = None if response.status_code < 400 else str(response.status_code)
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            elapsed = time.perf_counter() - start
+
+            # 404 from /face/search only means "no face / empty database", not a failure
+            if outcome and not (name == "face_search" and outcome in ("400", "404")):
+                self.errors[name][outcome] = self.errors[name].get(outcome, 0) + 1
+            self.latencies[name].append(elapsed)
+
+    async def run(self, concurrency: int, duration: float, timeout: float) -> Dict:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=timeout, limits=limits) as client:
+            started = time.perf_counter()
+            deadline = started + duration
+            await asyncio.gather(*(self.worker(client, deadline) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> Dict:
+        endpoints = {}
+        for name in self.endpoints:
+            latencies_ms = np.array(self.latencies[name]) * 1000
+            count = len(latencies_ms)
+            error_count = sum(self.errors[name].values())
+            endpoints[name] = {
+                "requests": count,
+                "throughput_rps": count / elapsed,
+                "p50_ms": float(np.percentile(latencies_ms, 50)) if count else None,
+                "p95_ms": float(np.percentile(latencies_ms, 95)) if count else None,
+                "p99_ms": float(np.percentile(latencies_ms, 99)) if count else None,
+                "error_rate": error_count / count if count else 0.0,
+                "errors": self.errors[name],
+            }
+        cards = sum(
+            endpoints[name]["requests"] * (1 - endpoints[name]["error_rate"])
+            for name in OCR_ENDPOINTS if name in endpoints
+        )
+        return {
+            "duration_s": elapsed,
+            "total_requests": sum(e["requests"] for e in endpoints.values()),
+            "cards_per_minute": cards / elapsed * 60 if set(OCR_ENDPOINTS) & set(endpoints) else None,
+            "endpoints": endpoints,
+        }
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for item in value.split(","):
+        name, weight = item.split("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}'. Allowed: {', '.join(ENDPOINTS)}")
+        mix[name] = int(weight)
+    return mix
+
+
+def print_report(report: Dict):
+    print(f"\n{'endpoint':12} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    for name, e in report["endpoints"].items():
+        if not e["requests"]:
+            print(f"{name:12} {0:>9}")
+            continue
+        print(f"{name:12} {e['requests']:>9} {e['throughput_rps']:>8.2f} {e['p50_ms']:>9.1f} "
+              f"{e['p95_ms']:>9.1f} {e['p99_ms']:>9.1f} {e['error_rate']:>8.1%}")
+        for outcome, count in e["errors"].items():
+            print(f"{'':12}   ↳ {outcome}: {count}")
+    print(f"\n{report['total_requests']} requests in {report['duration_s']:.1f} s")
+    if report["cards_per_minute"] is not None:
+        print(f"📇 Sustained OCR throughput: {report['cards_per_minute']:.1f} cards/minute")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test for the OCR backend")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="backend base URL")
+    parser.add_argument("--concurrency", type=int, default=8, help="number of concurrent clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="test duration in seconds")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="endpoint weights, e.g. ocr=4,save=2,face_search=1,documents=3")
+    parser.add_argument("--card-size", type=int, nargs=2, default=(1280, 808), metavar=("W", "H"))
+    parser.add_argument("--output", help="write the JSON report to this path")
+    args = parser.parse_args()
+
+    load_test = LoadTest(args.url, args.mix, tuple(args.card_size))
+    print(f"🚀 {args.concurrency} clients for {args.duration:.0f} s against {args.url} (mix: {args.mix})")
+    report = asyncio.run(load_test.run(args.concurrency, args.duration, args.timeout))
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
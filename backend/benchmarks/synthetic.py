@@ -0,0 +1,105 @@
+# benchmarks/synthetic.py
+"""Synthetic CIN cards and LLM answers shared by the benchmarks and the load test"""
+import glob
+import json
+import os
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NOMS = ["RAKOTO", "RABE", "RASOA", "RANDRIA", "RAZAFY", "RAHARISON", "ANDRIAMANANA"]
+PRENOMS = ["Jean Paul", "Hery", "Voahangy", "Fanja", "Tiana", "Mamy", "Lalao"]
+LIEUX = ["Antananarivo", "Toamasina", "Fianarantsoa", "Mahajanga", "Toliara", "Antsiranana"]
+# Labels printed on synthetic cards (French side of the CIN)
+RECTO_LABELS = [
+    ("numero_cin", "No"),
+    ("nom", "Nom"),
+    ("prenoms", "Prenoms"),
+    ("date_naissance", "Ne le"),
+    ("lieu_naissance", "Lieu de naissance"),
+    ("sexe", "Sexe"),
+]
+ADRESSES = ["Lot IIY 45 Bis Ampasampito", "Lot VK 12 Ambohipo", "Lot II M 80 Analakely"]
+
+
+def make_card_image(width: int, height: int, seed: int = 0, fields: dict = None) -> bytes:
+    """
+    Build a JPEG that looks like a CIN recto: light background, text lines
+    on the left, and a face photo in the right third (a real crop from
+    images/ when one is available, a drawn placeholder otherwise).
+    With `fields`, the text lines are the recto fields with their labels,
+    so the card can serve as OCR ground truth.
+    """
+    rng = np.random.default_rng(seed)
+    card = np.full((height, width, 3), (225, 235, 240), dtype=np.uint8)
+    card = cv2.add(card, rng.integers(0, 12, card.shape, dtype=np.uint8))
+
+    if fields:
+        lines = [f"{label}: {fields[key]}" for key, label in RECTO_LABELS if fields.get(key)]
+    else:
+        lines = ["RAKOTO Jean Paul 112 203 601 234"] * 8
+
+    scale = width / 1000
+    for i, line in enumerate(lines):
+        y = int((0.15 + i * 0.09) * height)
+        cv2.putText(card, line, (int(0.05 * width), y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7 * scale, (40, 40, 40), max(1, int(2 * scale)))
+
+    photo_w, photo_h = width // 3 - int(0.04 * width), int(height * 0.6)
+    photo_x, photo_y = width - width // 3 + int(0.02 * width), (height - photo_h) // 2
+
+    samples = sorted(glob.glob(os.path.join(BACKEND_DIR, "images", "**", "*.jpg"), recursive=True))
+    face = cv2.imread(samples[seed % len(samples)]) if samples else None
+    if face is not None:
+        card[photo_y:photo_y + photo_h, photo_x:photo_x + photo_w] = cv2.resize(face, (photo_w, photo_h))
+    else:
+        center = (photo_x + photo_w // 2, photo_y + photo_h // 2)
+        cv2.ellipse(card, center, (photo_w // 3, photo_h // 3), 0, 0, 360, (150, 180, 210), -1)
+        for dx in (-1, 1):
+            cv2.circle(card, (center[0] + dx * photo_w // 8, center[1] - photo_h // 12),
+                       max(2, photo_w // 25), (30, 30, 30), -1)
+
+    success, encoded = cv2.imencode(".jpg", card, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def make_cin_fields(rng: np.random.Generator) -> dict:
+    """Random but plausible CIN fields (same keys as the OCR prompt)"""
+    day, month, year = rng.integers(1, 29), rng.integers(1, 13), rng.integers(1950, 2006)
+    issued_year = rng.integers(2010, 2025)
+    numero = " ".join(f"{rng.integers(0, 1000):03d}" for _ in range(4))
+    return {
+        "type_document": "CIN Madagascar",
+        "numero_cin": numero,
+        "nom": str(rng.choice(NOMS)),
+        "prenoms": str(rng.choice(PRENOMS)),
+        "date_naissance": f"{day:02d}/{month:02d}/{year}",
+        "lieu_naissance": str(rng.choice(LIEUX)),
+        "sexe": str(rng.choice(["M", "F"])),
+        "date_delivrance": f"{day:02d}/{month:02d}/{issued_year}",
+        "date_expiration": f"{day:02d}/{month:02d}/{issued_year + 10}",
+        "adresse": str(rng.choice(ADRESSES)),
+    }
+
+
+def make_llm_response(fields: dict, card: bool = False) -> str:
+    """
+    Render fields the way the vision model answers: Markdown then a ```json
+    block (split into "recto" and "verso" objects when card=True)
+    """
+    markdown = (
+        "# Carte d'Identité Nationale - Madagascar\n\n"
+        f"**Nom :** {fields['nom']}\n"
+        f"**Prénoms :** {fields['prenoms']}\n"
+        f"**Né(e) le :** {fields['date_naissance']} à {fields['lieu_naissance']}\n"
+        f"**Numéro CIN :** {fields['numero_cin']}\n"
+    )
+    if card:
+        verso_keys = ("date_delivrance", "date_expiration", "adresse")
+        fields = {
+            "recto": {key: value for key, value in fields.items() if key not in verso_keys},
+            "verso": {key: fields[key] for key in verso_keys},
+        }
+    return f"{markdown}\n```json\n{json.dumps(fields, indent=2, ensure_ascii=False)}\n```\n"
@@ -12,9 +12,9 @@ def clean_and_rebuild_embeddings():
     # Delete all cached embeddings
     if os.path.exists(cache_dir):
         for file in os.listdir(cache_dir):
-            if file.endswith('.npy'):
+            if file.endswith('.npy') or file.startswith('index.bin'):
                 os.remove(os.path.join(cache_dir, file))
-        print(f"🧹 Deleted all cached embeddings")
+        print(f"🧹 Deleted all cached embeddings and the shared face index")
     
     # You'll need to rebuild embeddings next time you search
     print("✅ Cache cleared. Embeddings will be rebuilt on next search.")
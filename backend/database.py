@@ -1,9 +1,13 @@
 # database.py
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean
+from sqlalchemy import create_engine, event, func, Column, Index, Integer, String, Text, DateTime, Boolean, LargeBinary
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 import os
+import time
+import unicodedata
+from metrics import metrics
 
 # SQLite database URL
 SQLALCHEMY_DATABASE_URL = "sqlite:///./documents.db"
@@ -14,6 +18,27 @@ engine = create_engine(
     connect_args={"check_same_thread": False}
 )
 
+# Time every SQL statement for the /metrics endpoint
+@event.listens_for(engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["query_start_time"].pop()
+    metrics.observe("db_query", time.perf_counter() - start)
+
+def place_key(value):
+    """
+    Search key of a place name: accents dropped, Unicode case folded, trimmed.
+    Computed in Python on both sides (stored key and query prefix): SQLite's
+    lower() only folds ASCII.
+    """
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -31,6 +56,7 @@ class Document(Base):
     prenoms = Column(String(100))
     date_naissance = Column(String(20))
     lieu_naissance = Column(String(100))
+    lieu_naissance_key = Column(String(100))  # place_key(lieu_naissance), set on every ORM write
     sexe = Column(String(1))
     date_delivrance = Column(String(20))
     date_expiration = Column(String(20))
@@ -43,9 +69,82 @@ class Document(Base):
     # Metadata
     date_sauvegarde = Column(DateTime, default=datetime.now)
 
+# Filters of /face/search. date_naissance is DD/MM/YYYY, so the birth year
+# is its last 4 characters; queries must use the exact same expressions.
+BIRTH_YEAR = func.substr(Document.date_naissance, -4)
+# The place key is a plain column rather than an expression index on a Python
+# function, so the database stays writable from the sqlite3 CLI and scripts.
+LIEU_NAISSANCE_KEY = Document.lieu_naissance_key
+Index("ix_documents_face_sexe", Document.has_face_photo, Document.sexe)
+Index("ix_documents_face_birth_year", Document.has_face_photo, BIRTH_YEAR)
+Index("ix_documents_face_lieu_naissance", Document.has_face_photo, LIEU_NAISSANCE_KEY)
+
+@event.listens_for(Document, "before_insert")
+@event.listens_for(Document, "before_update")
+def _set_lieu_naissance_key(mapper, connection, document):
+    document.lieu_naissance_key = place_key(document.lieu_naissance)
+
+# Content-addressed image blobs - one row per distinct file in images/
+class ImageBlob(Base):
+    __tablename__ = "image_blobs"
+    
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String(255), nullable=False)
+    size = Column(Integer)
+    ref_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+
+# Asynchronous OCR jobs - see jobs.py
+class OCRJob(Base):
+    __tablename__ = "ocr_jobs"
+    
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(20), nullable=False)  # "ocr" or "card"
+    status = Column(String(20), nullable=False, index=True)  # queued, running, done, failed
+    priority = Column(Integer, default=0, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    
+    # Inputs - dropped once the job failed or its document was saved (or after the retention period)
+    recto = Column(LargeBinary, nullable=True)
+    recto_content_type = Column(String(50))
+    verso = Column(LargeBinary, nullable=True)
+    verso_content_type = Column(String(50))
+    
+    result = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now)
+    available_at = Column(DateTime, default=datetime.now, index=True)  # retry backoff
+    locked_until = Column(DateTime, nullable=True)  # worker lease
+
 # Create tables
 Base.metadata.create_all(bind=engine)
 
+# create_all skips columns and indexes of tables that already exist
+with engine.begin() as conn:
+    columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(documents)")}
+    if "lieu_naissance_key" not in columns:
+        try:
+            conn.exec_driver_sql("ALTER TABLE documents ADD COLUMN lieu_naissance_key VARCHAR(100)")
+        except OperationalError as e:
+            if "duplicate column" not in str(e):  # another worker added it first
+                raise
+    # Rows written outside the app (sqlite3 CLI, restore scripts) get their key at the next start
+    missing = conn.exec_driver_sql(
+        "SELECT id, lieu_naissance FROM documents WHERE lieu_naissance_key IS NULL AND lieu_naissance IS NOT NULL"
+    ).fetchall()
+    if missing:
+        conn.exec_driver_sql(
+            "UPDATE documents SET lieu_naissance_key = ? WHERE id = ?",
+            [(place_key(lieu_naissance), doc_id) for doc_id, lieu_naissance in missing]
+        )
+    existing_indexes = {name for (name,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    for index in Document.__table__.indexes:
+        if index.name not in existing_indexes:
+            index.create(bind=conn)
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
@@ -1,68 +1,113 @@
 # deepface_service.py
-from deepface import DeepFace
 import numpy as np
-import cv2
 import os
+import threading
+import time
 from typing import List, Dict, Tuple, Optional
-import base64
 from datetime import datetime
-import tensorflow as tf
+from metrics import metrics, log
 
-# Explicitly disable GPU
-os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
+# Embedding settings - EMBEDDING_MODEL_VERSION changes whenever vectors would differ
+EMBEDDING_MODEL = 'Facenet'
+DETECTOR_BACKEND = 'opencv'
+EMBEDDING_MODEL_VERSION = f"{EMBEDDING_MODEL}/{DETECTOR_BACKEND}/aligned"
 
-# Configure TensorFlow to use CPU only and limit memory growth
-tf.config.set_visible_devices([], 'GPU')
+# DeepFace pulls in TensorFlow (seconds of import, hundreds of MB): it is only
+# imported on the first embedding, so processes that never search faces skip it
+_deepface = None
+_deepface_lock = threading.Lock()
+
+def load_deepface():
+    """Import DeepFace and configure TensorFlow for CPU, once per process"""
+    global _deepface
+    if _deepface is None:
+        with _deepface_lock:
+            if _deepface is None:
+                start = time.perf_counter()
+                # Explicitly disable GPU
+                os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
+                import tensorflow as tf
+                from deepface import DeepFace
+
+                # Configure TensorFlow to use CPU only and limit memory growth
+                tf.config.set_visible_devices([], 'GPU')
+                metrics.observe("deepface_import", time.perf_counter() - start)
+                log(f"✅ DeepFace loaded in {time.perf_counter() - start:.1f}s")
+                _deepface = DeepFace
+    return _deepface
+
+def deepface_loaded() -> bool:
+    return _deepface is not None
+
+class FaceEmbeddingError(Exception):
+    """The embedding could not be computed (model or image error), as opposed to no face found"""
 
 class FaceSearchService:
     def __init__(self, images_folder: str = "images"):
         self.images_folder = images_folder
         self.supported_extensions = ('.jpg', '.jpeg', '.png', '.webp')
         
-    def extract_face_embedding(self, image_path: str) -> Optional[np.ndarray]:
+    def preload(self):
         """
-        Extract face embedding from an image
+        Load DeepFace and build the embedding model now rather than on the
+        first search (face-enabled deployments, FACE_SEARCH=preload)
         """
-        try:
-            # Try to find a face in the image
-            result = DeepFace.represent(
-                img_path=image_path,
-                model_name='Facenet',
+        with metrics.timer("face_model_preload"):
+            load_deepface().build_model(EMBEDDING_MODEL)
+
+    def _represent(self, img) -> Optional[np.ndarray]:
+        """Embedding of the face in `img` (path or BGR array), None without a face. Errors propagate."""
+        with metrics.timer("face_embedding"):
+            result = load_deepface().represent(
+                img_path=img,
+                model_name=EMBEDDING_MODEL,
                 enforce_detection=False,  # Changed to False to be more lenient
-                detector_backend='opencv',
+                detector_backend=DETECTOR_BACKEND,
                 align=True
             )
-            
-            if result and len(result) > 0:
-                return np.array(result[0]['embedding'])
-            return None
-            
+        
+        if result and len(result) > 0:
+            return np.array(result[0]['embedding'])
+        return None
+    
+    def extract_face_embedding(self, image_path: str) -> Optional[np.ndarray]:
+        """
+        Extract face embedding from an image
+        """
+        try:
+            return self._represent(image_path)
         except Exception as e:
-            print(f"Embedding extraction failed for {image_path}: {str(e)}")
+            log(f"Embedding extraction failed for {image_path}: {str(e)}")
             return None
     
     def extract_embedding_from_bytes(self, image_bytes: bytes) -> Optional[np.ndarray]:
         """
-        Extract face embedding from image bytes
+        Extract face embedding from image bytes. None means no face was found;
+        a failure (model, unreadable image...) raises FaceEmbeddingError, so
+        callers never mistake it for an image without a face.
         """
+        temp_path = f"temp_{datetime.now().timestamp()}.jpg"
         try:
-            # Save temp file
-            temp_path = f"temp_{datetime.now().timestamp()}.jpg"
             with open(temp_path, 'wb') as f:
                 f.write(image_bytes)
-            
-            embedding = self.extract_face_embedding(temp_path)
-            
-            # Clean up temp file
+            return self._represent(temp_path)
+        except Exception as e:
+            log(f"Embedding extraction from bytes failed: {str(e)}")
+            raise FaceEmbeddingError(str(e)) from e
+        finally:
             if os.path.exists(temp_path):
                 os.remove(temp_path)
-                
-            return embedding
-            
+    
+    def extract_embedding_from_array(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Extract face embedding from a decoded BGR image (no temp file)
+        """
+        try:
+            return self._represent(image)
         except Exception as e:
-            print(f"Embedding extraction from bytes failed: {str(e)}")
+            log(f"Embedding extraction from array failed: {str(e)}")
             return None
-    
+
     def compare_faces(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
         """
         Compare two face embeddings and return similarity score (0-1)
@@ -76,7 +121,7 @@ class FaceSearchService:
             
             return float(normalized_similarity)
         except Exception as e:
-            print(f"Comparison error: {str(e)}")
+            log(f"Comparison error: {str(e)}")
             return 0.0
     
     def search_similar_faces(self, 
@@ -137,17 +182,18 @@ class FaceSearchService:
         if os.path.exists(cache_path):
             try:
                 embedding = np.load(cache_path)
-                print(f"Loaded cached embedding for document {doc_id}")
+                metrics.inc("embedding_cache_hit")
                 return embedding
             except Exception as e:
-                print(f"Failed to load cached embedding for {doc_id}: {str(e)}")
+                log(f"Failed to load cached embedding for {doc_id}: {str(e)}")
         
         # Create new embedding
+        metrics.inc("embedding_cache_miss")
         embedding = self.extract_face_embedding(photo_path)
         if embedding is not None:
             # Save to cache
             np.save(cache_path, embedding)
-            print(f"Created and cached embedding for document {doc_id}")
+            log(f"Created and cached embedding for document {doc_id}")
         
         return embedding
     
@@ -158,7 +204,7 @@ class FaceSearchService:
         cache_path = os.path.join("face_embeddings", f"{doc_id}.npy")
         if os.path.exists(cache_path):
             os.remove(cache_path)
-            print(f"Cleared cache for document {doc_id}")
+            log(f"Cleared cache for document {doc_id}")
 
 # Singleton instance
 face_search_service = FaceSearchService()
\ No newline at end of file
@@ -0,0 +1,211 @@
+# export.py
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from sqlalchemy import select
+
+from database import SessionLocal, Document
+from metrics import metrics, log
+
+EXPORT_FORMATS = ("csv", "ndjson", "parquet")
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXPORT_COLUMNS = (
+    "id", "folder_name", "type_document", "numero_cin", "nom", "prenoms",
+    "date_naissance", "lieu_naissance", "sexe", "date_delivrance",
+    "date_expiration", "adresse", "photo_visage_path", "has_face_photo",
+    "date_sauvegarde",
+)
+
+
+class DocumentExport:
+    """
+    Streams the documents table as CSV, NDJSON or Parquet.
+
+    Rows are read `batch_size` at a time by keyset pagination (id > last
+    id seen), each page in its own short session, and each batch is encoded
+    (and optionally gzipped) before the next one is read. Memory use does
+    not depend on the number of rows exported, and no read transaction stays
+    open while a slow client downloads: saves and deletes go on meanwhile.
+    The export is therefore not a snapshot - rows committed during it may
+    appear in the later pages.
+    """
+
+    def __init__(
+        self,
+        export_format: str = "csv",
+        gzip: bool = False,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        type_document: Optional[str] = None,
+        batch_size: int = 1000,
+    ):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format '{export_format}'. Allowed: {', '.join(EXPORT_FORMATS)}")
+        if export_format == "parquet" and _load_pyarrow() is None:
+            raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+        self.export_format = export_format
+        self.gzip = gzip
+        self.date_from = date_from
+        self.date_to = date_to
+        self.type_document = type_document
+        self.batch_size = batch_size
+
+    @property
+    def media_type(self) -> str:
+        return "application/gzip" if self.gzip else EXPORT_MEDIA_TYPES[self.export_format]
+
+    @property
+    def filename(self) -> str:
+        name = f"documents_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{self.export_format}"
+        return f"{name}.gz" if self.gzip else name
+
+    def query(self):
+        columns = [getattr(Document, column) for column in EXPORT_COLUMNS]
+        stmt = select(*columns).order_by(Document.id)
+        if self.date_from:
+            stmt = stmt.where(Document.date_sauvegarde >= self.date_from)
+        if self.date_to:
+            stmt = stmt.where(Document.date_sauvegarde <= self.date_to)
+        if self.type_document:
+            stmt = stmt.where(Document.type_document == self.type_document)
+        return stmt
+
+    def batches(self) -> Iterator[List[tuple]]:
+        """Rows in batches of `batch_size`, one short read per batch"""
+        last_id = 0
+        while True:
+            db = SessionLocal()
+            try:
+                # The session is closed before the batch is handed out: no lock held while it is sent
+                batch = [tuple(row) for row in db.execute(
+                    self.query().where(Document.id > last_id).limit(self.batch_size)
+                )]
+            finally:
+                db.close()
+            if not batch:
+                return
+            yield batch
+            if len(batch) < self.batch_size:
+                return
+            last_id = batch[-1][0]  # id is the first export column
+
+    def stream(self) -> Iterator[bytes]:
+        """Encoded (and optionally gzipped) export, chunk by chunk"""
+        encode = {
+            "csv": self._encode_csv,
+            "ndjson": self._encode_ndjson,
+            "parquet": self._encode_parquet,
+        }[self.export_format]
+        # wbits=31: gzip container rather than raw zlib
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if self.gzip else None
+
+        rows = 0
+        with metrics.timer("document_export"):
+            for chunk, batch_rows in encode():
+                rows += batch_rows
+                if compressor:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    yield chunk
+            if compressor:
+                yield compressor.flush()
+
+        metrics.inc("document_export_rows", rows)
+        log(f"📤 Exported {rows} document(s) as {self.export_format}{' (gzip)' if self.gzip else ''}")
+
+    # ------------------------------------------------------------------
+    # Encoders - each yields (bytes, rows in that chunk)
+    # ------------------------------------------------------------------
+    def _encode_csv(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for batch in self.batches():
+            writer.writerows(_serialize(row) for row in batch)
+            yield buffer.getvalue().encode("utf-8"), len(batch)
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            # Nothing to export: header only
+            yield buffer.getvalue().encode("utf-8"), 0
+
+    def _encode_ndjson(self):
+        for batch in self.batches():
+            lines = (json.dumps(dict(zip(EXPORT_COLUMNS, _serialize(row))), ensure_ascii=False) for row in batch)
+            yield ("\n".join(lines) + "\n").encode("utf-8"), len(batch)
+
+    def _encode_parquet(self):
+        pa, pq = _load_pyarrow()
+        sink = _DrainableSink()
+        writer = pq.ParquetWriter(sink, _parquet_schema(pa), compression="snappy")
+        try:
+            # One row group per batch, drained from the sink as soon as it is written
+            for batch in self.batches():
+                columns = [list(column) for column in zip(*batch)]
+                writer.write_table(pa.Table.from_arrays(columns, schema=writer.schema))
+                yield sink.drain(), len(batch)
+        finally:
+            writer.close()
+        yield sink.drain(), 0
+
+
+def _serialize(row: tuple) -> tuple:
+    return tuple(value.isoformat() if isinstance(value, datetime) else value for value in row)
+
+
+def _load_pyarrow():
+    """(pyarrow, pyarrow.parquet), imported on the first Parquet export - None if not installed"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:  # Parquet export is optional
+        return None
+    return pa, pq
+
+
+def _parquet_schema(pa):
+    fields = []
+    for column in EXPORT_COLUMNS:
+        if column == "id":
+            fields.append(pa.field(column, pa.int64()))
+        elif column == "has_face_photo":
+            fields.append(pa.field(column, pa.bool_()))
+        elif column == "date_sauvegarde":
+            fields.append(pa.field(column, pa.timestamp("us")))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file that hands its buffered bytes over on drain()"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
@@ -0,0 +1,385 @@
+# face_index.py
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from metrics import metrics, log
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process only, threads still serialized
+    fcntl = None
+
+MAGIC = b"FACEIDX2"
+# magic, dim, superseded, capacity, count (rows used), generation,
+# live (indexed documents), synced_count / synced_max_id (database state the index reflects)
+HEADER = struct.Struct("<8sIIQQQQQQ")
+HEADER_SIZE = 64
+# Offsets of the uint64 fields, read and written in place through the mapping
+CAPACITY_OFFSET, COUNT_OFFSET, GENERATION_OFFSET = 16, 24, 32
+LIVE_OFFSET, SYNCED_COUNT_OFFSET, SYNCED_MAX_ID_OFFSET = 40, 48, 56
+SUPERSEDED_OFFSET = 12
+DELETED_ID = -1
+
+
+class CandidateRows(NamedTuple):
+    """Matrix rows of a pre-filtered candidate set, as of one index generation"""
+    candidate_ids: np.ndarray
+    rows: np.ndarray
+    generation: int
+
+
+class SharedFaceIndex:
+    """
+    Face embeddings in one memory-mapped file shared by every worker process.
+
+    Layout: a 64-byte header, then `capacity` int64 document ids, then
+    `capacity` x `dim` float32 L2-normalized embeddings. All processes map
+    the same file, so the OS page cache holds a single copy no matter how
+    many workers run.
+
+    The header is the change-notification channel:
+    - inserts and deletes are written in place, then `count` / `generation`
+      are bumped - other workers see them on their next search;
+    - when the file is full it is rewritten (compacted, capacity doubled)
+      and swapped in with os.replace; the old file is flagged `superseded`
+      so every worker remaps on its next access.
+    Writers serialize on an flock'ed lock file next to the index.
+
+    The header also keeps the number of live documents (so len() is O(1))
+    and a sync stamp - face document count and highest document id the
+    index was last reconciled with - so callers only rescan the database
+    when it changed behind the index's back.
+    """
+
+    def __init__(self, path: str = "face_embeddings/index.bin", dim: int = 128, initial_capacity: int = 1024):
+        self.path = path
+        self.dim = dim
+        self.initial_capacity = initial_capacity
+        self._thread_lock = threading.RLock()
+        self._mm = None
+        self._sorted_cache = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._write_lock():
+            if not os.path.exists(self.path) or not self._has_current_layout():
+                # Older layouts are rebuilt empty, the next sync refills them from the embedding cache
+                self._create(f"{self.path}.tmp", initial_capacity, np.empty(0, np.int64), np.empty((0, dim), np.float32))
+                os.replace(f"{self.path}.tmp", self.path)
+        self._map()
+
+    # ------------------------------------------------------------------
+    # Reads - lock-free, any worker
+    # ------------------------------------------------------------------
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        threshold: float = 0.4,
+        top_k: int = 10,
+        candidate_ids: Optional[np.ndarray] = None,
+        candidate_rows: Optional[CandidateRows] = None
+    ) -> List[Dict]:
+        """
+        Same result shape as FaceSearchService.search_similar_faces.
+
+        `candidate_ids` (sorted) restricts scoring to those documents: only
+        their rows of the embedding matrix are multiplied, so a selective
+        pre-filter makes the search proportionally cheaper. Callers that
+        already resolved them with candidate_rows() pass that instead; it
+        is only recomputed if the index changed in between.
+        """
+        if top_k <= 0:
+            return []
+        if candidate_rows is None and candidate_ids is not None:
+            candidate_rows = self.candidate_rows(candidate_ids)
+
+        ids, vectors = self._snapshot()
+        if candidate_rows is not None:
+            if candidate_rows.generation != self._read_u64(GENERATION_OFFSET):
+                candidate_rows = self.candidate_rows(candidate_rows.candidate_ids)
+                ids, vectors = self._snapshot()
+            ids, vectors = ids[candidate_rows.rows], vectors[candidate_rows.rows]
+        if len(ids) == 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        # Cosine similarity mapped to 0-1, like compare_faces
+        similarities = (vectors @ query + 1) / 2
+        similarities[ids == DELETED_ID] = -np.inf
+
+        candidates = np.flatnonzero(similarities >= threshold)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(similarities[candidates], -top_k)[-top_k:]]
+        candidates = candidates[np.argsort(similarities[candidates])[::-1]]
+
+        return [
+            {
+                "document_id": int(ids[i]),
+                "similarity": float(similarities[i]),
+                "score_percentage": float(similarities[i]) * 100
+            }
+            for i in candidates
+        ]
+
+    def rows_for(self, candidate_ids: np.ndarray) -> np.ndarray:
+        return self.candidate_rows(candidate_ids).rows
+
+    def candidate_rows(self, candidate_ids: np.ndarray) -> CandidateRows:
+        """
+        Matrix rows of the indexed documents among `candidate_ids` (sorted).
+        Sorted-set intersection: one binary search per candidate against the
+        sorted id array, rebuilt only when the index generation changes.
+        """
+        generation, sorted_ids, sorted_rows = self._sorted_ids()
+        candidate_ids = np.asarray(candidate_ids, dtype=np.int64)
+        if not len(sorted_ids) or not len(candidate_ids):
+            return CandidateRows(candidate_ids, np.empty(0, dtype=np.int64), generation)
+        positions = np.searchsorted(sorted_ids, candidate_ids)
+        positions[positions == len(sorted_ids)] = 0
+        found = sorted_ids[positions] == candidate_ids
+        return CandidateRows(candidate_ids, sorted_rows[positions[found]], generation)
+
+    def document_ids(self) -> Set[int]:
+        ids, _ = self._snapshot()
+        return set(ids[ids != DELETED_ID].tolist())
+
+    def __len__(self) -> int:
+        self._refresh()
+        return self._read_u64(LIVE_OFFSET)
+
+    @property
+    def generation(self) -> int:
+        self._refresh()
+        return self._read_u64(GENERATION_OFFSET)
+
+    @property
+    def sync_state(self) -> Tuple[int, int]:
+        """(face document count, highest document id) of the last reconciliation"""
+        self._refresh()
+        return self._read_u64(SYNCED_COUNT_OFFSET), self._read_u64(SYNCED_MAX_ID_OFFSET)
+
+    # ------------------------------------------------------------------
+    # Writes - serialized across processes
+    # ------------------------------------------------------------------
+    def add(self, doc_id: int, embedding: np.ndarray):
+        self.add_many([doc_id], np.asarray(embedding).reshape(1, -1))
+
+    def add_many(self, doc_ids: Iterable[int], embeddings: np.ndarray):
+        """Insert or replace several embeddings under a single lock"""
+        doc_ids = [int(doc_id) for doc_id in doc_ids]
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(doc_ids), -1)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Embeddings have {vectors.shape[1]} dimensions, index expects {self.dim}")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+
+        # Last occurrence wins when an id is given twice
+        latest = dict(zip(doc_ids, range(len(doc_ids))))
+
+        with self._write_lock():
+            self._refresh()
+            count = self._read_u64(COUNT_OFFSET)
+            row_of = {doc_id: row for row, doc_id in enumerate(self._ids[:count].tolist()) if doc_id != DELETED_ID}
+
+            replaced = [(row_of[doc_id], i) for doc_id, i in latest.items() if doc_id in row_of]
+            if replaced:
+                rows, sources = zip(*replaced)
+                self._vectors[list(rows)] = vectors[list(sources)]
+
+            new = [(doc_id, i) for doc_id, i in latest.items() if doc_id not in row_of]
+            if new:
+                if count + len(new) > self._read_u64(CAPACITY_OFFSET):
+                    self._grow(extra=len(new))
+                    count = self._read_u64(COUNT_OFFSET)
+                new_ids, sources = zip(*new)
+                # Rows first, ids second, count last: readers never see a half-written row
+                self._vectors[count:count + len(new)] = vectors[list(sources)]
+                self._ids[count:count + len(new)] = new_ids
+                self._write_u64(COUNT_OFFSET, count + len(new))
+                self._write_u64(LIVE_OFFSET, self._read_u64(LIVE_OFFSET) + len(new))
+            self._bump_generation()
+        metrics.inc("face_index_add", len(latest))
+
+    def remove(self, doc_id: int) -> bool:
+        return self.remove_many([doc_id]) > 0
+
+    def remove_many(self, doc_ids: Iterable[int]) -> int:
+        """Tombstone rows; the space is reclaimed the next time the file grows"""
+        with self._write_lock():
+            self._refresh()
+            count = self._read_u64(COUNT_OFFSET)
+            rows = np.flatnonzero(np.isin(self._ids[:count], list(doc_ids)))
+            if not len(rows):
+                return 0
+            self._ids[rows] = DELETED_ID
+            self._write_u64(LIVE_OFFSET, self._read_u64(LIVE_OFFSET) - len(rows))
+            self._bump_generation()
+        metrics.inc("face_index_remove", len(rows))
+        return len(rows)
+
+    def set_sync_state(self, count: int, max_id: int):
+        with self._write_lock():
+            self._refresh()
+            self._write_u64(SYNCED_COUNT_OFFSET, count)
+            self._write_u64(SYNCED_MAX_ID_OFFSET, max_id)
+
+    def advance_sync_state(self, expected_max_id: int, max_id: int, added: int) -> bool:
+        """
+        Record that documents in (expected_max_id, max_id] were indexed, unless
+        another worker moved the stamp first. Returns True when applied.
+        """
+        with self._write_lock():
+            self._refresh()
+            if self._read_u64(SYNCED_MAX_ID_OFFSET) != expected_max_id:
+                return False
+            self._write_u64(SYNCED_COUNT_OFFSET, self._read_u64(SYNCED_COUNT_OFFSET) + added)
+            self._write_u64(SYNCED_MAX_ID_OFFSET, max_id)
+            return True
+
+    def forget_synced_document(self, doc_id: int, max_id: int):
+        """
+        A face document was deleted from the database, whose highest id is
+        now `max_id`. Lowering the stamp's max id keeps a reused id (SQLite
+        hands out max(id) + 1) from being mistaken for an indexed one.
+        """
+        with self._write_lock():
+            self._refresh()
+            count, synced_max_id = self._read_u64(SYNCED_COUNT_OFFSET), self._read_u64(SYNCED_MAX_ID_OFFSET)
+            if doc_id <= synced_max_id and count > 0:
+                self._write_u64(SYNCED_COUNT_OFFSET, count - 1)
+            self._write_u64(SYNCED_MAX_ID_OFFSET, min(synced_max_id, max_id))
+
+    def sync(self, doc_ids: Iterable[int], embedding_for: Callable[[int], Optional[np.ndarray]]) -> Dict[str, int]:
+        """
+        Make the index match `doc_ids`: add missing documents (embedding
+        computed by `embedding_for`) and drop the ones no longer listed.
+        """
+        wanted = set(doc_ids)
+        indexed = self.document_ids()
+        added = removed = 0
+
+        new_ids, new_embeddings = [], []
+        for doc_id in sorted(wanted - indexed):
+            embedding = embedding_for(doc_id)
+            if embedding is not None:
+                new_ids.append(doc_id)
+                new_embeddings.append(embedding)
+        if new_ids:
+            self.add_many(new_ids, np.stack(new_embeddings))
+            added = len(new_ids)
+
+        stale = indexed - wanted
+        if stale:
+            removed = self.remove_many(stale)
+
+        if added or removed:
+            log(f"🔄 Face index synced: {added} added, {removed} removed, {len(self)} indexed")
+        return {"added": added, "removed": removed}
+
+    # ------------------------------------------------------------------
+    # Mapping
+    # ------------------------------------------------------------------
+    def _map(self):
+        with open(self.path, "r+b") as f:
+            mm = mmap.mmap(f.fileno(), 0)
+        magic, dim, _, capacity, *_ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a face index file")
+        if dim != self.dim:
+            raise ValueError(f"{self.path} holds {dim}-d embeddings, expected {self.dim}")
+
+        # Old views are simply dropped: closing a mapping with live numpy views is not allowed
+        self._mm = mm
+        self._ids = np.frombuffer(mm, dtype=np.int64, count=capacity, offset=HEADER_SIZE)
+        self._vectors = np.frombuffer(
+            mm, dtype=np.float32, count=capacity * dim, offset=HEADER_SIZE + 8 * capacity
+        ).reshape(capacity, dim)
+
+    def _has_current_layout(self) -> bool:
+        with open(self.path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        return len(header) == HEADER_SIZE and header[:8] == MAGIC
+
+    def _refresh(self):
+        """Remap if another worker swapped in a new file"""
+        with self._thread_lock:
+            if struct.unpack_from("<I", self._mm, SUPERSEDED_OFFSET)[0]:
+                self._map()
+                metrics.inc("face_index_remap")
+
+    def _snapshot(self):
+        self._refresh()
+        count = self._read_u64(COUNT_OFFSET)
+        return self._ids[:count], self._vectors[:count]
+
+    def _sorted_ids(self):
+        """(generation, live ids in ascending order, their row numbers), cached per generation"""
+        with self._thread_lock:
+            self._refresh()
+            generation = self._read_u64(GENERATION_OFFSET)
+            if self._sorted_cache is None or self._sorted_cache[0] != generation:
+                ids, _ = self._snapshot()
+                live_rows = np.flatnonzero(ids != DELETED_ID)
+                order = np.argsort(ids[live_rows], kind="stable")
+                self._sorted_cache = (generation, ids[live_rows][order], live_rows[order])
+            return self._sorted_cache
+
+    def _grow(self, extra: int):
+        # Caller holds the write lock. Deleted rows are dropped on the way.
+        count = self._read_u64(COUNT_OFFSET)
+        live = self._ids[:count] != DELETED_ID
+        ids, vectors = self._ids[:count][live], self._vectors[:count][live]
+        capacity = max(self.initial_capacity, 2 * (len(ids) + extra))
+
+        temp_path = f"{self.path}.tmp"
+        # The generation keeps counting across files, so it never goes backwards
+        self._create(temp_path, capacity, ids, vectors, self._read_u64(GENERATION_OFFSET) + 1,
+                     (self._read_u64(SYNCED_COUNT_OFFSET), self._read_u64(SYNCED_MAX_ID_OFFSET)))
+        os.replace(temp_path, self.path)
+
+        # Tell every worker still mapping the old file to remap
+        struct.pack_into("<I", self._mm, SUPERSEDED_OFFSET, 1)
+        self._mm.flush()
+        self._map()
+        log(f"📈 Face index resized to {capacity} slots ({count - len(ids)} deleted rows dropped)")
+
+    def _create(self, path: str, capacity: int, ids: np.ndarray, vectors: np.ndarray, generation: int = 0,
+                sync_state: Tuple[int, int] = (0, 0)):
+        with open(path, "wb") as f:
+            # Only live rows are copied, so live == count in a fresh file
+            f.write(HEADER.pack(MAGIC, self.dim, 0, capacity, len(ids), generation, len(ids), *sync_state))
+            id_block = np.full(capacity, DELETED_ID, dtype=np.int64)
+            id_block[:len(ids)] = ids
+            f.write(id_block.tobytes())
+            vector_block = np.zeros((capacity, self.dim), dtype=np.float32)
+            vector_block[:len(vectors)] = vectors
+            f.write(vector_block.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _read_u64(self, offset: int) -> int:
+        return struct.unpack_from("<Q", self._mm, offset)[0]
+
+    def _write_u64(self, offset: int, value: int):
+        struct.pack_into("<Q", self._mm, offset, value)
+
+    def _bump_generation(self):
+        self._write_u64(GENERATION_OFFSET, self._read_u64(GENERATION_OFFSET) + 1)
+
+    @contextmanager
+    def _write_lock(self):
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,327 @@
+# face_stream.py
+import asyncio
+import itertools
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from imaging import decode_image
+from metrics import metrics, log
+
+# Track lifecycle: pending -> searching -> matched / no_match (no_face after failed attempts)
+TRACK_PENDING = "pending"
+TRACK_SEARCHING = "searching"
+TRACK_MATCHED = "matched"
+TRACK_NO_MATCH = "no_match"
+TRACK_NO_FACE = "no_face"
+
+Box = Tuple[int, int, int, int]
+
+
+def box_iou(a: Box, b: Box) -> float:
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+class Track:
+    """One face followed across frames"""
+
+    def __init__(self, track_id: int, box: Box):
+        self.track_id = track_id
+        self.box = box
+        self.hits = 1
+        self.missed = 0
+        self.lost = False
+        self.status = TRACK_PENDING
+        self.attempts = 0
+        self.matches: List[Dict] = []
+
+
+class FaceTracker:
+    """
+    Greedy IoU tracker: each detection extends the overlapping track with
+    the highest IoU, or starts a new one. A track is confirmed after
+    `min_hits` detections (filters one-frame false positives) and lost
+    after `max_missed` frames without a detection.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, min_hits: int = 2, max_missed: int = 10):
+        self.iou_threshold = iou_threshold
+        self.min_hits = min_hits
+        self.max_missed = max_missed
+        self.tracks: Dict[int, Track] = {}
+        self._ids = itertools.count(1)
+
+    def update(self, boxes: List[Box]) -> Tuple[List[Track], List[Track]]:
+        """Feed one frame's detections. Returns (visible tracks, tracks lost on this frame)"""
+        pairs = sorted(
+            ((box_iou(track.box, box), track_id, i)
+             for track_id, track in self.tracks.items()
+             for i, box in enumerate(boxes)),
+            reverse=True
+        )
+        matched_tracks, matched_boxes = set(), set()
+        for iou, track_id, i in pairs:
+            if iou < self.iou_threshold:
+                break
+            if track_id in matched_tracks or i in matched_boxes:
+                continue
+            track = self.tracks[track_id]
+            track.box, track.hits, track.missed = boxes[i], track.hits + 1, 0
+            matched_tracks.add(track_id)
+            matched_boxes.add(i)
+
+        for i, box in enumerate(boxes):
+            if i not in matched_boxes:
+                track = Track(next(self._ids), box)
+                self.tracks[track.track_id] = track
+                matched_tracks.add(track.track_id)
+                metrics.inc("face_stream_track_started")
+
+        lost = []
+        for track_id in list(self.tracks):
+            if track_id not in matched_tracks:
+                track = self.tracks[track_id]
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    track.lost = True
+                    lost.append(self.tracks.pop(track_id))
+
+        visible = [self.tracks[track_id] for track_id in sorted(matched_tracks)]
+        return visible, lost
+
+    def confirmed(self, track: Track) -> bool:
+        return track.hits >= self.min_hits
+
+
+class LatestFrame:
+    """
+    Single-slot mailbox between the socket reader and the frame processor.
+    A frame arriving while the previous one still waits replaces it, so
+    the processor always works on the newest frame and never builds a backlog.
+    """
+
+    def __init__(self):
+        self.dropped = 0
+        self._frame: Optional[bytes] = None
+        self._closed = False
+        self._ready = asyncio.Event()
+
+    def put(self, frame: bytes):
+        if self._frame is not None:
+            self.dropped += 1
+            metrics.inc("face_stream_frame_dropped")
+        self._frame = frame
+        self._ready.set()
+
+    async def take(self) -> Optional[bytes]:
+        """Next frame to process, None once closed"""
+        await self._ready.wait()
+        self._ready.clear()
+        frame, self._frame = self._frame, None
+        return None if self._closed else frame
+
+    def close(self):
+        self._closed = True
+        self._ready.set()
+
+
+class FaceStreamSession:
+    """
+    Real-time face search over one video stream (one WebSocket).
+
+    Every processed frame goes through cheap steps only: reduced decoding,
+    Haar detection at `frame_side` pixels and IoU tracking. The expensive
+    steps - embedding and index search - run once per confirmed track, in
+    a separate task, so a face staying in view costs a single search.
+
+    `extract_embedding` maps a face crop (BGR array) to an embedding, and
+    `search` maps an embedding to the list of matches. `embedding_slots`
+    bounds the embeddings computed at once across all sessions.
+    """
+
+    def __init__(
+        self,
+        extract_embedding: Callable[[np.ndarray], Optional[np.ndarray]],
+        search: Callable[[np.ndarray], List[Dict]],
+        embedding_slots: asyncio.Semaphore,
+        frame_side: int = 640,
+        max_frame_bytes: int = 2 * 1024 * 1024,
+        max_attempts: int = 3,
+        tracker: Optional[FaceTracker] = None,
+    ):
+        self.extract_embedding = extract_embedding
+        self.search = search
+        self.embedding_slots = embedding_slots
+        self.frame_side = frame_side
+        self.max_frame_bytes = max_frame_bytes
+        self.max_attempts = max_attempts
+        self.tracker = tracker or FaceTracker()
+        self.frames_received = 0
+        self.frames_processed = 0
+        self.searches = 0
+        import cv2
+        self._cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+    # ------------------------------------------------------------------
+    # Blocking steps - run in a worker thread
+    # ------------------------------------------------------------------
+    def process_frame(self, frame_bytes: bytes) -> Tuple[Dict, List[Tuple[Track, np.ndarray]]]:
+        """
+        Detect and track faces on one frame. Returns the message for the
+        client and the (track, face crop) pairs that need identifying.
+        """
+        import cv2
+        start = time.perf_counter()
+        with metrics.timer("face_stream_frame"):
+            img = decode_image(frame_bytes, max_side=self.frame_side)
+            if img is None:
+                return {"type": "error", "detail": "Frame is not a decodable image"}, []
+            scale = self.frame_side / max(img.shape[:2])
+            if scale < 1.0:
+                img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            min_side = max(24, self.frame_side // 16)
+            faces = self._cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5, minSize=(min_side, min_side))
+            visible, lost = self.tracker.update([tuple(int(v) for v in face) for face in faces])
+
+        to_identify = []
+        for track in visible:
+            if track.status == TRACK_PENDING and self.tracker.confirmed(track):
+                track.status = TRACK_SEARCHING
+                to_identify.append((track, self._crop(img, track.box)))
+
+        self.frames_processed += 1
+        height, width = img.shape[:2]
+        return {
+            "type": "frame",
+            "frame": self.frames_processed,
+            "faces": [
+                {
+                    "track_id": track.track_id,
+                    # Fractions of the frame size, independent of the resolution sent
+                    "box": [round(track.box[0] / width, 4), round(track.box[1] / height, 4),
+                            round(track.box[2] / width, 4), round(track.box[3] / height, 4)],
+                    "status": track.status,
+                    "best_match": track.matches[0] if track.matches else None,
+                }
+                for track in visible
+            ],
+            "lost": [track.track_id for track in lost],
+            "processing_ms": round((time.perf_counter() - start) * 1000, 1),
+        }, to_identify
+
+    def identify(self, track: Track, face_crop: np.ndarray) -> Dict:
+        """Embedding + index search for one track"""
+        start = time.perf_counter()
+        track.attempts += 1
+        with metrics.timer("face_stream_identify"):
+            embedding = self.extract_embedding(face_crop)
+            if embedding is None:
+                # Retried on a later frame, with a new crop
+                track.status = TRACK_PENDING if track.attempts < self.max_attempts else TRACK_NO_FACE
+            else:
+                track.matches = self.search(embedding)
+                track.status = TRACK_MATCHED if track.matches else TRACK_NO_MATCH
+                self.searches += 1
+        metrics.inc(f"face_stream_{track.status}")
+        return {
+            "type": "identity",
+            "track_id": track.track_id,
+            "status": track.status,
+            "matches": track.matches,
+            "attempts": track.attempts,
+            "identify_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    @staticmethod
+    def _crop(img: np.ndarray, box: Box) -> np.ndarray:
+        # Same padding as extract_face_photo, so the crop looks like the indexed photos
+        x, y, w, h = box
+        padding = int(w * 0.2)
+        x0, y0 = max(0, x - padding), max(0, y - padding)
+        x1, y1 = min(img.shape[1], x + w + padding), min(img.shape[0], y + h + padding)
+        return img[y0:y1, x0:x1].copy()
+
+    # ------------------------------------------------------------------
+    # Connection loop
+    # ------------------------------------------------------------------
+    async def run(
+        self,
+        receive_frame: Callable[[], Awaitable[Optional[bytes]]],
+        send_json: Callable[[Dict], Awaitable[None]],
+    ):
+        """
+        Serve the stream until `receive_frame` returns None (disconnect).
+
+        Three tasks: this one reads frames into a LatestFrame slot, a
+        processor detects/tracks the newest frame, an identifier embeds and
+        searches confirmed tracks. Slow identification never stalls tracking,
+        and slow tracking drops frames instead of queueing them.
+        """
+        slot = LatestFrame()
+        pending: "asyncio.Queue[Tuple[Track, np.ndarray]]" = asyncio.Queue()
+        send_lock = asyncio.Lock()
+
+        async def send(message: Dict):
+            async with send_lock:
+                await send_json(message)
+
+        async def processor():
+            while (frame := await slot.take()) is not None:
+                try:
+                    message, to_identify = await asyncio.to_thread(self.process_frame, frame)
+                except Exception as e:
+                    log(f"❌ Face stream frame error: {str(e)}")
+                    message, to_identify = {"type": "error", "detail": f"Frame processing failed: {str(e)}"}, []
+                if message["type"] == "frame":
+                    message["dropped_frames"] = slot.dropped
+                for item in to_identify:
+                    pending.put_nowait(item)
+                await send(message)
+
+        async def identifier():
+            while True:
+                track, face_crop = await pending.get()
+                if track.lost:
+                    continue
+                try:
+                    async with self.embedding_slots:
+                        message = await asyncio.to_thread(self.identify, track, face_crop)
+                except Exception as e:
+                    log(f"❌ Face stream identification error: {str(e)}")
+                    track.status = TRACK_PENDING if track.attempts < self.max_attempts else TRACK_NO_FACE
+                    message = {"type": "error", "track_id": track.track_id, "detail": f"Face search failed: {str(e)}"}
+                await send(message)
+
+        metrics.inc("face_stream_session")
+        workers = [asyncio.create_task(processor()), asyncio.create_task(identifier())]
+        try:
+            while (frame := await receive_frame()) is not None:
+                self.frames_received += 1
+                metrics.inc("face_stream_frame_received")
+                if not frame:
+                    await send({"type": "error", "detail": "Frames must be sent as binary JPEG/PNG/WebP messages"})
+                elif len(frame) > self.max_frame_bytes:
+                    await send({"type": "error", "detail": f"Frame too large (max {self.max_frame_bytes // 1024} KB)"})
+                else:
+                    slot.put(frame)
+                # Surface a crashed worker instead of reading frames nobody processes
+                for worker in workers:
+                    if worker.done():
+                        worker.result()
+        finally:
+            slot.close()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            log(f"📹 Face stream closed: {self.frames_received} frames received, "
+                f"{self.frames_processed} processed, {slot.dropped} dropped, {self.searches} searches")
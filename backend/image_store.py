@@ -0,0 +1,181 @@
+# image_store.py
+import hashlib
+import os
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from database import ImageBlob, SessionLocal
+from metrics import metrics, log
+
+
+class ImageStore:
+    """
+    Content-addressed image storage.
+
+    Files live under `<root>/<h[0:2]>/<h[2:4]>/<sha256><ext>` so that no
+    directory grows past a few thousand entries, and identical bytes are
+    stored once. The number of documents pointing at each file is tracked
+    in the `image_blobs` table; the file is removed when it drops to zero.
+    Paths use forward slashes so they double as URLs under /images.
+
+    Files are only created or unlinked while holding the SQLite write lock
+    (put: after its upsert, until the caller commits; remove_unreferenced:
+    around the ref_count check), so a save and a delete of the same bytes
+    never leave a referenced blob without its file.
+    """
+
+    # Session.info key listing the files written by put() in the current transaction
+    NEW_FILES_KEY = "image_store_new_files"
+
+    def __init__(self, root: str = "images", shard_depth: int = 2):
+        self.root = root
+        self.shard_depth = shard_depth
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, digest: str, extension: str = ".jpg") -> str:
+        """Storage path of a blob, relative to the backend folder"""
+        shards = [digest[i * 2:i * 2 + 2] for i in range(self.shard_depth)]
+        return "/".join([self.root, *shards, f"{digest}{extension}"])
+
+    def is_content_addressed(self, path: Optional[str]) -> bool:
+        """True if `path` was produced by this store (as opposed to a legacy flat file)"""
+        if not path:
+            return False
+        parts = path.replace(os.sep, "/").split("/")
+        digest = os.path.splitext(parts[-1])[0]
+        return (
+            len(parts) == self.shard_depth + 2
+            and parts[0] == self.root
+            and len(digest) == 64
+            and self.path_for(digest, os.path.splitext(parts[-1])[1]) == "/".join(parts)
+        )
+
+    def put(self, db: Session, data: bytes, extension: str = ".jpg") -> str:
+        """
+        Store `data` (once) and take a reference on it.
+
+        The reference is added to the caller's session, so it becomes
+        permanent with the caller's commit. If the caller rolls back instead,
+        it calls rollback_files() to drop the file written here.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest, extension)
+
+        if os.path.exists(path):
+            metrics.inc("image_store_dedup_hit")
+        else:
+            self._write_new(db, path, data)
+
+        # Upsert: concurrent saves of the same bytes must not collide on the primary key
+        db.execute(
+            insert(ImageBlob)
+            .values(sha256=digest, path=path, size=len(data), ref_count=1, created_at=datetime.now())
+            .on_conflict_do_update(
+                index_elements=[ImageBlob.sha256],
+                set_={"ref_count": ImageBlob.ref_count + 1},
+            )
+        )
+
+        # The upsert holds the write lock until the caller commits. A delete
+        # that dropped the last reference and unlinked the file after the
+        # check above is done by now: write the file again.
+        if not os.path.exists(path):
+            metrics.inc("image_store_rewrite")
+            self._write_new(db, path, data)
+        return path
+
+    def rollback_files(self, db: Session):
+        """Remove the files put() wrote in a transaction the caller rolled back"""
+        for path in db.info.pop(self.NEW_FILES_KEY, []):
+            self.remove_unreferenced(path)
+
+    def release(self, db: Session, path: Optional[str]) -> Optional[str]:
+        """
+        Drop one reference on `path`.
+
+        Returns the path to delete once the caller has committed (last
+        reference gone, or legacy file without a blob row), else None.
+        """
+        if not path:
+            return None
+        if not self.is_content_addressed(path):
+            return path  # legacy files belong to exactly one document
+
+        digest = os.path.splitext(os.path.basename(path))[0]
+        db.execute(
+            update(ImageBlob)
+            .where(ImageBlob.sha256 == digest)
+            .values(ref_count=ImageBlob.ref_count - 1)
+        )
+        blob = db.get(ImageBlob, digest)
+        if blob is None or blob.ref_count <= 0:
+            if blob is not None:
+                db.delete(blob)
+            return path
+        return None
+
+    def remove_unreferenced(self, path: str):
+        """
+        Delete a file returned by release() once the caller has committed,
+        unless a save took a new reference on the same bytes meanwhile.
+        """
+        if not self.is_content_addressed(path):
+            self.remove_file(path)
+            return
+
+        digest = os.path.splitext(os.path.basename(path))[0]
+        db = SessionLocal()
+        try:
+            # The DELETE takes the write lock first: a concurrent put() has
+            # either committed its reference (seen below) or waits for this
+            # transaction and rewrites the file
+            db.execute(delete(ImageBlob).where(ImageBlob.sha256 == digest, ImageBlob.ref_count <= 0))
+            if db.get(ImageBlob, digest) is None:
+                self.remove_file(path)
+            else:
+                metrics.inc("image_store_unlink_skipped")
+            db.commit()
+        finally:
+            db.close()
+
+    def remove_file(self, path: str):
+        """Delete a file whose last reference has been committed away"""
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+                log(f"✅ Deleted photo: {path}")
+        except OSError as e:
+            log(f"⚠️ Warning: Could not delete photo: {str(e)}")
+
+    def _write_new(self, db: Session, path: str, data: bytes):
+        self._atomic_write(path, data)
+        db.info.setdefault(self.NEW_FILES_KEY, []).append(path)
+
+    def _atomic_write(self, path: str, data: bytes):
+        """Write to a temp file in the target directory, then rename over the final name"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        temp_path = os.path.join(directory, f".tmp-{uuid.uuid4().hex}")
+        try:
+            with metrics.timer("file_write"):
+                with open(temp_path, "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def image_url(path: Optional[str], images_folder: str = "images") -> Optional[str]:
+    """URL under the /images mount for a stored photo path"""
+    if not path:
+        return None
+    relative = os.path.relpath(path, images_folder).replace(os.sep, "/")
+    return f"/images/{relative}"
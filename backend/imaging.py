@@ -0,0 +1,88 @@
+# imaging.py
+import io
+from typing import Optional, Tuple
+
+import numpy as np
+
+from metrics import metrics
+
+try:
+    from PIL import Image
+except ImportError:  # without Pillow images are always decoded at full resolution
+    Image = None
+
+# OpenCV is imported by the functions that decode, not at import time:
+# processes serving only database routes never load it
+
+
+def decode_flags(factor: int, grayscale: bool = False) -> int:
+    """imdecode flags for a 1/2/4/8 reduced decode - libjpeg then never allocates the full-size buffer"""
+    import cv2
+    if grayscale:
+        return {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+                4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8}[factor]
+    return {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+            4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}[factor]
+
+
+def image_dimensions(image_bytes: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) read from the file header only, None if unknown"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def reduction_factor(width: int, height: int, max_side: int) -> int:
+    """Largest 1/2/4/8 downscale that keeps the long side at least `max_side` pixels"""
+    for factor in (8, 4, 2):
+        if max(width, height) // factor >= max_side:
+            return factor
+    return 1
+
+
+def decode_image(image_bytes: bytes, max_side: Optional[int] = None, grayscale: bool = False) -> Optional[np.ndarray]:
+    """
+    Decode image bytes (None if not an image). With `max_side`, large
+    images are decoded at a reduced scale whose long side stays >= max_side.
+    """
+    import cv2
+    factor = 1
+    if max_side:
+        dimensions = image_dimensions(image_bytes)
+        if dimensions:
+            factor = reduction_factor(*dimensions, max_side)
+    flags = decode_flags(factor, grayscale)
+    if factor > 1:
+        metrics.inc(f"image_decode_reduced_{factor}")
+
+    with metrics.timer("image_decode"):
+        return cv2.imdecode(np.frombuffer(image_bytes, np.uint8), flags)
+
+
+def fit_image(image_bytes: bytes, content_type: str, max_side: int, quality: int = 90) -> Tuple[bytes, str]:
+    """
+    Image whose long side is at most `max_side`: unchanged if it already
+    fits, otherwise decoded at reduced scale, resized and re-encoded as JPEG.
+    """
+    dimensions = image_dimensions(image_bytes)
+    if dimensions is None or max(dimensions) <= max_side:
+        return image_bytes, content_type
+
+    import cv2  # only once a resize is needed
+    img = decode_image(image_bytes, max_side=max_side)
+    if img is None:
+        return image_bytes, content_type
+    scale = max_side / max(img.shape[:2])
+    if scale < 1.0:
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    with metrics.timer("image_encode"):
+        success, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not success:
+        return image_bytes, content_type
+    metrics.inc("image_downscaled")
+    return encoded.tobytes(), "image/jpeg"
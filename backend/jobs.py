@@ -0,0 +1,302 @@
+# jobs.py
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import or_, and_, update
+
+from database import SessionLocal, OCRJob
+from metrics import metrics, log, trace_id_var
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = (JOB_DONE, JOB_FAILED)
+
+
+class JobQueue:
+    """
+    Persistent OCR job queue backed by the ocr_jobs table.
+
+    Jobs are claimed highest priority first, then oldest first. A claimed
+    job holds a lease (`lease_seconds`): if the process dies mid-job the
+    lease expires and another worker picks it up, so jobs survive restarts.
+    A failed attempt is retried with exponential backoff until
+    `max_attempts` is reached.
+
+    The recto of a done job is kept in the row until /save consumes it
+    (release_input), so the job id stays usable after a restart or on
+    another worker. Unclaimed inputs are dropped after
+    `input_retention_seconds`.
+
+    `handlers` maps a job kind to a function taking the OCRJob and returning
+    a JSON-serializable result.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, Callable[[OCRJob], dict]],
+        workers: int = 4,
+        max_attempts: int = 3,
+        lease_seconds: float = 300,
+        poll_interval: float = 1.0,
+        input_retention_seconds: float = 24 * 3600,
+    ):
+        self.handlers = handlers
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.input_retention_seconds = input_retention_seconds
+        self._next_purge = 0.0
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    # ------------------------------------------------------------------
+    # Client side
+    # ------------------------------------------------------------------
+    def submit(
+        self,
+        kind: str,
+        recto: bytes,
+        recto_content_type: str,
+        verso: Optional[bytes] = None,
+        verso_content_type: Optional[str] = None,
+        priority: int = 0,
+    ) -> OCRJob:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+
+        now = datetime.now()
+        job = OCRJob(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            status=JOB_QUEUED,
+            priority=priority,
+            attempts=0,
+            max_attempts=self.max_attempts,
+            recto=recto,
+            recto_content_type=recto_content_type,
+            verso=verso,
+            verso_content_type=verso_content_type,
+            created_at=now,
+            updated_at=now,
+            available_at=now,
+        )
+        db = SessionLocal()
+        try:
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            db.expunge(job)
+        finally:
+            db.close()
+
+        metrics.inc("job_submitted")
+        self._wakeup.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        db = SessionLocal()
+        try:
+            job = db.query(OCRJob).filter(OCRJob.id == job_id).first()
+            return self.describe(job) if job else None
+        finally:
+            db.close()
+
+    @staticmethod
+    def describe(job: OCRJob) -> dict:
+        return {
+            "job_id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "priority": job.priority,
+            "attempts": job.attempts,
+            "created_at": job.created_at,
+            "updated_at": job.updated_at,
+            "result": json.loads(job.result) if job.result else None,
+            "error": job.error,
+        }
+
+    def get_input(self, job_id: str) -> Optional[Tuple[bytes, str]]:
+        """(recto, content type) of a done job, None once consumed or purged"""
+        db = SessionLocal()
+        try:
+            row = db.query(OCRJob.recto, OCRJob.recto_content_type)\
+                .filter(OCRJob.id == job_id, OCRJob.status == JOB_DONE, OCRJob.recto.isnot(None))\
+                .first()
+            return (row.recto, row.recto_content_type) if row else None
+        finally:
+            db.close()
+
+    def release_input(self, job_id: str):
+        """Drop the inputs of a job once its document is saved"""
+        db = SessionLocal()
+        try:
+            db.execute(update(OCRJob).where(OCRJob.id == job_id).values(recto=None, verso=None))
+            db.commit()
+        finally:
+            db.close()
+
+    def purge_inputs(self) -> int:
+        """Drop the inputs of done jobs never saved within the retention period"""
+        cutoff = datetime.now() - timedelta(seconds=self.input_retention_seconds)
+        db = SessionLocal()
+        try:
+            purged = db.execute(
+                update(OCRJob)
+                .where(OCRJob.status == JOB_DONE, OCRJob.recto.isnot(None), OCRJob.updated_at < cutoff)
+                .values(recto=None, verso=None)
+            ).rowcount
+            db.commit()
+        finally:
+            db.close()
+        if purged:
+            metrics.inc("job_input_purged", purged)
+            log(f"🧹 Dropped the inputs of {purged} unsaved job(s)")
+        return purged
+
+    def pending_count(self) -> int:
+        db = SessionLocal()
+        try:
+            return db.query(OCRJob).filter(OCRJob.status.in_((JOB_QUEUED, JOB_RUNNING))).count()
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+    def start(self):
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"ocr-job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        log(f"✅ OCR job queue started with {self.workers} worker(s), {self.pending_count()} pending job(s)")
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def claim(self) -> Optional[OCRJob]:
+        """
+        Take the next runnable job: queued and past its backoff, or running
+        with an expired lease. The conditional UPDATE makes the claim safe
+        between concurrent workers (threads or processes).
+        """
+        db = SessionLocal()
+        try:
+            while True:
+                now = datetime.now()
+                runnable = or_(
+                    and_(OCRJob.status == JOB_QUEUED, OCRJob.available_at <= now),
+                    and_(OCRJob.status == JOB_RUNNING, OCRJob.locked_until < now),
+                )
+                candidate = db.query(OCRJob.id)\
+                    .filter(runnable)\
+                    .order_by(OCRJob.priority.desc(), OCRJob.created_at)\
+                    .first()
+                if candidate is None:
+                    return None
+
+                claimed = db.execute(
+                    update(OCRJob)
+                    .where(OCRJob.id == candidate.id, runnable)
+                    .values(
+                        status=JOB_RUNNING,
+                        attempts=OCRJob.attempts + 1,
+                        locked_until=now + timedelta(seconds=self.lease_seconds),
+                        updated_at=now,
+                    )
+                )
+                db.commit()
+                if claimed.rowcount == 1:
+                    job = db.query(OCRJob).filter(OCRJob.id == candidate.id).first()
+                    db.expunge(job)
+                    return job
+                # Another worker got there first, try the next one
+        finally:
+            db.close()
+
+    def run_one(self) -> bool:
+        """Claim and process a single job. Returns False when the queue is empty."""
+        job = self.claim()
+        if job is None:
+            return False
+
+        trace_id_var.set(f"job-{job.id[:8]}")
+        metrics.observe("job_queue_wait", (datetime.now() - job.created_at).total_seconds())
+        try:
+            with metrics.timer(f"job_{job.kind}"):
+                result = self.handlers[job.kind](job)
+        except Exception as e:
+            self._fail(job, str(e))
+        else:
+            self._finish(job, JOB_DONE, result=json.dumps(result, default=str))
+            metrics.inc("job_done")
+            log(f"✅ Job {job.id} done (attempt {job.attempts})")
+        return True
+
+    def _fail(self, job: OCRJob, error: str):
+        if job.attempts < job.max_attempts:
+            backoff = 2 ** job.attempts
+            db = SessionLocal()
+            try:
+                db.execute(
+                    update(OCRJob)
+                    .where(OCRJob.id == job.id)
+                    .values(
+                        status=JOB_QUEUED,
+                        error=error,
+                        locked_until=None,
+                        available_at=datetime.now() + timedelta(seconds=backoff),
+                        updated_at=datetime.now(),
+                    )
+                )
+                db.commit()
+            finally:
+                db.close()
+            metrics.inc("job_retry")
+            log(f"⚠️ Job {job.id} attempt {job.attempts} failed, retry in {backoff}s: {error}")
+        else:
+            self._finish(job, JOB_FAILED, error=error)
+            metrics.inc("job_failed")
+            log(f"❌ Job {job.id} failed after {job.attempts} attempt(s): {error}")
+
+    def _finish(self, job: OCRJob, status: str, result: Optional[str] = None, error: Optional[str] = None):
+        values = dict(status=status, result=result, error=error, locked_until=None, updated_at=datetime.now())
+        if status == JOB_FAILED:
+            # Nothing to save from a failed job; a done one keeps its recto for /save
+            values.update(recto=None, verso=None)
+        db = SessionLocal()
+        try:
+            db.execute(update(OCRJob).where(OCRJob.id == job.id).values(**values))
+            db.commit()
+        finally:
+            db.close()
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                if self.run_one():
+                    continue
+            except Exception as e:
+                log(f"❌ Job worker error: {str(e)}")
+                time.sleep(self.poll_interval)
+            if time.monotonic() >= self._next_purge:
+                self._next_purge = time.monotonic() + 600
+                try:
+                    self.purge_inputs()
+                except Exception as e:
+                    log(f"❌ Job input purge error: {str(e)}")
+            # Idle: sleep until a submit wakes us up (or poll for retries coming due)
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
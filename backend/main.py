@@ -1,21 +1,32 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import APIRouter, FastAPI, File, Form, Query, UploadFile, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from groq import Groq
 from pydantic import BaseModel
-from database import SessionLocal, Document, get_db
+from database import SessionLocal, Document, get_db, BIRTH_YEAR, LIEU_NAISSANCE_KEY, place_key
 from sqlalchemy.orm import Session
 from fastapi import Depends
 import base64
 import json
 import os
 from typing import List
-from sqlalchemy import desc
-import cv2
+from sqlalchemy import desc, func
 import numpy as np
 from datetime import datetime
-from typing import Dict, Optional
-from fastapi.staticfiles import StaticFiles
-from deepface_service import face_search_service
+from typing import Dict, Optional, Union
+from fastapi.responses import PlainTextResponse, FileResponse, Response, StreamingResponse, JSONResponse
+from deepface_service import face_search_service, deepface_loaded, FaceEmbeddingError, EMBEDDING_MODEL_VERSION
+from query_cache import QueryEmbeddingCache, NO_FACE
+from face_index import SharedFaceIndex
+from face_stream import FaceStreamSession
+from metrics import metrics, log, new_trace_id, trace_id_var
+from image_store import ImageStore, image_url
+from thumbnails import ThumbnailCache, CachedStaticFiles, THUMBNAIL_SIZES
+from staging import UploadStaging, StagedUpload, UploadTooLarge
+from ocr import build_ocr_extractor
+from imaging import decode_image as decode_reduced
+from export import DocumentExport
+from jobs import JobQueue, FINISHED_STATUSES
+import time
+import asyncio
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -29,92 +40,211 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# CORS Configuration
+# CORS Configuration - also checked by hand on WebSockets, which CORS does not cover
+CORS_ALLOWED_ORIGINS = ["http://localhost:3000", "http://localhost:5173", "http://localhost:5174"]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://localhost:5173", "http://localhost:5174"],
+    allow_origins=CORS_ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
-# Add this after creating your app, before the routes
-app.mount("/images", StaticFiles(directory="images"), name="images")
+# Upload limits - checked on the request body first, then per file while reading
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_MB", "15")) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+class RequestBodyTooLarge(Exception):
+    pass
+
+class RequestBodyLimit:
+    """
+    ASGI middleware refusing request bodies over `max_bytes` with 413.
+
+    A declared Content-Length is checked up front. Chunked bodies (no
+    Content-Length) are counted as they are received, so the multipart
+    parser stops spooling as soon as the limit is crossed.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            return await self._reject(scope, receive, send)
+        
+        received = 0
+        exceeded = False
+        response_started = False
+        
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise RequestBodyTooLarge()
+            return message
+        
+        async def guarded_send(message):
+            nonlocal response_started
+            if exceeded and not response_started:
+                return  # whatever the app made of the aborted body, the 413 below replaces it
+            response_started = response_started or message["type"] == "http.response.start"
+            await send(message)
+        
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded or response_started:
+                raise
+        if exceeded and not response_started:
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope, receive, send):
+        metrics.inc("upload_rejected_too_large")
+        response = JSONResponse(status_code=413, content={"detail": "Request body too large"})
+        await response(scope, receive, send)
+
+# Two images at most per request (/ocr/card, /jobs/ocr) plus multipart overhead
+app.add_middleware(RequestBodyLimit, max_bytes=2 * UPLOAD_MAX_BYTES + 64 * 1024)
+
+# Request tracing - one trace id per request, echoed back in X-Request-ID
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    trace_id = request.headers.get("X-Request-ID") or new_trace_id()
+    token = trace_id_var.set(trace_id)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        duration = time.perf_counter() - start
+        route_path = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.observe(f"http {request.method} {route_path}", duration)
+        # uvicorn's access log has method, path and status: only add what it lacks
+        log(f"⏱️ {route_path} handled in {duration * 1000:.1f} ms")
+        trace_id_var.reset(token)
+    response.headers["X-Request-ID"] = trace_id
+    return response
+
 # Environment Variables
+# OCR engine policy: "groq" (remote LLM), "local" (Tesseract) or "local_first"
+OCR_ENGINE = os.getenv("OCR_ENGINE", "groq")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-if not GROQ_API_KEY:
+if not GROQ_API_KEY and OCR_ENGINE != "local":
     raise ValueError("GROQ_API_KEY environment variable is required")
 
-# SINGLE IMAGES FOLDER - All photos saved here
+ocr_extractor = build_ocr_extractor(
+    OCR_ENGINE,
+    api_key=GROQ_API_KEY,
+    min_confidence=float(os.getenv("OCR_MIN_CONFIDENCE", "0.75")),
+    tesseract_lang=os.getenv("TESSERACT_LANG", "fra"),
+    max_image_side=int(os.getenv("OCR_MAX_IMAGE_SIDE", "2000"))
+)
+
+# Long side used to decode photos for face detection (reduced JPEG decoding above it)
+FACE_DECODE_MAX_SIDE = int(os.getenv("FACE_DECODE_MAX_SIDE", "2000"))
+
+# SINGLE IMAGES FOLDER - All photos saved here (sharded by content hash)
 IMAGES_FOLDER = "images"
 os.makedirs(IMAGES_FOLDER, exist_ok=True)
+image_store = ImageStore(IMAGES_FOLDER)
+thumbnail_cache = ThumbnailCache(image_store)
+
+# Full-size photos - content-addressed files are served as immutable
+app.mount("/images", CachedStaticFiles(directory=IMAGES_FOLDER, image_store=image_store), name="images")
+
+# Size used for photo_url in face search results
+SEARCH_THUMBNAIL_SIZE = 256
+# Upper bound on top_k for /face/search and /face/stream
+FACE_SEARCH_MAX_TOP_K = 100
+
+# Face search profile - DeepFace/TensorFlow cost seconds and hundreds of MB:
+#   "lazy"    face routes enabled, model loaded by the first face search (default)
+#   "preload" face routes enabled, model loaded and index synced at startup
+#   "off"     no /face/search or /face/stream, the model is never loaded
+FACE_SEARCH_PROFILES = ("lazy", "preload", "off")
+FACE_SEARCH = os.getenv("FACE_SEARCH", "lazy")
+if FACE_SEARCH not in FACE_SEARCH_PROFILES:
+    raise ValueError(f"Unknown FACE_SEARCH profile '{FACE_SEARCH}'. Allowed: {', '.join(FACE_SEARCH_PROFILES)}")
+# Routes needing the face model, only registered when FACE_SEARCH is not "off"
+face_router = APIRouter()
+
+# Face embeddings shared by all uvicorn workers through one memory-mapped file
+FACE_EMBEDDING_DIM = 128  # Facenet
+face_index = SharedFaceIndex(os.path.join("face_embeddings", "index.bin"), dim=FACE_EMBEDDING_DIM)
+# Set once this process has reconciled the index with the whole database
+face_index_reconciled = False
+
+# Webcam face search (/face/stream): frames are detected at this long side,
+# and embeddings computed at once across all streams are capped (CPU bound)
+FACE_STREAM_FRAME_SIDE = int(os.getenv("FACE_STREAM_FRAME_SIDE", "640"))
+FACE_STREAM_MAX_FRAME_BYTES = int(os.getenv("FACE_STREAM_MAX_FRAME_KB", "2048")) * 1024
+face_stream_embedding_slots = asyncio.Semaphore(int(os.getenv("FACE_STREAM_EMBEDDING_WORKERS", "2")))
+
+# Uploads staged by /ocr so /extract-photo and /save can reference them by id.
+# Kept on disk and shared by all workers: the follow-up call may land on any of them.
+upload_staging = UploadStaging(
+    directory=os.getenv("UPLOAD_STAGING_DIR"),
+    ttl_seconds=float(os.getenv("UPLOAD_STAGING_TTL_SECONDS", "900")),
+    max_bytes=int(os.getenv("UPLOAD_STAGING_MAX_MB", "256")) * 1024 * 1024
+)
+
+# Query embeddings of recent /face/search probes, reusable through their query_id.
+# Shared by all workers through a table of the staging database
+query_embedding_cache = QueryEmbeddingCache(
+    EMBEDDING_MODEL_VERSION,
+    max_entries=int(os.getenv("FACE_QUERY_CACHE_ENTRIES", "1024")),
+    max_bytes=int(os.getenv("FACE_QUERY_CACHE_MB", "16")) * 1024 * 1024,
+    shared_db=os.path.join(upload_staging.directory, UploadStaging.DB_NAME)
+)
+
+# Set by the multi-worker launcher below: /metrics then adds up every worker
+if os.getenv("METRICS_MULTIPROC_DIR"):
+    metrics.enable_multiprocess(os.environ["METRICS_MULTIPROC_DIR"])
+
+# Rows read per batch (one short query each) by /documents/export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# How often GET /jobs/{id}/events checks the job status
+JOB_EVENTS_POLL_SECONDS = 0.5
 
 # ============================================================================
 # MODELS
 # ============================================================================
 class SaveRequest(BaseModel):
     data: Dict
-    image_base64: str
+    upload_id: Optional[str] = None     # image staged by /ocr (preferred)
+    job_id: Optional[str] = None        # or a done /jobs/ocr job, its recto is kept until saved
+    image_base64: Optional[str] = None  # or the raw image, for older clients
     filename: Optional[str] = "document.jpg"
 
 class OCRResponse(BaseModel):
     markdown: str
     data: Dict
-    image_base64: str
+    upload_id: str
+    engine: str
+    confidence: float
+    image_base64: Optional[str] = None
 
-# ============================================================================
-# OCR PROMPT
-# ============================================================================
-OCR_PROMPT = """
-Tu es un expert OCR spécialisé dans les documents malgaches (CIN, factures, reçus...).
-
-Réponds **uniquement en français** avec :
-1. D'abord un beau texte en Markdown bien structuré
-2. Ensuite **obligatoirement** un bloc JSON complet comme ceci :
-
-```json
-{
-  "type_document": "CIN Madagascar",
-  "numero_cin": "112 203 601 234",
-  "nom": "RAKOTO",
-  "prenoms": "Jean Paul",
-  "date_naissance": "15/03/1995",
-  "lieu_naissance": "Antananarivo",
-  "sexe": "M",
-  "date_delivrance": "10/05/2023",
-  "date_expiration": "10/05/2033",
-  "adresse": "Lot IIY 45 Bis Ampasampito",
-}
-```
-
-Le bloc ```json doit toujours exister, même si certaines données sont inconnues → mets "".
-"""
+class CardOCRResponse(BaseModel):
+    markdown: str
+    data: Dict              # recto and verso merged
+    recto: Dict
+    verso: Dict
+    upload_id: str          # staged recto (face photo source)
+    verso_upload_id: str
+    engine: str
+    confidence: float
 
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
-def parse_ocr_response(response: str) -> tuple[str, Dict]:
-    """Parse OCR response into markdown and JSON data"""
-    if "```json" in response:
-        parts = response.split("```json")
-        markdown_text = parts[0].strip()
-        json_text = parts[1].split("```")[0].strip()
-    else:
-        markdown_text = response
-        json_text = json.dumps({
-            "type_document": "Document inconnu",
-            "texte_brut": response
-        })
-    
-    try:
-        extracted_data = json.loads(json_text)
-    except json.JSONDecodeError:
-        extracted_data = {
-            "type_document": "Erreur parsing",
-            "texte_brut": response
-        }
-    
-    return markdown_text, extracted_data
-
 def generate_unique_filename(numero_cin: str = None) -> str:
     """Generate a unique filename for the photo"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
@@ -126,28 +256,70 @@ def generate_unique_filename(numero_cin: str = None) -> str:
     else:
         return f"photo_{timestamp}.jpg"
 
-def extract_face_photo(image_bytes: bytes) -> Optional[bytes]:
-    """Extract face photo from CIN document image"""
+def thumbnail_url(photo_path: Optional[str], size: int) -> Optional[str]:
+    """URL of the cached thumbnail of a stored photo"""
+    if not photo_path:
+        return None
+    relative = os.path.relpath(photo_path, IMAGES_FOLDER).replace(os.sep, "/")
+    return f"/thumbnails/{size}/{relative}"
+
+def decode_image(image_bytes: bytes) -> Optional[np.ndarray]:
+    """
+    Decode image bytes to a BGR array (None if not an image). Large photos
+    are decoded at 1/2, 1/4 or 1/8 scale: face detection and the saved
+    face crop do not need more than FACE_DECODE_MAX_SIDE pixels.
+    """
+    return decode_reduced(image_bytes, max_side=FACE_DECODE_MAX_SIDE)
+
+async def read_upload(file: UploadFile, max_bytes: Optional[int] = None) -> bytes:
+    """
+    Read an uploaded file, refusing it with 413 past `max_bytes`.
+    The whole body is already bounded by RequestBodyLimit while Starlette
+    spools it to a temporary file; this per-file check reads the part chunk
+    by chunk so an oversized file is never fully loaded in memory.
+    """
+    max_bytes = max_bytes or UPLOAD_MAX_BYTES
+    too_large = HTTPException(status_code=413, detail=f"File too large (max {max_bytes // (1024 * 1024)} MB)")
+    
+    if file.size is not None:
+        if file.size > max_bytes:
+            metrics.inc("upload_rejected_too_large")
+            raise too_large
+        return await file.read()
+    
+    chunks, total = [], 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        total += len(chunk)
+        if total > max_bytes:
+            metrics.inc("upload_rejected_too_large")
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def extract_face_photo(image: Union[bytes, np.ndarray]) -> Optional[bytes]:
+    """Extract face photo from CIN document image (encoded bytes or decoded BGR array)"""
+    import cv2
     try:
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = image if isinstance(image, np.ndarray) else decode_image(image)
         
         if img is None:
             return None
         
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        
-        faces = face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=1.1,
-            minNeighbors=5,
-            minSize=(100, 100)
-        )
-        
-        if len(faces) == 0:
-            profile_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_profileface.xml')
-            faces = profile_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(100, 100))
+        with metrics.timer("face_detection"):
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            
+            faces = face_cascade.detectMultiScale(
+                gray,
+                scaleFactor=1.1,
+                minNeighbors=5,
+                minSize=(100, 100)
+            )
+            
+            if len(faces) == 0:
+                metrics.inc("profile_cascade_fallback")
+                profile_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_profileface.xml')
+                faces = profile_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(100, 100))
         
         if len(faces) > 0:
             faces = sorted(faces, key=lambda x: x[2] * x[3], reverse=True)
@@ -161,21 +333,22 @@ def extract_face_photo(image_bytes: bytes) -> Optional[bytes]:
             
             face_crop = img[y:y+h, x:x+w]
             
-            success, encoded_image = cv2.imencode('.jpg', face_crop, [cv2.IMWRITE_JPEG_QUALITY, 90])
+            with metrics.timer("image_encode"):
+                success, encoded_image = cv2.imencode('.jpg', face_crop, [cv2.IMWRITE_JPEG_QUALITY, 90])
             if success:
                 return encoded_image.tobytes()
         
         return None
         
     except Exception as e:
-        print(f"Face extraction error: {str(e)}")
+        log(f"Face extraction error: {str(e)}")
         return None
 
-def detect_photo_region(image_bytes: bytes) -> Optional[bytes]:
+def detect_photo_region(image: Union[bytes, np.ndarray]) -> Optional[bytes]:
     """Alternative method: Look for photo region based on common CIN layout"""
+    import cv2
     try:
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = image if isinstance(image, np.ndarray) else decode_image(image)
         
         if img is None:
             return None
@@ -190,9 +363,10 @@ def detect_photo_region(image_bytes: bytes) -> Optional[bytes]:
         
         photo_region = img[photo_y:photo_y+photo_height, photo_x:photo_x+photo_width]
         
-        gray = cv2.cvtColor(photo_region, cv2.COLOR_BGR2GRAY)
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(80, 80))
+        with metrics.timer("face_detection"):
+            gray = cv2.cvtColor(photo_region, cv2.COLOR_BGR2GRAY)
+            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(80, 80))
         
         if len(faces) > 0:
             x, y, w, h = faces[0]
@@ -203,26 +377,191 @@ def detect_photo_region(image_bytes: bytes) -> Optional[bytes]:
             h = min(photo_region.shape[0] - y, h + 2 * padding)
             
             face_crop = photo_region[y:y+h, x:x+w]
-            success, encoded_image = cv2.imencode('.jpg', face_crop, [cv2.IMWRITE_JPEG_QUALITY, 90])
+            with metrics.timer("image_encode"):
+                success, encoded_image = cv2.imencode('.jpg', face_crop, [cv2.IMWRITE_JPEG_QUALITY, 90])
             if success:
                 return encoded_image.tobytes()
         
-        success, encoded_image = cv2.imencode('.jpg', photo_region, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        # No face in the expected region - fall back to the whole region
+        metrics.inc("photo_region_uncropped")
+        with metrics.timer("image_encode"):
+            success, encoded_image = cv2.imencode('.jpg', photo_region, [cv2.IMWRITE_JPEG_QUALITY, 90])
         if success:
             return encoded_image.tobytes()
             
         return None
         
     except Exception as e:
-        print(f"Photo region detection error: {str(e)}")
+        log(f"Photo region detection error: {str(e)}")
+        return None
+
+def find_face_photo(image_bytes: bytes) -> Optional[bytes]:
+    """Face detection first, CIN layout region as fallback - decoding the image once"""
+    img = decode_image(image_bytes)
+    if img is None:
         return None
+    
+    face_photo = extract_face_photo(img)
+    if face_photo is None:
+        metrics.inc("detect_photo_region_fallback")
+        face_photo = detect_photo_region(img)
+    return face_photo
+
+def index_face_photos(photo_paths: Dict[int, Optional[str]]) -> int:
+    """Add these documents' face embeddings to the shared index (from the embedding cache when present)"""
+    doc_ids, embeddings = [], []
+    for doc_id, path in photo_paths.items():
+        if path and os.path.exists(path):
+            embedding = face_search_service.load_or_create_embedding(doc_id, path)
+            if embedding is not None:
+                doc_ids.append(doc_id)
+                embeddings.append(embedding)
+    if doc_ids:
+        face_index.add_many(doc_ids, np.stack(embeddings))
+    return len(doc_ids)
+
+def sync_face_index(db: Session, full: bool = False) -> Dict[str, int]:
+    """
+    Keep the shared index in step with the database. On the request path
+    this costs one max(id) lookup: documents saved since the index's sync
+    stamp (id above its max id) are added, nothing else is read.
+    
+    The full reconciliation - every face document, photo existence, stale
+    ids - is for startup (`full`, or the first sync of this process), and
+    only runs when the face document count or the highest id differs from
+    the stamp, i.e. the database changed outside /save and DELETE.
+    """
+    global face_index_reconciled
+    full = full or not face_index_reconciled
+    
+    max_id = db.query(func.max(Document.id)).scalar() or 0
+    synced_count, synced_max_id = face_index.sync_state
+    added = removed = 0
+    
+    if max_id > synced_max_id:
+        # Saved since the last sync, by any worker
+        rows = db.query(Document.id, Document.photo_visage_path)\
+            .filter(Document.has_face_photo == True, Document.id > synced_max_id, Document.id <= max_id)\
+            .all()
+        added = index_face_photos(dict(rows))
+        face_index.advance_sync_state(synced_max_id, max_id, len(rows))
+        synced_count, synced_max_id = face_index.sync_state
+    
+    if full or max_id < synced_max_id:
+        count = db.query(func.count(Document.id)).filter(Document.has_face_photo == True).scalar()
+        if (count, max_id) != (synced_count, synced_max_id):
+            with metrics.timer("face_index_reconcile"):
+                rows = db.query(Document.id, Document.photo_visage_path)\
+                    .filter(Document.has_face_photo == True)\
+                    .all()
+                photo_paths = {doc_id: path for doc_id, path in rows if path and os.path.exists(path)}
+                result = face_index.sync(
+                    photo_paths,
+                    lambda doc_id: face_search_service.load_or_create_embedding(doc_id, photo_paths[doc_id])
+                )
+            face_index.set_sync_state(count, max_id)
+            added, removed = added + result["added"], result["removed"]
+        face_index_reconciled = True
+    
+    return {"added": added, "removed": removed}
+
+def face_candidate_ids(
+    db: Session,
+    sexe: Optional[str] = None,
+    birth_year: Optional[int] = None,
+    birth_year_tolerance: int = 0,
+    lieu_naissance: Optional[str] = None
+) -> Optional[np.ndarray]:
+    """
+    Sorted ids of face documents matching the metadata filters, served by
+    the ix_documents_face_* indexes. None when no filter is given.
+    """
+    # Blank values (whitespace only, accents only...) mean "no filter"
+    sexe = sexe.strip().upper()[:1] if sexe else None
+    prefix = place_key(lieu_naissance) if lieu_naissance else None
+    if not sexe and birth_year is None and not prefix:
+        return None
+    
+    query = db.query(Document.id).filter(Document.has_face_photo == True)
+    if sexe:
+        query = query.filter(Document.sexe == sexe)
+    if birth_year is not None:
+        tolerance = max(0, birth_year_tolerance)
+        query = query.filter(BIRTH_YEAR.between(
+            f"{birth_year - tolerance:04d}", f"{birth_year + tolerance:04d}"
+        ))
+    if prefix:
+        # "Starts with", as a range so the index is used. The stored key and the
+        # prefix both go through place_key: "Fénérive", "FENERIVE" and "fenerive" all match
+        query = query.filter(
+            LIEU_NAISSANCE_KEY >= prefix,
+            LIEU_NAISSANCE_KEY < prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        )
+    
+    with metrics.timer("face_prefilter"):
+        ids = [doc_id for (doc_id,) in query.order_by(Document.id)]
+    return np.array(ids, dtype=np.int64)
+
+def add_match_details(db: Session, matches: List[Dict]) -> List[Dict]:
+    """Add the document fields and photo URLs shown next to each face match"""
+    for match in matches:
+        doc = db.query(Document).filter(Document.id == match['document_id']).first()
+        if doc:
+            match.update({
+                'nom': doc.nom,
+                'prenoms': doc.prenoms,
+                'numero_cin': doc.numero_cin,
+                'photo_url': thumbnail_url(doc.photo_visage_path, SEARCH_THUMBNAIL_SIZE),
+                'photo_full_url': image_url(doc.photo_visage_path, IMAGES_FOLDER)
+            })
+    return matches
+
+def stage_upload(image_bytes: bytes, content_type: str, upload_id: Optional[str] = None) -> StagedUpload:
+    """Stage an upload, or 413 when it is larger than the whole staging area"""
+    try:
+        return upload_staging.put(image_bytes, content_type, upload_id=upload_id)
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large to stage (max {upload_staging.max_bytes // (1024 * 1024)} MB)"
+        )
+
+def get_staged_upload(upload_id: str) -> StagedUpload:
+    """Staged upload by id, or 404 when it expired or never existed"""
+    staged = upload_staging.get(upload_id)
+    if staged is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Upload not found or expired, please upload the image again"
+        )
+    return staged
+
+def get_job_upload(job_id: str) -> StagedUpload:
+    """
+    Recto of a done OCR job, staged under the job id. Staged again from the
+    job row when the staged copy expired (restart, TTL, eviction).
+    """
+    staged = upload_staging.get(job_id)
+    if staged is None:
+        job_input = job_queue.get_input(job_id)
+        if job_input is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Job not found, not done or already saved"
+            )
+        staged = stage_upload(*job_input, upload_id=job_id)
+    return staged
 
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
 @app.post("/ocr", response_model=OCRResponse)
-async def extract_ocr(file: UploadFile = File(...)):
-    """Extract text and structured data from uploaded image"""
+async def extract_ocr(file: UploadFile = File(...), include_image: bool = False):
+    """
+    Extract text and structured data from uploaded image.
+    The image is staged server-side: pass the returned upload_id to
+    /extract-photo and /save instead of sending the image again.
+    """
     allowed_types = ["image/png", "image/jpeg", "image/jpg", "image/webp"]
     if file.content_type not in allowed_types:
         raise HTTPException(
@@ -230,57 +569,90 @@ async def extract_ocr(file: UploadFile = File(...)):
             detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}"
         )
     
+    image_bytes = await read_upload(file)
+    staged = stage_upload(image_bytes, file.content_type)
+    
     try:
-        image_bytes = await file.read()
-        base64_image = base64.b64encode(image_bytes).decode("utf-8")
-        
-        client = Groq(api_key=GROQ_API_KEY)
-        
-        chat_completion = client.chat.completions.create(
-            messages=[{
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": OCR_PROMPT},
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}
-                    },
-                ],
-            }],
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
-            temperature=0.2,
-            max_tokens=2048,
+        result = ocr_extractor.extract(image_bytes, file.content_type)
+        
+        return OCRResponse(
+            markdown=result.markdown,
+            data=result.data,
+            upload_id=staged.upload_id,
+            engine=result.engine,
+            confidence=result.confidence,
+            image_base64=base64.b64encode(image_bytes).decode("utf-8") if include_image else None
         )
         
-        response = chat_completion.choices[0].message.content
-        markdown_text, extracted_data = parse_ocr_response(response)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"OCR extraction failed: {str(e)}")
+
+@app.post("/ocr/card", response_model=CardOCRResponse)
+async def extract_ocr_card(
+    recto: UploadFile = File(...),
+    verso: UploadFile = File(...)
+):
+    """
+    Extract recto and verso of a CIN in a single vision-model call and
+    merge them server-side. Both images are staged (see /ocr).
+    """
+    allowed_types = ["image/png", "image/jpeg", "image/jpg", "image/webp"]
+    for side in (recto, verso):
+        if side.content_type not in allowed_types:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}"
+            )
+    
+    recto_bytes = await read_upload(recto)
+    verso_bytes = await read_upload(verso)
+    staged_recto = stage_upload(recto_bytes, recto.content_type)
+    staged_verso = stage_upload(verso_bytes, verso.content_type)
+    
+    try:
+        result = ocr_extractor.extract_card(
+            recto_bytes, verso_bytes,
+            staged_recto.content_type, staged_verso.content_type
+        )
         
-        return OCRResponse(
-            markdown=markdown_text,
-            data=extracted_data,
-            image_base64=base64_image
+        return CardOCRResponse(
+            markdown=result.markdown,
+            data=result.data,
+            recto=result.recto,
+            verso=result.verso,
+            upload_id=staged_recto.upload_id,
+            verso_upload_id=staged_verso.upload_id,
+            engine=result.engine,
+            confidence=result.confidence
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OCR extraction failed: {str(e)}")
 
 @app.post("/extract-photo")
-async def extract_photo(file: UploadFile = File(...)):
-    """Extract face photo from CIN document"""
+async def extract_photo(
+    file: Optional[UploadFile] = File(None),
+    upload_id: Optional[str] = Form(None),
+    job_id: Optional[str] = Form(None)
+):
+    """Extract face photo from CIN document (uploaded file, staged upload_id or done job_id)"""
+    if upload_id is None and job_id is None and file is None:
+        raise HTTPException(status_code=400, detail="Provide either file, upload_id or job_id")
+    
     allowed_types = ["image/png", "image/jpeg", "image/jpg", "image/webp"]
-    if file.content_type not in allowed_types:
+    if upload_id is None and job_id is None and file.content_type not in allowed_types:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}"
         )
     
     try:
-        image_bytes = await file.read()
-        
-        face_photo = extract_face_photo(image_bytes)
-        
-        if face_photo is None:
-            face_photo = detect_photo_region(image_bytes)
+        if upload_id:
+            face_photo = get_staged_upload(upload_id).face_photo(find_face_photo)
+        elif job_id:
+            face_photo = get_job_upload(job_id).face_photo(find_face_photo)
+        else:
+            face_photo = find_face_photo(await read_upload(file))
         
         if face_photo is None:
             raise HTTPException(
@@ -310,6 +682,19 @@ async def save_document(
     """
     Save extracted document - All photos go to single 'images' folder
     """
+    if request.upload_id is None and request.job_id is None and request.image_base64 is None:
+        raise HTTPException(status_code=400, detail="Provide either upload_id, job_id or image_base64")
+    if request.image_base64 is not None and len(request.image_base64) * 3 // 4 > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image too large (max {UPLOAD_MAX_BYTES // (1024 * 1024)} MB)")
+    
+    # Resolve the staged upload before anything else so an expired id fails cleanly
+    if request.upload_id:
+        staged = get_staged_upload(request.upload_id)
+    elif request.job_id:
+        staged = get_job_upload(request.job_id)
+    else:
+        staged = None
+    
     try:
         # Skip if this is a verso-only save request (from old frontend code)
         if request.data.get("is_verso_image") and request.data.get("side") == "verso":
@@ -330,29 +715,33 @@ async def save_document(
                     "existing_photo": existing.photo_visage_path
                 }
         
-        # Generate unique photo filename
+        # Unique name for the record - the photo itself is stored by content hash
         photo_filename = generate_unique_filename(numero_cin)
-        photo_path = os.path.join(IMAGES_FOLDER, photo_filename)
+        photo_path = None
         
         # Extract and save ONLY the face photo to images folder
         has_face_photo = False
         
         try:
-            image_bytes = base64.b64decode(request.image_base64)
-            face_photo = extract_face_photo(image_bytes)
-            
-            # Try region-based detection if face detection fails
-            if face_photo is None:
-                face_photo = detect_photo_region(image_bytes)
+            if staged is not None:
+                # Reuses the crop already detected for /extract-photo
+                face_photo = staged.face_photo(find_face_photo)
+            else:
+                with metrics.timer("base64_decode"):
+                    image_bytes = base64.b64decode(request.image_base64)
+                face_photo = find_face_photo(image_bytes)
             
             if face_photo:
-                with open(photo_path, "wb") as f:
-                    f.write(face_photo)
+                photo_path = image_store.put(db, face_photo)
                 has_face_photo = True
-                print(f"✅ Face photo saved to: {photo_path}")
+                log(f"✅ Face photo saved to: {photo_path}")
         except Exception as e:
-            print(f"⚠️ Warning: Could not extract face photo: {str(e)}")
+            log(f"⚠️ Warning: Could not extract face photo: {str(e)}")
+            # Undo a half-done put (blob reference, new file); nothing else is pending yet
+            db.rollback()
+            image_store.rollback_files(db)
             photo_path = None
+            has_face_photo = False
         
         # Save to database - store relative path
         db_document = Document(
@@ -373,9 +762,23 @@ async def save_document(
         )
         
         db.add(db_document)
-        db.commit()
+        with metrics.timer("db_commit"):
+            db.commit()
         db.refresh(db_document)
         
+        if staged is not None:
+            upload_staging.discard(staged.upload_id)
+        if request.job_id:
+            job_queue.release_input(request.job_id)
+        
+        # Searchable right away in every worker. Without a loaded model (lazy
+        # profile) the next face search picks it up from the sync stamp instead.
+        if has_face_photo and FACE_SEARCH != "off" and deepface_loaded():
+            try:
+                index_face_photos({db_document.id: photo_path})
+            except Exception as e:
+                log(f"⚠️ Warning: Could not index face photo: {str(e)}")
+        
         response = {
             "success": True,
             "database_id": db_document.id,
@@ -392,35 +795,67 @@ async def save_document(
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
-        print(f"❌ SAVE ERROR: {str(e)}")
-        print(f"TRACEBACK:\n{error_details}")
+        log(f"❌ SAVE ERROR: {str(e)}")
+        log(f"TRACEBACK:\n{error_details}")
         db.rollback()
+        image_store.rollback_files(db)
         raise HTTPException(status_code=500, detail=f"Save failed: {str(e)}")
 
 # FACE SEARCH ENDPOINTS
-@app.post("/face/search")
+@face_router.post("/face/search")
 async def search_by_face(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    query_id: Optional[str] = Form(None),
     threshold: float = 0.4,
-    top_k: int = 10,
+    top_k: int = Query(10, ge=1, le=FACE_SEARCH_MAX_TOP_K),
+    sexe: Optional[str] = None,
+    birth_year: Optional[int] = None,
+    birth_year_tolerance: int = 0,
+    lieu_naissance: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
-    Search for similar faces in database
+    Search for similar faces in database.
+    Optional sexe / birth_year (+- birth_year_tolerance) / lieu_naissance
+    (prefix, case-insensitive) filters narrow the candidates before any
+    embedding is compared.
+    
+    The response carries a query_id: pass it instead of the file to search
+    again (other threshold, top_k or filters) without recomputing the embedding.
     """
+    if file is None and query_id is None:
+        raise HTTPException(status_code=400, detail="Provide either file or query_id")
+    
     allowed_types = ["image/png", "image/jpeg", "image/jpg", "image/webp"]
-    if file.content_type not in allowed_types:
+    if file is not None and file.content_type not in allowed_types:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}"
         )
     
     try:
-        # Read uploaded image
-        image_bytes = await file.read()
+        if file is not None:
+            # Same image, same model -> same query_id, so re-uploads hit the cache too
+            image_bytes = await read_upload(file)
+            query_id = QueryEmbeddingCache.query_id(image_bytes)
         
-        # Extract embedding from query image
-        query_embedding = face_search_service.extract_embedding_from_bytes(image_bytes)
+        cached = query_embedding_cache.get(query_id)
+        query_cached = cached is not None
+        if cached is None:
+            if file is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Query not found or expired, please upload the image again"
+                )
+            # Extract embedding from query image. Only a real "no face" answer is
+            # cached: a failure must not stick to this image as NO_FACE
+            try:
+                query_embedding = face_search_service.extract_embedding_from_bytes(image_bytes)
+            except FaceEmbeddingError as e:
+                raise HTTPException(status_code=503, detail=f"Face embedding failed: {str(e)}")
+            query_embedding_cache.put(query_id, query_embedding)
+        else:
+            query_embedding = None if cached is NO_FACE else cached
         
         if query_embedding is None:
             raise HTTPException(
@@ -428,53 +863,46 @@ async def search_by_face(
                 detail="No face detected in the uploaded image"
             )
         
-        # Get all documents from database with face photos
-        documents = db.query(Document).filter(Document.has_face_photo == True).all()
+        # Index new face photos (only the missing ones are embedded)
+        sync_face_index(db)
         
-        # Convert to list of dicts
-        doc_dicts = [
-            {
-                'id': doc.id,
-                'photo_visage_path': doc.photo_visage_path,
-                'has_face_photo': doc.has_face_photo
-            }
-            for doc in documents
-        ]
-        
-        # Load database embeddings
-        db_embeddings = face_search_service.load_database_embeddings(doc_dicts)
-        
-        if not db_embeddings:
+        if len(face_index) == 0:
             raise HTTPException(
                 status_code=404,
                 detail="No face photos available in database for comparison"
             )
         
-        # Search for similar faces
-        matches = face_search_service.search_similar_faces(
-            query_embedding=query_embedding,
-            database_embeddings=db_embeddings,
-            threshold=threshold,
-            top_k=top_k
-        )
+        # Metadata pre-filter on indexed columns -> sorted candidate ids
+        candidate_ids = face_candidate_ids(db, sexe, birth_year, birth_year_tolerance, lieu_naissance)
+        candidate_rows = None if candidate_ids is None else face_index.candidate_rows(candidate_ids)
+        compared = len(face_index) if candidate_rows is None else len(candidate_rows.rows)
+        
+        # Search the shared index
+        with metrics.timer("index_search"):
+            matches = face_index.search(
+                query_embedding,
+                threshold=threshold,
+                top_k=top_k,
+                candidate_rows=candidate_rows
+            )
         
         # Add document details to matches
-        for match in matches:
-            doc = db.query(Document).filter(Document.id == match['document_id']).first()
-            if doc:
-                match.update({
-                    'nom': doc.nom,
-                    'prenoms': doc.prenoms,
-                    'numero_cin': doc.numero_cin,
-                    'photo_url': f"/images/{os.path.basename(doc.photo_visage_path)}" if doc.photo_visage_path else None
-                })
+        add_match_details(db, matches)
         
         return {
             "success": True,
+            "query_id": query_id,
+            "query_cached": query_cached,
             "matches": matches,
             "query_faces_detected": 1,
-            "database_faces_compared": len(db_embeddings),
-            "threshold_used": threshold
+            "database_faces_compared": compared,
+            "threshold_used": threshold,
+            "filters_used": {
+                "sexe": sexe,
+                "birth_year": birth_year,
+                "birth_year_tolerance": birth_year_tolerance if birth_year is not None else None,
+                "lieu_naissance": lieu_naissance
+            }
         }
         
     except HTTPException:
@@ -484,6 +912,78 @@ async def search_by_face(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Face search failed: {str(e)}")
 
+@face_router.websocket("/face/stream")
+async def face_stream(
+    websocket: WebSocket,
+    threshold: float = 0.4,
+    top_k: int = Query(5, ge=1, le=FACE_SEARCH_MAX_TOP_K),
+    sexe: Optional[str] = None,
+    birth_year: Optional[int] = None,
+    birth_year_tolerance: int = 0,
+    lieu_naissance: Optional[str] = None
+):
+    """
+    Real-time face search on a webcam stream.
+    
+    The client sends frames as binary JPEG/PNG/WebP messages, as fast as it
+    captures them. The server answers with JSON messages:
+    - {"type": "frame", "faces": [{"track_id", "box", "status", "best_match"}], "lost", "dropped_frames", ...}
+      for every processed frame (box as fractions of the frame size);
+    - {"type": "identity", "track_id", "status", "matches"} once per tracked face,
+      when its search completes;
+    - {"type": "error", "detail"}.
+    Frames arriving while one is processed are dropped, only the newest is kept.
+    Query parameters are the /face/search ones, fixed for the whole stream.
+    Browsers may open it from the allowed CORS origins only.
+    """
+    # Any page could otherwise stream face matches (names, CIN numbers) from an
+    # operator's browser. Non-browser clients send no Origin.
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin not in CORS_ALLOWED_ORIGINS:
+        metrics.inc("face_stream_origin_rejected")
+        log(f"⚠️ Face stream refused for origin {origin}")
+        await websocket.close(code=1008)
+        return
+    
+    await websocket.accept()
+    
+    db = SessionLocal()
+    try:
+        # Index new face photos once per stream, then reuse the shared index
+        await asyncio.to_thread(sync_face_index, db)
+        candidate_ids = face_candidate_ids(db, sexe, birth_year, birth_year_tolerance, lieu_naissance)
+    finally:
+        db.close()
+    
+    def search(embedding: np.ndarray) -> List[Dict]:
+        matches = face_index.search(embedding, threshold=threshold, top_k=top_k, candidate_ids=candidate_ids)
+        db = SessionLocal()
+        try:
+            return add_match_details(db, matches)
+        finally:
+            db.close()
+    
+    async def receive_frame() -> Optional[bytes]:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return None
+        return message.get("bytes") or b""
+    
+    session = FaceStreamSession(
+        extract_embedding=face_search_service.extract_embedding_from_array,
+        search=search,
+        embedding_slots=face_stream_embedding_slots,
+        frame_side=FACE_STREAM_FRAME_SIDE,
+        max_frame_bytes=FACE_STREAM_MAX_FRAME_BYTES
+    )
+    try:
+        await session.run(receive_frame, websocket.send_json)
+    except WebSocketDisconnect:
+        pass
+
+if FACE_SEARCH != "off":
+    app.include_router(face_router)
+
 @app.get("/face/stats")
 async def get_face_search_stats(db: Session = Depends(get_db)):
     """
@@ -502,10 +1002,194 @@ async def get_face_search_stats(db: Session = Depends(get_db)):
         "total_documents": total_docs,
         "documents_with_face_photos": docs_with_faces,
         "cached_embeddings": cached_embeddings,
+        "indexed_faces": len(face_index),
+        "index_generation": face_index.generation,
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "face_search": FACE_SEARCH,
+        "face_model_loaded": deepface_loaded(),
         "embedding_model": "Facenet",
         "similarity_metric": "Cosine"
     }
 # ============================================================================
+# THUMBNAILS
+# ============================================================================
+@app.get("/thumbnails/{size}/{image_path:path}")
+async def get_thumbnail(size: int, image_path: str, request: Request):
+    """
+    Resized WebP version of a stored photo (generated once, then served from disk)
+    """
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid size. Allowed: {', '.join(map(str, THUMBNAIL_SIZES))}"
+        )
+    
+    if thumbnail_cache.source_path(image_path) is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    headers = {
+        "ETag": thumbnail_cache.etag(image_path, size),
+        "Cache-Control": thumbnail_cache.cache_control(image_path),
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    
+    thumbnail = thumbnail_cache.get(image_path, size)
+    if thumbnail is None:
+        raise HTTPException(status_code=500, detail="Thumbnail generation failed")
+    
+    return FileResponse(thumbnail, media_type="image/webp", headers=headers)
+
+# ============================================================================
+# ASYNC OCR JOBS
+# ============================================================================
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str             # queued, running, done, failed
+    priority: int
+    attempts: int
+    created_at: datetime
+    updated_at: datetime
+    result: Optional[Dict] = None   # same fields as OCRResponse / CardOCRResponse
+    error: Optional[str] = None
+
+def run_ocr_job(job) -> Dict:
+    """
+    Job handler: single image OCR. The image is staged under the job id for
+    /extract-photo and /save, which can also take the job_id itself.
+    """
+    result = ocr_extractor.extract(job.recto, job.recto_content_type)
+    staged = upload_staging.put(job.recto, job.recto_content_type, upload_id=job.id)
+    return {
+        "markdown": result.markdown,
+        "data": result.data,
+        "upload_id": staged.upload_id,
+        "engine": result.engine,
+        "confidence": result.confidence
+    }
+
+def run_card_job(job) -> Dict:
+    """Job handler: recto + verso in one call (see /ocr/card)"""
+    result = ocr_extractor.extract_card(job.recto, job.verso, job.recto_content_type, job.verso_content_type)
+    staged_recto = upload_staging.put(job.recto, job.recto_content_type, upload_id=job.id)
+    staged_verso = upload_staging.put(job.verso, job.verso_content_type, upload_id=f"{job.id}-verso")
+    return {
+        "markdown": result.markdown,
+        "data": result.data,
+        "recto": result.recto,
+        "verso": result.verso,
+        "upload_id": staged_recto.upload_id,
+        "verso_upload_id": staged_verso.upload_id,
+        "engine": result.engine,
+        "confidence": result.confidence
+    }
+
+job_queue = JobQueue(
+    handlers={"ocr": run_ocr_job, "card": run_card_job},
+    workers=int(os.getenv("OCR_JOB_WORKERS", "4")),
+    max_attempts=int(os.getenv("OCR_JOB_MAX_ATTEMPTS", "3")),
+    input_retention_seconds=float(os.getenv("OCR_JOB_INPUT_RETENTION_HOURS", "24")) * 3600
+)
+
+@app.on_event("startup")
+def start_job_workers():
+    job_queue.start()
+
+@app.on_event("startup")
+def load_face_index():
+    # "lazy": the first /face/search syncs the index, as embedding a missing photo loads the model
+    if FACE_SEARCH != "preload":
+        return
+    db = SessionLocal()
+    try:
+        face_search_service.preload()
+        sync_face_index(db, full=True)
+    except Exception as e:
+        log(f"⚠️ Warning: Could not sync face index: {str(e)}")
+    finally:
+        db.close()
+
+@app.on_event("shutdown")
+def stop_job_workers():
+    job_queue.stop()
+
+@app.post("/jobs/ocr", response_model=JobResponse, status_code=202)
+async def submit_ocr_job(
+    file: UploadFile = File(...),
+    verso: Optional[UploadFile] = File(None),
+    priority: int = 0
+):
+    """
+    Queue an OCR job and return immediately. With `verso`, recto and verso
+    are extracted together like /ocr/card. Poll GET /jobs/{job_id} or
+    subscribe to GET /jobs/{job_id}/events for the result.
+    """
+    allowed_types = ["image/png", "image/jpeg", "image/jpg", "image/webp"]
+    for side in (file, verso):
+        if side is not None and side.content_type not in allowed_types:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}"
+            )
+    
+    recto_bytes = await read_upload(file)
+    verso_bytes = await read_upload(verso) if verso else None
+    # SQLite insert: off the event loop, like every other blocking call here
+    job = await asyncio.to_thread(
+        job_queue.submit,
+        "card" if verso else "ocr",
+        recto_bytes, file.content_type,
+        verso_bytes, verso.content_type if verso else None,
+        priority=priority
+    )
+    log(f"📥 Queued {job.kind} job {job.id} (priority {priority})")
+    return job_queue.describe(job)
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: str):
+    """Current status of an OCR job, with its result once done"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """Server-Sent Events: one `status` event per status change, the stream ends when the job is finished"""
+    if await asyncio.to_thread(job_queue.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        last_state = None
+        while not await request.is_disconnected():
+            job = await asyncio.to_thread(job_queue.get, job_id)
+            state = (job["status"], job["attempts"])
+            if state != last_state:
+                last_state = state
+                yield f"event: status\ndata: {json.dumps(job, default=str)}\n\n"
+            if job["status"] in FINISHED_STATUSES:
+                break
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ============================================================================
+# METRICS ENDPOINT
+# ============================================================================
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Per-stage latency histograms and event counters (Prometheus format)"""
+    return PlainTextResponse(
+        metrics.render(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+# ============================================================================
 # DATABASE QUERY ENDPOINTS
 # ============================================================================
 class DocumentResponse(BaseModel):
@@ -543,6 +1227,36 @@ async def list_documents_db(
         .all()
     return documents
 
+@app.get("/documents/export")
+async def export_documents(
+    format: str = "csv",
+    gzip: bool = False,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    type_document: Optional[str] = None
+):
+    """
+    Stream the whole register as CSV, NDJSON or Parquet, optionally gzipped.
+    Rows are read and encoded batch by batch, so memory stays flat.
+    """
+    try:
+        export = DocumentExport(
+            format,
+            gzip=gzip,
+            date_from=date_from,
+            date_to=date_to,
+            type_document=type_document,
+            batch_size=EXPORT_BATCH_SIZE
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        export.stream(),
+        media_type=export.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{export.filename}"'}
+    )
+
 @app.get("/documents/db/{document_id}", response_model=DocumentResponse)
 async def get_document_by_id(
     document_id: int,
@@ -583,24 +1297,28 @@ async def delete_document(
     if document is None:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Delete photo from images folder if it exists
-    if document.photo_visage_path and os.path.exists(document.photo_visage_path):
-        try:
-            os.remove(document.photo_visage_path)
-            print(f"✅ Deleted photo: {document.photo_visage_path}")
-        except Exception as e:
-            print(f"⚠️ Warning: Could not delete photo: {str(e)}")
+    # Drop this document's reference on its photo (shared photos are kept)
+    orphaned_photo = image_store.release(db, document.photo_visage_path)
     
-    # Clear face embedding cache
+    # Clear face embedding cache and drop it from the shared index (all workers see it)
     try:
         face_search_service.clear_cache_for_document(document_id)
-        print(f"✅ Cleared face cache for document {document_id}")
+        face_index.remove(document_id)
+        log(f"✅ Cleared face cache for document {document_id}")
     except Exception as e:
-        print(f"⚠️ Warning: Could not clear face cache: {str(e)}")
+        log(f"⚠️ Warning: Could not clear face cache: {str(e)}")
     
+    had_face_photo = document.has_face_photo
     db.delete(document)
     db.commit()
     
+    if had_face_photo:
+        face_index.forget_synced_document(document_id, db.query(func.max(Document.id)).scalar() or 0)
+    
+    if orphaned_photo:
+        image_store.remove_unreferenced(orphaned_photo)
+        thumbnail_cache.invalidate(orphaned_photo)
+    
     return {
         "success": True,
         "message": f"Document {document_id} deleted",
@@ -610,10 +1328,28 @@ async def delete_document(
 # ============================================================================
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(
-        app,
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+    # Several workers share the face index and the job queue; reload only works with one
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if workers > 1:
+        # Fresh per-run directory where the workers publish their metrics
+        import shutil
+        import tempfile
+        metrics_dir = os.path.join(tempfile.gettempdir(), f"ocr_metrics_{os.getpid()}")
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir)
+        os.environ["METRICS_MULTIPROC_DIR"] = metrics_dir
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=workers,
+            log_level="info"
+        )
+    else:
+        uvicorn.run(
+            app,
+            host="0.0.0.0",
+            port=8000,
+            reload=True,
+            log_level="info"
+        )
\ No newline at end of file
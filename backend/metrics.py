@@ -0,0 +1,175 @@
+# metrics.py
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+# Histogram buckets in seconds - from fast numpy ops up to slow LLM round trips
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Trace id of the request currently being handled (set by the HTTP middleware)
+trace_id_var: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+
+
+def new_trace_id() -> str:
+    """Generate a short random trace id"""
+    return uuid.uuid4().hex[:16]
+
+
+def log(message: str):
+    """Print a log line prefixed with the current trace id (if any)"""
+    trace_id = trace_id_var.get()
+    if trace_id:
+        print(f"[{trace_id}] {message}")
+    else:
+        print(message)
+
+
+class Histogram:
+    """Cumulative latency histogram in Prometheus layout"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Thread-safe in-process registry of stage timings and event counters,
+    rendered in the Prometheus text exposition format.
+
+    With several worker processes, enable_multiprocess() makes every worker
+    publish its snapshot to a shared directory and render() add them up,
+    so /metrics reports the whole server whichever worker answers.
+    """
+
+    def __init__(self, prefix: str = "ocr_backend"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._multiprocess_dir: Optional[str] = None
+
+    def observe(self, stage: str, seconds: float):
+        """Record one duration (seconds) for a pipeline stage"""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, event: str, amount: int = 1):
+        """Increment an event counter (cache hits, fallbacks...)"""
+        with self._lock:
+            self._counters[event] = self._counters.get(event, 0) + amount
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Time the enclosed block and record it under `stage`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        """This process' metrics as plain JSON-serializable data"""
+        with self._lock:
+            return {
+                "histograms": {
+                    stage: {"buckets": list(h.buckets), "counts": list(h.counts), "sum": h.sum, "count": h.count}
+                    for stage, h in self._histograms.items()
+                },
+                "counters": dict(self._counters),
+            }
+
+    def enable_multiprocess(self, directory: str, interval: float = 5.0):
+        """
+        Publish this process' snapshot to `directory` every `interval`
+        seconds (and at exit). The directory is meant to be emptied before
+        the workers start: snapshots of exited workers keep counting.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._multiprocess_dir = directory
+        atexit.register(self._publish)
+
+        def publish_loop():
+            while True:
+                time.sleep(interval)
+                self._publish()
+
+        threading.Thread(target=publish_loop, name="metrics-publisher", daemon=True).start()
+
+    def _publish(self):
+        path = os.path.join(self._multiprocess_dir, f"metrics-{os.getpid()}.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(f"{path}.tmp", path)
+
+    def _merged_snapshot(self) -> dict:
+        """Live snapshot of this process plus the last published one of every other worker"""
+        merged = self.snapshot()
+        if self._multiprocess_dir is None:
+            return merged
+        own = os.path.join(self._multiprocess_dir, f"metrics-{os.getpid()}.json")
+        for path in glob.glob(os.path.join(self._multiprocess_dir, "metrics-*.json")):
+            if path == own:
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    other = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for event, value in other["counters"].items():
+                merged["counters"][event] = merged["counters"].get(event, 0) + value
+            for stage, histogram in other["histograms"].items():
+                target = merged["histograms"].get(stage)
+                if target is None:
+                    merged["histograms"][stage] = histogram
+                elif target["buckets"] == histogram["buckets"]:
+                    target["counts"] = [a + b for a, b in zip(target["counts"], histogram["counts"])]
+                    target["sum"] += histogram["sum"]
+                    target["count"] += histogram["count"]
+        return merged
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text format"""
+        data = self._merged_snapshot()
+        lines = []
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines.append(f"# HELP {name} Duration of pipeline stages in seconds")
+        lines.append(f"# TYPE {name} histogram")
+        for stage, histogram in sorted(data["histograms"].items()):
+            cumulative = 0
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram["sum"]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram["count"]}')
+
+        name = f"{self.prefix}_events_total"
+        lines.append(f"# HELP {name} Count of pipeline events (cache hits, fallbacks...)")
+        lines.append(f"# TYPE {name} counter")
+        for event, value in sorted(data["counters"].items()):
+            lines.append(f'{name}{{event="{event}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+metrics = MetricsRegistry()
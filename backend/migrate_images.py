@@ -0,0 +1,61 @@
+# migrate_images.py
+import argparse
+import hashlib
+import os
+from database import SessionLocal, Document
+from image_store import ImageStore
+
+def migrate_images(images_folder: str = "images", dry_run: bool = False):
+    """
+    Move flat photo_<cin>_<timestamp>.jpg files into the content-addressed
+    store and rewrite photo_visage_path. Safe to run several times.
+    """
+    store = ImageStore(images_folder)
+    db = SessionLocal()
+    migrated, deduplicated, missing = 0, 0, 0
+
+    try:
+        documents = db.query(Document).filter(Document.photo_visage_path.isnot(None)).all()
+        for doc in documents:
+            old_path = doc.photo_visage_path
+            if store.is_content_addressed(old_path):
+                continue
+
+            if not os.path.exists(old_path):
+                print(f"⚠️ Missing file for document {doc.id}: {old_path}")
+                missing += 1
+                continue
+
+            if dry_run:
+                print(f"Would migrate document {doc.id}: {old_path}")
+                migrated += 1
+                continue
+
+            with open(old_path, "rb") as f:
+                data = f.read()
+
+            extension = os.path.splitext(old_path)[1].lower() or ".jpg"
+            new_path = store.path_for(hashlib.sha256(data).hexdigest(), extension)
+            if os.path.exists(new_path):
+                deduplicated += 1
+
+            doc.photo_visage_path = store.put(db, data, extension)
+            db.commit()
+
+            # Old file is only removed once the new path is committed
+            if os.path.abspath(old_path) != os.path.abspath(doc.photo_visage_path):
+                os.remove(old_path)
+            migrated += 1
+            print(f"✅ Document {doc.id}: {old_path} -> {doc.photo_visage_path}")
+    finally:
+        db.close()
+
+    action = "to migrate" if dry_run else "migrated"
+    print(f"📦 {migrated} photo(s) {action}, {deduplicated} deduplicated, {missing} missing")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate face photos to the content-addressed image store")
+    parser.add_argument("--images-folder", default="images")
+    parser.add_argument("--dry-run", action="store_true", help="only list what would be migrated")
+    args = parser.parse_args()
+    migrate_images(args.images_folder, args.dry_run)
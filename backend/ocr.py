@@ -1,39 +1,27 @@
-from groq import Groq
+import abc
 import base64
 import json
 import os
-from typing import Dict, Any, Tuple
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
+from metrics import metrics, log
+from imaging import decode_image, fit_image
 
+try:
+    import pytesseract
+except ImportError:  # moteur local optionnel
+    pytesseract = None
 
-class OCRExtractor:
-    """Extracteur OCR utilisant Groq Vision AI"""
-    
-    def __init__(self, api_key: str):
-        """
-        Initialise l'extracteur OCR avec la clé API Groq
-        
-        Args:
-            api_key: Clé API Groq
-        """
-        self.client = Groq(api_key=api_key)
-        self.model = "meta-llama/llama-4-scout-17b-16e-instruct"
-        
-    def process_image(self, image_bytes: bytes) -> Tuple[Dict[str, Any], str]:
-        """
-        Traite une image et retourne les données extraites et le markdown
-        
-        Args:
-            image_bytes: Bytes de l'image
-            
-        Returns:
-            Tuple (données JSON, texte markdown)
-        """
-        try:
-            base64_image = base64.b64encode(image_bytes).decode("utf-8")
-            
-            prompt = """
+
+# ============================================================================
+# PROMPTS
+# ============================================================================
+OCR_PROMPT = """
 Tu es un expert OCR spécialisé dans les documents malgaches (CIN, factures, reçus...).
 
 Réponds **uniquement en français** avec :
@@ -52,80 +40,523 @@ Réponds **uniquement en français** avec :
   "date_delivrance": "10/05/2023",
   "date_expiration": "10/05/2033",
   "adresse": "Lot IIY 45 Bis Ampasampito",
-  "texte_brut": "tout le texte extrait de l'image..."
 }
 ```
 
 Le bloc ```json doit toujours exister, même si certaines données sont inconnues → mets "".
 """
+
+CARD_PROMPT = """
+Tu es un expert OCR spécialisé dans les documents malgaches (CIN, factures, reçus...).
+
+Tu reçois DEUX images de la même carte : la première est le RECTO, la seconde est le VERSO.
+
+Réponds **uniquement en français** avec :
+1. D'abord un beau texte en Markdown bien structuré (recto puis verso)
+2. Ensuite **obligatoirement** un bloc JSON complet comme ceci :
+
+```json
+{
+  "recto": {
+    "type_document": "CIN Madagascar",
+    "numero_cin": "112 203 601 234",
+    "nom": "RAKOTO",
+    "prenoms": "Jean Paul",
+    "date_naissance": "15/03/1995",
+    "lieu_naissance": "Antananarivo",
+    "sexe": "M"
+  },
+  "verso": {
+    "date_delivrance": "10/05/2023",
+    "date_expiration": "10/05/2033",
+    "adresse": "Lot IIY 45 Bis Ampasampito"
+  }
+}
+```
+
+Le bloc ```json doit toujours exister, même si certaines données sont inconnues → mets "".
+"""
+
+# Champs lus sur le verso lors de la fusion recto/verso
+VERSO_FIELDS = ("date_delivrance", "date_expiration", "adresse")
+
+# Champs sans lesquels une extraction du recto est jugée incomplète
+REQUIRED_RECTO_FIELDS = ("numero_cin", "nom", "date_naissance")
+
+
+# ============================================================================
+# PARSING
+# ============================================================================
+def parse_ocr_response(response: str) -> Tuple[str, Dict]:
+    """Parse OCR response into markdown and JSON data"""
+    if "```json" in response:
+        parts = response.split("```json")
+        markdown_text = parts[0].strip()
+        json_text = parts[1].split("```")[0].strip()
+    else:
+        markdown_text = response
+        json_text = json.dumps({
+            "type_document": "Document inconnu",
+            "texte_brut": response
+        })
+    
+    try:
+        extracted_data = json.loads(json_text)
+    except json.JSONDecodeError:
+        extracted_data = {
+            "type_document": "Erreur parsing",
+            "texte_brut": response
+        }
+    
+    return markdown_text, extracted_data
+
+
+def combine_card_data(recto: Dict, verso: Dict) -> Dict:
+    """Merge recto and verso data (verso wins for its own fields)"""
+    combined = dict(recto)
+    
+    for key in VERSO_FIELDS:
+        if verso.get(key):
+            combined[key] = verso[key]
+    
+    # A CIN is valid for 10 years - fill in the expiration date if missing
+    if combined.get("date_delivrance") and not combined.get("date_expiration"):
+        try:
+            day, month, year = combined["date_delivrance"].split("/")
+            combined["date_expiration"] = f"{day}/{month}/{int(year) + 10}"
+        except ValueError:
+            pass
+    
+    return combined
+
+
+def field_coverage(data: Dict, fields: Tuple[str, ...] = REQUIRED_RECTO_FIELDS) -> float:
+    """Part des champs attendus effectivement remplis (0-1)"""
+    return sum(1 for key in fields if str(data.get(key) or "").strip()) / len(fields)
+
+
+# ============================================================================
+# ENGINES
+# ============================================================================
+class OCRResult:
+    """Résultat d'une extraction, quel que soit le moteur"""
+    
+    def __init__(self, data: Dict[str, Any], markdown: str, engine: str, confidence: float,
+                 recto: Optional[Dict] = None, verso: Optional[Dict] = None):
+        """
+        Args:
+            data: Données extraites (recto et verso fusionnés pour une carte)
+            markdown: Texte Markdown lisible
+            engine: Nom du moteur qui a produit le résultat
+            confidence: Confiance estimée (0-1)
+            recto: Données du recto seul (extraction d'une carte)
+            verso: Données du verso seul (extraction d'une carte)
+        """
+        self.data = data
+        self.markdown = markdown
+        self.engine = engine
+        self.confidence = confidence
+        self.recto = recto if recto is not None else data
+        self.verso = verso if verso is not None else {}
+        self.latency = 0.0
+
+
+class OCRExtractor(abc.ABC):
+    """
+    Interface commune des moteurs OCR.
+    
+    Les sous-classes implémentent `_extract` (une image) et peuvent
+    surcharger `_extract_card` (recto + verso) ; la mesure de latence et
+    les métriques sont gérées ici.
+    """
+    
+    name = "base"
+    
+    def extract(self, image_bytes: bytes, content_type: str = "image/jpeg") -> OCRResult:
+        """
+        Extrait les données d'une image
+        
+        Args:
+            image_bytes: Bytes de l'image
+            content_type: Type MIME de l'image
+            
+        Returns:
+            Résultat de l'extraction
+        """
+        return self._timed(self._extract, image_bytes, content_type)
+    
+    def extract_card(self, recto: bytes, verso: bytes,
+                     recto_type: str = "image/jpeg", verso_type: str = "image/jpeg") -> OCRResult:
+        """
+        Extrait et fusionne le recto et le verso d'une carte
+        
+        Args:
+            recto: Bytes de l'image du recto
+            verso: Bytes de l'image du verso
+            recto_type: Type MIME du recto
+            verso_type: Type MIME du verso
+            
+        Returns:
+            Résultat fusionné (recto et verso disponibles séparément)
+        """
+        return self._timed(self._extract_card, recto, verso, recto_type, verso_type)
+    
+    def process_image(self, image_bytes: bytes) -> Tuple[Dict[str, Any], str]:
+        """
+        Traite une image et retourne les données extraites et le markdown
+        
+        Args:
+            image_bytes: Bytes de l'image
             
+        Returns:
+            Tuple (données JSON, texte markdown)
+        """
+        result = self.extract(image_bytes)
+        return result.data, result.markdown
+    
+    @abc.abstractmethod
+    def _extract(self, image_bytes: bytes, content_type: str) -> OCRResult:
+        """Extraction d'une seule image, propre à chaque moteur"""
+    
+    def _extract_card(self, recto: bytes, verso: bytes, recto_type: str, verso_type: str) -> OCRResult:
+        # Par défaut : deux extractions indépendantes puis fusion
+        recto_result = self._extract(recto, recto_type)
+        verso_result = self._extract(verso, verso_type)
+        verso_data = {key: verso_result.data[key] for key in VERSO_FIELDS if verso_result.data.get(key)}
+        return OCRResult(
+            data=combine_card_data(recto_result.data, verso_data),
+            markdown=f"{recto_result.markdown}\n\n{verso_result.markdown}",
+            engine=self.name,
+            confidence=recto_result.confidence,
+            recto=recto_result.data,
+            verso=verso_data
+        )
+    
+    def _timed(self, method, *args) -> OCRResult:
+        start = time.perf_counter()
+        try:
+            result = method(*args)
+        except Exception:
+            metrics.inc(f"ocr_engine_{self.name}_error")
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.observe(f"ocr_engine_{self.name}", elapsed)
+        if not result.latency:
+            result.latency = elapsed
+        return result
+
+
+class GroqOCRExtractor(OCRExtractor):
+    """Extracteur OCR utilisant Groq Vision AI"""
+    
+    name = "groq"
+    
+    def __init__(self, api_key: str, model: str = "meta-llama/llama-4-scout-17b-16e-instruct",
+                 max_image_side: int = 2000):
+        """
+        Initialise l'extracteur OCR avec la clé API Groq
+        
+        Args:
+            api_key: Clé API Groq
+            model: Modèle vision à utiliser
+            max_image_side: Plus grand côté envoyé au modèle (les photos plus grandes sont réduites)
+        """
+        self.api_key = api_key
+        self.model = model
+        self.max_image_side = max_image_side
+        self._client = None
+        self._client_lock = threading.Lock()
+    
+    @property
+    def client(self):
+        """Client Groq, créé au premier appel : le SDK n'est importé que s'il sert"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from groq import Groq
+                    self._client = Groq(api_key=self.api_key)
+        return self._client
+    
+    def _complete(self, prompt: str, images: List[Tuple[bytes, str]]) -> str:
+        """Envoie le prompt et les images dans un seul appel et retourne la réponse"""
+        content = [{"type": "text", "text": prompt}]
+        for image_bytes, content_type in images:
+            # Le modèle réduit de toute façon les grandes images : inutile d'encoder 12 Mpx en base64
+            image_bytes, content_type = fit_image(image_bytes, content_type, self.max_image_side)
+            base64_image = base64.b64encode(image_bytes).decode("utf-8")
+            content.append({
+                "type": "image_url",
+                "image_url": {"url": f"data:{content_type};base64,{base64_image}"}
+            })
+        
+        with metrics.timer("groq_completion"):
             chat_completion = self.client.chat.completions.create(
-                messages=[{
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}},
-                    ],
-                }],
+                messages=[{"role": "user", "content": content}],
                 model=self.model,
                 temperature=0.2,
                 max_tokens=2048,
             )
-            
-            response = chat_completion.choices[0].message.content
-            extracted_data = self._parse_response(response)
-            
-            # Extraire le markdown (partie avant le JSON)
-            if "```json" in response:
-                markdown = response.split("```json")[0].strip()
-            else:
-                markdown = response
-            
-            return extracted_data, markdown
-            
+        
+        return chat_completion.choices[0].message.content
+    
+    def _extract(self, image_bytes: bytes, content_type: str) -> OCRResult:
+        response = self._complete(OCR_PROMPT, [(image_bytes, content_type)])
+        markdown, data = parse_ocr_response(response)
+        if data.get("type_document") in ("Document inconnu", "Erreur parsing"):
+            metrics.inc("ocr_parse_fallback")
+        return OCRResult(data, markdown, self.name, field_coverage(data))
+    
+    def _extract_card(self, recto: bytes, verso: bytes, recto_type: str, verso_type: str) -> OCRResult:
+        response = self._complete(CARD_PROMPT, [(recto, recto_type), (verso, verso_type)])
+        markdown, data = parse_ocr_response(response)
+        
+        if "recto" in data or "verso" in data:
+            recto_data = data.get("recto") or {}
+            verso_data = data.get("verso") or {}
+        else:
+            # Réponse à plat (ou erreur de parsing) : utilisée pour les deux faces
+            metrics.inc("ocr_parse_fallback")
+            recto_data = data
+            verso_data = {key: data[key] for key in VERSO_FIELDS if key in data}
+        
+        return OCRResult(
+            data=combine_card_data(recto_data, verso_data),
+            markdown=markdown,
+            engine=self.name,
+            confidence=field_coverage(recto_data),
+            recto=recto_data,
+            verso=verso_data
+        )
+
+
+class TesseractOCRExtractor(OCRExtractor):
+    """
+    Extracteur OCR local (CPU, hors ligne) basé sur Tesseract, avec un
+    analyseur de champs spécifique à la CIN malgache (libellés français
+    et malgaches).
+    """
+    
+    name = "tesseract"
+    
+    # Libellé en début de ligne -> champ (malgache puis français)
+    FIELD_LABELS = [
+        ("prenoms", r"fanampin.?\s*anarana|pr[ée]noms?"),
+        ("nom", r"anarana|nom"),
+        ("date_naissance", r"teraka\s+tamin.?\s*ny|n[ée]e?\s+le|date\s+de\s+naissance"),
+        ("lieu_naissance", r"tao|lieu\s+de\s+naissance|[àa](?=\s*:)"),
+        ("date_delivrance", r"nomena\s+tamin.?\s*ny|natao\s+tamin.?\s*ny|d[ée]livr[ée]e?\s+le|date\s+de\s+d[ée]livrance"),
+        ("date_expiration", r"mitsahatra\s+tamin.?\s*ny|expire\s+le|date\s+d.expiration"),
+        ("adresse", r"fonenana|adiresy|adresse|domicile"),
+    ]
+    DATE_FIELDS = ("date_naissance", "date_delivrance", "date_expiration")
+    
+    CIN_PATTERN = re.compile(r"(?<!\d)(\d{3})\s?(\d{3})\s?(\d{3})\s?(\d{3})(?!\d)")
+    DATE_PATTERN = re.compile(r"(\d{1,2})\s*[/.\-]\s*(\d{1,2})\s*[/.\-]\s*(\d{4})")
+    
+    def __init__(self, lang: str = "fra", min_width: int = 1600):
+        """
+        Initialise l'extracteur local
+        
+        Args:
+            lang: Langue(s) Tesseract, ex. "fra" ou "fra+mlg"
+            min_width: Largeur minimale (px) avant OCR - les petites images sont agrandies
+        """
+        if pytesseract is None:
+            raise RuntimeError("Le moteur OCR local nécessite pytesseract (pip install pytesseract)")
+        try:
+            pytesseract.get_tesseract_version()
         except Exception as e:
-            raise Exception(f"Erreur lors du traitement OCR: {str(e)}")
+            raise RuntimeError(f"Binaire tesseract introuvable : {str(e)}")
+        self.lang = lang
+        self.min_width = min_width
+    
+    def _extract(self, image_bytes: bytes, content_type: str) -> OCRResult:
+        lines, word_confidence = self._read_lines(image_bytes)
+        data = self.parse_fields(lines)
+        data["texte_brut"] = "\n".join(lines)
+        
+        confidence = word_confidence * field_coverage(data)
+        return OCRResult(data, self._to_markdown(data), self.name, confidence)
+    
+    def _read_lines(self, image_bytes: bytes) -> Tuple[List[str], float]:
+        """OCR de l'image : lignes de texte et confiance moyenne des mots (0-1)"""
+        import cv2
+        
+        # Décodage réduit (1/2, 1/4...) des grandes photos, sans descendre sous min_width
+        img = decode_image(image_bytes, max_side=self.min_width, grayscale=True)
+        if img is None:
+            raise ValueError("Image illisible")
+        
+        # Binarisation (Otsu) après agrandissement : bien plus fiable pour Tesseract
+        if img.shape[1] < self.min_width:
+            scale = self.min_width / img.shape[1]
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+        img = cv2.GaussianBlur(img, (3, 3), 0)
+        _, img = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        
+        ocr = pytesseract.image_to_data(img, lang=self.lang, output_type=pytesseract.Output.DICT)
+        
+        lines: Dict[Tuple[int, int, int], List[str]] = {}
+        confidences = []
+        for i, word in enumerate(ocr["text"]):
+            word = word.strip()
+            confidence = float(ocr["conf"][i])
+            if not word or confidence < 0:
+                continue
+            key = (ocr["block_num"][i], ocr["par_num"][i], ocr["line_num"][i])
+            lines.setdefault(key, []).append(word)
+            confidences.append(confidence)
+        
+        text_lines = [" ".join(words) for _, words in sorted(lines.items())]
+        mean_confidence = (sum(confidences) / len(confidences) / 100) if confidences else 0.0
+        return text_lines, mean_confidence
     
-    def _parse_response(self, response: str) -> Dict[str, Any]:
+    def parse_fields(self, lines: List[str]) -> Dict[str, Any]:
         """
-        Parse la réponse de l'API pour extraire le JSON
+        Analyse les lignes OCR d'une CIN et en extrait les champs
         
         Args:
-            response: Réponse complète de l'API
+            lines: Lignes de texte dans l'ordre de lecture
             
         Returns:
-            Dictionnaire des données extraites
+            Dictionnaire au même format que la réponse du modèle vision
         """
+        data = {key: "" for key in (
+            "type_document", "numero_cin", "nom", "prenoms", "date_naissance",
+            "lieu_naissance", "sexe", "date_delivrance", "date_expiration", "adresse"
+        )}
+        text = "\n".join(lines)
+        
+        cin = self.CIN_PATTERN.search(text)
+        if cin:
+            data["numero_cin"] = " ".join(cin.groups())
+        
+        for index, line in enumerate(lines):
+            for field, label in self.FIELD_LABELS:
+                match = re.match(rf"\s*(?:{label})\b\s*[:.\-]?\s*(.*)$", line, re.IGNORECASE)
+                if not match or data[field]:
+                    continue
+                value = match.group(1).strip()
+                # Valeur sur la ligne suivante quand le libellé est seul
+                if not value and index + 1 < len(lines):
+                    value = lines[index + 1].strip()
+                if field in self.DATE_FIELDS:
+                    date = self.DATE_PATTERN.search(value)
+                    value = f"{int(date.group(1)):02d}/{int(date.group(2)):02d}/{date.group(3)}" if date else ""
+                data[field] = value
+                break
+        
+        if re.search(r"\b(lahy|masculin)\b|sexe\s*:?\s*m\b", text, re.IGNORECASE):
+            data["sexe"] = "M"
+        elif re.search(r"\b(vavy|f[ée]minin)\b|sexe\s*:?\s*f\b", text, re.IGNORECASE):
+            data["sexe"] = "F"
+        
+        if data["numero_cin"] or re.search(r"karapanondro|carte\s+(nationale|d.identit)", text, re.IGNORECASE):
+            data["type_document"] = "CIN Madagascar"
+        else:
+            data["type_document"] = "Document inconnu"
+        
+        return data
+    
+    def _to_markdown(self, data: Dict[str, Any]) -> str:
+        rows = [f"**{key} :** {value}" for key, value in data.items() if value and key != "texte_brut"]
+        return f"# {data['type_document']}\n\n" + "\n".join(rows)
+
+
+class RoutingOCRExtractor(OCRExtractor):
+    """
+    Routage "local d'abord" : le moteur local traite l'image, le moteur
+    distant n'est appelé que si la confiance est trop basse. Si le moteur
+    distant est indisponible, le résultat local est renvoyé.
+    """
+    
+    name = "local_first"
+    
+    def __init__(self, local: OCRExtractor, remote: OCRExtractor, min_confidence: float = 0.75):
+        """
+        Args:
+            local: Moteur local (rapide, hors ligne)
+            remote: Moteur distant (LLM) utilisé en escalade
+            min_confidence: Confiance locale minimale pour éviter l'escalade
+        """
+        self.local = local
+        self.remote = remote
+        self.min_confidence = min_confidence
+    
+    def _extract(self, image_bytes: bytes, content_type: str) -> OCRResult:
+        return self._route(
+            lambda: self.local.extract(image_bytes, content_type),
+            lambda: self.remote.extract(image_bytes, content_type)
+        )
+    
+    def _extract_card(self, recto: bytes, verso: bytes, recto_type: str, verso_type: str) -> OCRResult:
+        return self._route(
+            lambda: self.local.extract_card(recto, verso, recto_type, verso_type),
+            lambda: self.remote.extract_card(recto, verso, recto_type, verso_type)
+        )
+    
+    def _route(self, run_local, run_remote) -> OCRResult:
+        local_result = None
         try:
-            if "```json" in response:
-                parts = response.split("```json")
-                json_text = parts[1].split("```")[0].strip()
-            else:
-                # Fallback si pas de format JSON trouvé
-                json_text = json.dumps({
-                    "type_document": "Document inconnu",
-                    "texte_brut": response[:500]
-                })
-            
-            extracted_data = json.loads(json_text)
-            return extracted_data
-            
-        except json.JSONDecodeError as e:
-            return {
-                "type_document": "Erreur parsing JSON",
-                "texte_brut": response[:500],
-                "erreur": str(e)
-            }
+            local_result = run_local()
+            if local_result.confidence >= self.min_confidence:
+                metrics.inc("ocr_route_local")
+                return local_result
         except Exception as e:
-            return {
-                "type_document": "Erreur inattendue",
-                "erreur": str(e)
-            }
+            log(f"⚠️ Local OCR failed: {str(e)}")
+        
+        metrics.inc("ocr_route_escalated")
+        try:
+            return run_remote()
+        except Exception as e:
+            if local_result is None:
+                raise
+            metrics.inc("ocr_route_remote_failed")
+            log(f"⚠️ Remote OCR failed, keeping local result: {str(e)}")
+            return local_result
 
 
-class DocumentStorage:
-    """Gestion du stockage des documents"""
+def build_ocr_extractor(policy: str, api_key: Optional[str] = None,
+                        min_confidence: float = 0.75, tesseract_lang: str = "fra",
+                        max_image_side: int = 2000) -> OCRExtractor:
+    """
+    Construit le moteur OCR selon la politique choisie
     
+    Args:
+        policy: "groq" (LLM distant), "local" (Tesseract) ou "local_first" (local puis escalade)
+        api_key: Clé API Groq (requise pour "groq" et "local_first")
+        min_confidence: Seuil d'escalade pour "local_first"
+        tesseract_lang: Langue(s) Tesseract
+        
+    Returns:
+        Moteur OCR prêt à l'emploi
+    """
+    if policy == "groq":
+        return GroqOCRExtractor(api_key, max_image_side=max_image_side)
+    if policy == "local":
+        return TesseractOCRExtractor(lang=tesseract_lang)
+    if policy == "local_first":
+        return RoutingOCRExtractor(
+            TesseractOCRExtractor(lang=tesseract_lang),
+            GroqOCRExtractor(api_key, max_image_side=max_image_side),
+            min_confidence=min_confidence
+        )
+    raise ValueError(f"Unknown OCR engine policy '{policy}'. Allowed: groq, local, local_first")
+
+
+class DocumentStorage:
+    """
+    Gestion du stockage des documents
+
+    Chaque document est un dossier (image + document.json). Un manifeste
+    SQLite (manifest.sqlite dans le dossier racine) indexe type, date, CIN et
+    chemin : save_document le met à jour, list_documents ne lit plus que la
+    page demandée au lieu d'ouvrir tous les document.json.
+    """
+
+    MANIFEST_NAME = "manifest.sqlite"
+
     def __init__(self, save_root: str = "documents_sauvegardes"):
         """
         Initialise le gestionnaire de stockage
@@ -135,6 +566,28 @@ class DocumentStorage:
         """
         self.save_root = Path(save_root)
         self.save_root.mkdir(exist_ok=True)
+        self.manifest_path = self.save_root / self.MANIFEST_NAME
+        self._lock = threading.Lock()
+
+        manifest_exists = self.manifest_path.exists()
+        self._db = sqlite3.connect(str(self.manifest_path), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                folder TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                date TEXT NOT NULL,
+                numero_cin TEXT,
+                path TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_date ON documents (date DESC, folder DESC);
+            CREATE INDEX IF NOT EXISTS idx_documents_type_date ON documents (type, date DESC);
+            CREATE INDEX IF NOT EXISTS idx_documents_cin ON documents (numero_cin);
+        """)
+
+        # Premier démarrage sur une archive existante : on indexe ce qui est déjà sur disque
+        if not manifest_exists:
+            self.rebuild_manifest()
     
     def save_document(self, data: Dict[str, Any], image_base64: str, filename: str) -> str:
         """
@@ -175,34 +628,183 @@ class DocumentStorage:
         json_path = folder_path / "document.json"
         with open(json_path, "w", encoding="utf-8") as f:
             json.dump(metadata, f, indent=2, ensure_ascii=False)
+
+        # Mise à jour incrémentale du manifeste
+        with self._lock, self._db:
+            self._upsert(folder_path, metadata, json_path.stat().st_mtime_ns)
         
         return str(folder_path)
     
-    def list_documents(self) -> list:
+    def list_documents(
+        self,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        doc_type: Optional[str] = None,
+        numero_cin: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        include_data: bool = True
+    ) -> list:
         """
-        Liste tous les documents sauvegardés
+        Liste les documents sauvegardés depuis le manifeste
         
+        Args:
+            limit: Nombre maximum de documents (None = tous)
+            offset: Nombre de documents à sauter (pagination)
+            doc_type: Filtre sur le type de document
+            numero_cin: Filtre sur le numéro CIN
+            date_from: Date de sauvegarde minimale (ISO, incluse)
+            date_to: Date de sauvegarde maximale (ISO, incluse)
+            include_data: Charge le document.json de chaque document de la page
+                (clé "data", comme avant le manifeste) ; False pour les seuls
+                champs du manifeste
+            
         Returns:
-            Liste des documents avec métadonnées
+            Liste des documents avec métadonnées, plus récent en premier
         """
+        where, params = self._filters(doc_type, numero_cin, date_from, date_to)
+        query = f"SELECT folder, type, date, numero_cin, path FROM documents{where} ORDER BY date DESC, folder DESC"
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        elif offset:
+            query += " LIMIT -1 OFFSET ?"
+            params.append(offset)
+
+        with metrics.timer("document_manifest_list"), self._lock:
+            rows = self._db.execute(query, params).fetchall()
+
         documents = []
-        for folder in self.save_root.iterdir():
-            if folder.is_dir():
-                json_file = folder / "document.json"
-                if json_file.exists():
-                    try:
-                        with open(json_file, "r", encoding="utf-8") as f:
-                            doc_data = json.load(f)
-                            documents.append({
-                                "folder": folder.name,
-                                "type": doc_data.get("type_document", "Unknown"),
-                                "date": doc_data.get("date_sauvegarde", ""),
-                                "path": str(folder),
-                                "data": doc_data
-                            })
-                    except Exception:
-                        continue
-        
-        # Trier par date (plus récent en premier)
-        documents.sort(key=lambda x: x.get("date", ""), reverse=True)
-        return documents
\ No newline at end of file
+        for folder, type_document, date, cin, path in rows:
+            document = {"folder": folder, "type": type_document, "date": date, "numero_cin": cin, "path": path}
+            if include_data:
+                try:
+                    with open(Path(path) / "document.json", "r", encoding="utf-8") as f:
+                        document["data"] = json.load(f)
+                except Exception:
+                    continue
+            documents.append(document)
+        return documents
+
+    def count_documents(
+        self,
+        doc_type: Optional[str] = None,
+        numero_cin: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None
+    ) -> int:
+        """Nombre de documents correspondant aux filtres (pour la pagination)"""
+        where, params = self._filters(doc_type, numero_cin, date_from, date_to)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM documents{where}", params).fetchone()[0]
+
+    def rebuild_manifest(self) -> int:
+        """
+        Reconstruit entièrement le manifeste à partir des dossiers sur disque
+
+        Returns:
+            Nombre de documents indexés
+        """
+        indexed = 0
+        with metrics.timer("document_manifest_rebuild"), self._lock, self._db:
+            self._db.execute("DELETE FROM documents")
+            for folder_path, json_path, mtime_ns in self._scan():
+                metadata = self._read_metadata(json_path)
+                if metadata is not None:
+                    self._upsert(folder_path, metadata, mtime_ns)
+                    indexed += 1
+        log(f"📇 Manifeste reconstruit : {indexed} document(s)")
+        return indexed
+
+    def verify_manifest(self, repair: bool = True) -> Dict[str, List[str]]:
+        """
+        Compare le manifeste aux dossiers sur disque (modifiés hors API)
+
+        Seuls les document.json absents du manifeste ou dont la date de
+        modification a changé sont relus ; le reste ne coûte qu'un stat().
+
+        Args:
+            repair: Corrige le manifeste (sinon simple rapport)
+
+        Returns:
+            Dossiers ajoutés, modifiés et supprimés
+        """
+        report = {"added": [], "updated": [], "removed": []}
+        with metrics.timer("document_manifest_verify"), self._lock, self._db:
+            indexed = dict(self._db.execute("SELECT folder, mtime_ns FROM documents"))
+            on_disk = set()
+
+            for folder_path, json_path, mtime_ns in self._scan():
+                on_disk.add(folder_path.name)
+                known_mtime = indexed.get(folder_path.name)
+                if known_mtime == mtime_ns:
+                    continue
+                report["added" if known_mtime is None else "updated"].append(folder_path.name)
+                if repair:
+                    metadata = self._read_metadata(json_path)
+                    if metadata is not None:
+                        self._upsert(folder_path, metadata, mtime_ns)
+
+            report["removed"] = sorted(set(indexed) - on_disk)
+            if repair and report["removed"]:
+                self._db.executemany("DELETE FROM documents WHERE folder = ?",
+                                     [(folder,) for folder in report["removed"]])
+
+        log(f"📇 Manifeste vérifié : {len(report['added'])} ajouté(s), "
+            f"{len(report['updated'])} modifié(s), {len(report['removed'])} supprimé(s)")
+        return report
+
+    def _scan(self):
+        """Dossiers de documents sur disque : (dossier, document.json, mtime_ns)"""
+        with os.scandir(self.save_root) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                json_path = Path(entry.path) / "document.json"
+                try:
+                    mtime_ns = json_path.stat().st_mtime_ns
+                except OSError:
+                    continue
+                yield Path(entry.path), json_path, mtime_ns
+
+    def _read_metadata(self, json_path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            log(f"⚠️ document.json illisible ({json_path}) : {str(e)}")
+            return None
+
+    def _upsert(self, folder_path: Path, metadata: Dict[str, Any], mtime_ns: int):
+        # L'appelant détient self._lock et la transaction
+        self._db.execute(
+            "INSERT OR REPLACE INTO documents (folder, type, date, numero_cin, path, mtime_ns) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                folder_path.name,
+                str(metadata.get("type_document", "Unknown")),
+                str(metadata.get("date_sauvegarde", "")),
+                metadata.get("numero_cin") or None,
+                str(folder_path),
+                mtime_ns,
+            )
+        )
+
+    @staticmethod
+    def _filters(doc_type, numero_cin, date_from, date_to) -> Tuple[str, list]:
+        clauses, params = [], []
+        if doc_type:
+            clauses.append("type = ?")
+            params.append(doc_type)
+        if numero_cin:
+            clauses.append("numero_cin = ?")
+            params.append(numero_cin)
+        if date_from:
+            clauses.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            # Une date seule (AAAA-MM-JJ) couvre toute la journée
+            clauses.append("date <= ?")
+            params.append(date_to if "T" in date_to else f"{date_to}T23:59:59.999999")
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
@@ -0,0 +1,137 @@
+# query_cache.py
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from metrics import metrics
+
+# Cached "no face in this image" answer (None means "not cached")
+NO_FACE = object()
+
+
+class QueryEmbeddingCache:
+    """
+    LRU cache of /face/search query embeddings.
+
+    Keyed by the image's SHA-256 (its `query_id`) and the embedding model
+    version, so a model change never serves stale vectors. Bounded both by
+    entry count and by the bytes held in embeddings. Images without a face
+    are cached too: re-uploading them does not rerun the detector.
+
+    With `shared_db` (a SQLite file, e.g. the upload staging database)
+    every entry is also written to a table shared by the workers of the
+    host: a query_id computed by one worker is found by the others, which
+    copy it into their own LRU on first use. The shared table keeps the
+    `max_entries` most recently used entries.
+    """
+
+    def __init__(self, model_version: str, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024,
+                 shared_db: Optional[str] = None):
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], object]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._db = None
+        if shared_db:
+            # Workers write concurrently: WAL + busy timeout, as for the staging table
+            self._db = sqlite3.connect(shared_db, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS query_embeddings (
+                    model_version TEXT NOT NULL,
+                    query_id TEXT NOT NULL,
+                    dtype TEXT,
+                    embedding BLOB,
+                    used_at REAL NOT NULL,
+                    PRIMARY KEY (model_version, query_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_query_embeddings_used ON query_embeddings (used_at);
+            """)
+
+    @staticmethod
+    def query_id(image_bytes: bytes) -> str:
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    def get(self, query_id: str) -> Optional[object]:
+        """Cached embedding, NO_FACE, or None on a miss"""
+        key = (self.model_version, query_id)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        if value is None and self._db is not None:
+            value = self._get_shared(query_id)
+            if value is not None:
+                metrics.inc("query_embedding_cache_shared_hit")
+                self._put_local(key, value)
+        metrics.inc("query_embedding_cache_hit" if value is not None else "query_embedding_cache_miss")
+        return value
+
+    def put(self, query_id: str, embedding: Optional[np.ndarray]):
+        key = (self.model_version, query_id)
+        value = NO_FACE if embedding is None else embedding
+        self._put_local(key, value)
+        if self._db is not None:
+            self._put_shared(query_id, embedding)
+
+    def _put_local(self, key: Tuple[str, str], value: object):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= _size(previous)
+            self._entries[key] = value
+            self._bytes += _size(value)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= _size(evicted)
+                metrics.inc("query_embedding_cache_evicted")
+
+    def _get_shared(self, query_id: str) -> Optional[object]:
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT dtype, embedding FROM query_embeddings WHERE model_version = ? AND query_id = ?",
+                (self.model_version, query_id)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE query_embeddings SET used_at = ? WHERE model_version = ? AND query_id = ?",
+                (time.time(), self.model_version, query_id)
+            )
+        dtype, embedding = row
+        return NO_FACE if embedding is None else np.frombuffer(embedding, dtype=dtype).copy()
+
+    def _put_shared(self, query_id: str, embedding: Optional[np.ndarray]):
+        dtype = None if embedding is None else embedding.dtype.str
+        data = None if embedding is None else np.ascontiguousarray(embedding).tobytes()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO query_embeddings (model_version, query_id, dtype, embedding, used_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.model_version, query_id, dtype, data, time.time())
+            )
+            # Least recently used first, past max_entries (entries of older models included)
+            self._db.execute(
+                "DELETE FROM query_embeddings WHERE rowid IN (SELECT rowid FROM query_embeddings "
+                "ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {"entries": len(self._entries), "bytes": self._bytes, "model_version": self.model_version}
+            if self._db is not None:
+                (stats["shared_entries"],) = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()
+        return stats
+
+
+def _size(value: object) -> int:
+    return value.nbytes if isinstance(value, np.ndarray) else 0
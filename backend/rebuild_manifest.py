@@ -0,0 +1,19 @@
+# rebuild_manifest.py
+import argparse
+from ocr import DocumentStorage
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify or rebuild the saved-documents manifest")
+    parser.add_argument("--save-root", default="documents_sauvegardes")
+    parser.add_argument("--full", action="store_true", help="rebuild from scratch instead of an incremental verify")
+    parser.add_argument("--check", action="store_true", help="only report differences, do not repair")
+    args = parser.parse_args()
+
+    storage = DocumentStorage(args.save_root)
+    if args.full:
+        storage.rebuild_manifest()
+    else:
+        report = storage.verify_manifest(repair=not args.check)
+        for change, folders in report.items():
+            for folder in folders:
+                print(f"{change:8} {folder}")
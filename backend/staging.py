@@ -0,0 +1,197 @@
+# staging.py
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from metrics import metrics, log
+
+# Marker for "face detection not run yet" (None means "ran, found nothing")
+_NOT_DETECTED = object()
+
+
+class UploadTooLarge(Exception):
+    """An upload that could not fit in the staging area even if it were empty"""
+
+
+class StagedUpload:
+    """
+    An uploaded image kept server-side between /ocr, /extract-photo and /save.
+
+    The image lives in the staging directory and is only read back when
+    used. The face crop, once detected, is written back to the staging
+    store so whichever worker serves /save reuses it.
+    """
+
+    def __init__(self, staging: "UploadStaging", upload_id: str, content_type: str, size: int,
+                 created_at: float, face_photo=_NOT_DETECTED):
+        self.upload_id = upload_id
+        self.content_type = content_type
+        self.created_at = created_at
+        self._staging = staging
+        self._image_size = size
+        self._face_photo = face_photo
+        self._lock = threading.Lock()
+
+    @property
+    def image_bytes(self) -> bytes:
+        with open(self._staging.image_path(self.upload_id), "rb") as f:
+            return f.read()
+
+    @property
+    def size(self) -> int:
+        size = self._image_size
+        if isinstance(self._face_photo, bytes):
+            size += len(self._face_photo)
+        return size
+
+    def face_photo(self, detector: Callable[[bytes], Optional[bytes]]) -> Optional[bytes]:
+        """Face crop of this upload - detected on first call, reused afterwards"""
+        with self._lock:
+            if self._face_photo is _NOT_DETECTED:
+                self._face_photo = detector(self.image_bytes)
+                self._staging.store_face_photo(self.upload_id, self._face_photo)
+            else:
+                metrics.inc("staged_face_reuse")
+            return self._face_photo
+
+
+class UploadStaging:
+    """
+    Staging area for uploads shared by every worker process of the host.
+
+    Images are files in `directory`, indexed by a SQLite table
+    (staging.sqlite) holding content type, size, creation time and the
+    detected face crop. An upload staged by one uvicorn worker can thus be
+    used by /extract-photo or /save on any other.
+
+    Entries expire after `ttl_seconds`; the oldest are evicted when the
+    staged bytes go over `max_bytes`. A single upload larger than
+    `max_bytes` is refused with UploadTooLarge.
+    """
+
+    DB_NAME = "staging.sqlite"
+
+    def __init__(self, directory: Optional[str] = None, ttl_seconds: float = 900,
+                 max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "ocr_staging")
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+        # Workers write concurrently: WAL + busy timeout instead of "database is locked"
+        self._db = sqlite3.connect(os.path.join(self.directory, self.DB_NAME), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS uploads (
+                upload_id TEXT PRIMARY KEY,
+                content_type TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                face_detected INTEGER NOT NULL DEFAULT 0,
+                face_photo BLOB
+            );
+            CREATE INDEX IF NOT EXISTS idx_uploads_created ON uploads (created_at);
+        """)
+
+    def image_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f"{upload_id}.img")
+
+    def put(self, image_bytes: bytes, content_type: str = "image/jpeg", upload_id: Optional[str] = None) -> StagedUpload:
+        if len(image_bytes) > self.max_bytes:
+            metrics.inc("staging_rejected_too_large")
+            raise UploadTooLarge(f"Upload of {len(image_bytes)} bytes exceeds the staging limit of {self.max_bytes}")
+
+        upload_id = upload_id or uuid.uuid4().hex
+        # Written under a temporary name: other workers never read a partial file
+        temp_path = f"{self.image_path(upload_id)}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(image_bytes)
+        os.replace(temp_path, self.image_path(upload_id))
+
+        created_at = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO uploads (upload_id, content_type, size, created_at) VALUES (?, ?, ?, ?)",
+                (upload_id, content_type, len(image_bytes), created_at)
+            )
+            self._evict(keep=upload_id)
+        return StagedUpload(self, upload_id, content_type, len(image_bytes), created_at)
+
+    def get(self, upload_id: str) -> Optional[StagedUpload]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content_type, size, created_at, face_detected, face_photo FROM uploads WHERE upload_id = ?",
+                (upload_id,)
+            ).fetchone()
+        staged = None
+        if row is not None:
+            content_type, size, created_at, face_detected, face_photo = row
+            if time.time() - created_at > self.ttl_seconds:
+                self.discard(upload_id)
+                metrics.inc("staging_expired")
+            elif os.path.exists(self.image_path(upload_id)):
+                staged = StagedUpload(self, upload_id, content_type, size, created_at,
+                                      face_photo if face_detected else _NOT_DETECTED)
+        metrics.inc("staging_hit" if staged else "staging_miss")
+        return staged
+
+    def store_face_photo(self, upload_id: str, face_photo: Optional[bytes]):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE uploads SET face_detected = 1, face_photo = ? WHERE upload_id = ?",
+                (face_photo, upload_id)
+            )
+
+    def discard(self, upload_id: str):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM uploads WHERE upload_id = ?", (upload_id,))
+        self._remove_file(upload_id)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            (total,) = self._db.execute(
+                "SELECT COALESCE(SUM(size + COALESCE(LENGTH(face_photo), 0)), 0) FROM uploads"
+            ).fetchone()
+        return total
+
+    def _evict(self, keep: str):
+        # Caller holds self._lock inside a transaction. `keep` is the upload
+        # being inserted: the others go first, and put() guarantees it fits alone
+        expired = [upload_id for (upload_id,) in self._db.execute(
+            "SELECT upload_id FROM uploads WHERE created_at < ? AND upload_id != ?",
+            (time.time() - self.ttl_seconds, keep)
+        )]
+        for upload_id in expired:
+            self._db.execute("DELETE FROM uploads WHERE upload_id = ?", (upload_id,))
+            self._remove_file(upload_id)
+            metrics.inc("staging_expired")
+
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size + COALESCE(LENGTH(face_photo), 0)), 0) FROM uploads"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute(
+            "SELECT upload_id, size + COALESCE(LENGTH(face_photo), 0) FROM uploads "
+            "WHERE upload_id != ? ORDER BY created_at",
+            (keep,)
+        ).fetchall()
+        for upload_id, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM uploads WHERE upload_id = ?", (upload_id,))
+            self._remove_file(upload_id)
+            total -= size
+            metrics.inc("staging_evicted")
+            log(f"⚠️ Staging full, evicted upload {upload_id}")
+
+    def _remove_file(self, upload_id: str):
+        try:
+            os.remove(self.image_path(upload_id))
+        except OSError:
+            pass
@@ -0,0 +1,56 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# database.py opens ./documents.db on import: run the suite in a scratch
+# directory so it never touches the real database or images/
+os.chdir(tempfile.mkdtemp(prefix="backend-tests-"))
+
+from database import SessionLocal, Document, ImageBlob, OCRJob  # noqa: E402
+
+
+@pytest.fixture
+def db_clean():
+    """Empty the tables the tests write to, before and after each test"""
+    def clean():
+        db = SessionLocal()
+        try:
+            db.query(OCRJob).delete()
+            db.query(Document).delete()
+            db.query(ImageBlob).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    clean()
+    yield
+    clean()
+
+
+@pytest.fixture
+def relative_dir():
+    """Fresh directory name relative to the working directory (ImageStore roots must be relative)"""
+    name = f"dir_{uuid.uuid4().hex[:8]}"
+    os.makedirs(name)
+    return name
+
+
+@pytest.fixture(scope="session")
+def main_module():
+    """main.py imported in the scratch directory (no startup events run)"""
+    os.environ.setdefault("GROQ_API_KEY", "test")
+    import main
+    return main
+
+
+@pytest.fixture
+def client(main_module):
+    from fastapi.testclient import TestClient
+    return TestClient(main_module.app)
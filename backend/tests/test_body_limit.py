@@ -0,0 +1,51 @@
+# tests/test_body_limit.py
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def limited_client(main_module):
+    app = FastAPI()
+    seen = []
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        body = await request.body()
+        seen.append(len(body))
+        return {"size": len(body)}
+
+    client = TestClient(main_module.RequestBodyLimit(app, max_bytes=1000))
+    client.seen = seen
+    return client
+
+
+def chunks(*sizes):
+    # A generator body has no Content-Length: it is sent chunked
+    for size in sizes:
+        yield b"x" * size
+
+
+def test_chunked_body_under_the_limit(limited_client):
+    response = limited_client.post("/echo", content=chunks(400, 400))
+    assert response.status_code == 200
+    assert response.json() == {"size": 800}
+
+
+def test_chunked_body_over_the_limit_is_cut_short(limited_client):
+    response = limited_client.post("/echo", content=chunks(600, 600, 600))
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Request body too large"}
+    assert limited_client.seen == []  # the endpoint never got the body
+
+
+def test_declared_length_over_the_limit(limited_client):
+    response = limited_client.post("/echo", content=b"x" * 1001)
+    assert response.status_code == 413
+
+
+def test_app_uploads_are_limited(main_module, client):
+    limit = 2 * main_module.UPLOAD_MAX_BYTES + 64 * 1024
+    response = client.post("/ocr", content=chunks(limit // 2, limit // 2 + 1),
+                           headers={"Content-Type": "multipart/form-data; boundary=x"})
+    assert response.status_code == 413
@@ -0,0 +1,152 @@
+# tests/test_face_index.py
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from face_index import SharedFaceIndex, DELETED_ID, COUNT_OFFSET, CAPACITY_OFFSET
+
+DIM = 8
+
+
+def vectors(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(count, DIM)).astype(np.float32)
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path / "index.bin")
+
+
+def test_add_search_and_replace(index_path):
+    index = SharedFaceIndex(index_path, dim=DIM, initial_capacity=4)
+    embeddings = vectors(3)
+    index.add_many([1, 2, 3], embeddings)
+
+    assert len(index) == 3
+    assert index.search(embeddings[1], threshold=0.99, top_k=1)[0]["document_id"] == 2
+
+    # Same id again: the row is replaced, not duplicated
+    replacement = vectors(1, seed=1)[0]
+    index.add(2, replacement)
+    assert len(index) == 3
+    assert index.search(replacement, threshold=0.99, top_k=1)[0]["document_id"] == 2
+    assert 2 not in [m["document_id"] for m in index.search(embeddings[1], threshold=0.99)]
+
+
+def test_tombstones_are_skipped_then_dropped_on_grow(index_path):
+    index = SharedFaceIndex(index_path, dim=DIM, initial_capacity=4)
+    embeddings = vectors(4)
+    index.add_many([1, 2, 3, 4], embeddings)
+
+    assert index.remove(2)
+    assert not index.remove(2)
+    assert len(index) == 3
+    assert index.document_ids() == {1, 3, 4}
+    assert 2 not in [m["document_id"] for m in index.search(embeddings[1], threshold=0.0, top_k=10)]
+    assert len(index.rows_for(np.array([1, 2, 3]))) == 2
+
+    # Full: growing rewrites the file without the tombstone
+    index.add_many([5, 6], vectors(2, seed=1))
+    assert index._read_u64(COUNT_OFFSET) == 5
+    assert DELETED_ID not in index._ids[:5]
+    assert index.document_ids() == {1, 3, 4, 5, 6}
+    assert index.search(embeddings[3], threshold=0.99, top_k=1)[0]["document_id"] == 4
+
+
+def test_superseded_file_is_remapped_by_other_instances(index_path):
+    writer = SharedFaceIndex(index_path, dim=DIM, initial_capacity=2)
+    reader = SharedFaceIndex(index_path, dim=DIM, initial_capacity=2)
+    old_mapping = reader._mm
+
+    embeddings = vectors(5)
+    writer.add_many(range(1, 6), embeddings)  # grows past the initial capacity
+
+    assert len(reader) == 5  # the old file is flagged superseded: the reader remaps first
+    assert reader.search(embeddings[4], threshold=0.99, top_k=1)[0]["document_id"] == 5
+    assert reader._mm is not old_mapping
+    assert reader._read_u64(CAPACITY_OFFSET) == writer._read_u64(CAPACITY_OFFSET)
+
+
+def test_sync_state_compare_and_set(index_path):
+    index = SharedFaceIndex(index_path, dim=DIM)
+    index.set_sync_state(10, 40)
+
+    assert not index.advance_sync_state(expected_max_id=39, max_id=45, added=2)
+    assert index.advance_sync_state(expected_max_id=40, max_id=45, added=2)
+    assert index.sync_state == (12, 45)
+
+    # Deleting the highest id lowers the stamp, so a reused id is not taken as indexed
+    index.forget_synced_document(45, max_id=44)
+    assert index.sync_state == (11, 44)
+    # A document above the stamp was never counted
+    index.forget_synced_document(50, max_id=44)
+    assert index.sync_state == (11, 44)
+
+
+def _add_range(path: str, start: int, count: int):
+    index = SharedFaceIndex(path, dim=DIM, initial_capacity=2)
+    for offset in range(0, count, 5):
+        ids = list(range(start + offset, start + min(offset + 5, count)))
+        index.add_many(ids, vectors(len(ids), seed=ids[0]))
+
+
+def test_concurrent_add_many_from_processes(index_path):
+    SharedFaceIndex(index_path, dim=DIM, initial_capacity=2)
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_add_range, args=(index_path, 1000 * (i + 1), 60)) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    index = SharedFaceIndex(index_path, dim=DIM)
+    expected = {1000 * (i + 1) + n for i in range(4) for n in range(60)}
+    assert index.document_ids() == expected
+    assert len(index) == len(expected)
+
+
+def _add_one(path: str, doc_id: int, embedding: np.ndarray):
+    SharedFaceIndex(path, dim=DIM).add(doc_id, embedding)
+
+
+def _remove_one(path: str, doc_id: int):
+    SharedFaceIndex(path, dim=DIM).remove(doc_id)
+
+
+def test_other_process_writes_are_visible_to_searches(index_path):
+    index = SharedFaceIndex(index_path, dim=DIM, initial_capacity=2)
+    index.add_many([1, 2], vectors(2))
+    embedding = vectors(1, seed=7)[0]
+    context = multiprocessing.get_context("fork")
+
+    # The other process has to grow the file: this mapping goes stale
+    child = context.Process(target=_add_one, args=(index_path, 42, embedding))
+    child.start()
+    child.join(30)
+    assert child.exitcode == 0
+    assert index.search(embedding, threshold=0.99, top_k=1)[0]["document_id"] == 42
+    assert len(index) == 3
+
+    child = context.Process(target=_remove_one, args=(index_path, 42))
+    child.start()
+    child.join(30)
+    assert child.exitcode == 0
+    assert 42 not in [m["document_id"] for m in index.search(embedding, threshold=0.0, top_k=10)]
+    assert len(index) == 2
+
+
+def test_top_k_and_candidate_rows(index_path):
+    index = SharedFaceIndex(index_path, dim=DIM, initial_capacity=2)
+    embeddings = vectors(2)
+    index.add_many([1, 2], embeddings)
+
+    assert index.search(embeddings[0], threshold=0.0, top_k=0) == []
+    assert index.search(embeddings[0], threshold=0.0, top_k=-1) == []
+
+    # Rows resolved before a grow moved them are recomputed, not reused
+    candidates = index.candidate_rows(np.array([2]))
+    index.add_many([3, 4], vectors(2, seed=1))
+    matches = index.search(embeddings[1], threshold=0.0, top_k=10, candidate_rows=candidates)
+    assert [m["document_id"] for m in matches] == [2]
@@ -0,0 +1,64 @@
+# tests/test_face_prefilter.py
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+
+from database import SessionLocal, Document
+
+
+def add_face_documents(*places):
+    db = SessionLocal()
+    try:
+        for i, place in enumerate(places):
+            db.add(Document(folder_name=f"face-{i}", numero_cin=f"{i:012d}", has_face_photo=True,
+                            lieu_naissance=place, sexe="M", date_naissance="01/01/1990"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def candidates(main_module, **filters):
+    db = SessionLocal()
+    try:
+        ids = main_module.face_candidate_ids(db, **filters)
+        return None if ids is None else len(ids)
+    finally:
+        db.close()
+
+
+def test_place_prefix_ignores_accents_and_case(db_clean, main_module):
+    add_face_documents("Fénérive Est", "FENERIVE", "Antsirabe", None)
+    assert candidates(main_module, lieu_naissance="fene") == 2
+    assert candidates(main_module, lieu_naissance="FÉNÉRIVE E") == 1
+    assert candidates(main_module, lieu_naissance="ant") == 1
+
+
+def test_blank_place_is_no_filter(db_clean, main_module):
+    add_face_documents("Antsirabe")
+    # Blank or accent-only input used to reach prefix[-1] on an empty key
+    assert candidates(main_module, lieu_naissance="   ") is None
+    assert candidates(main_module, lieu_naissance="\u0301") is None
+    assert candidates(main_module, lieu_naissance=" ", sexe="m") == 1
+
+
+def test_place_key_column_kept_up_to_date(db_clean):
+    add_face_documents("Fénérive")
+    db = SessionLocal()
+    try:
+        doc = db.query(Document).one()
+        assert doc.lieu_naissance_key == "fenerive"
+        doc.lieu_naissance = "Ambatondrazaka"
+        db.commit()
+        assert db.query(Document.lieu_naissance_key).scalar() == "ambatondrazaka"
+    finally:
+        db.close()
+
+    # No custom SQL function: the database stays writable from a plain sqlite3 connection
+    with sqlite3.connect("documents.db") as conn:
+        conn.execute("UPDATE documents SET nom = 'X'")
+
+
+def test_search_rejects_top_k_out_of_range(client):
+    response = client.post("/face/search?top_k=0", files={"file": ("q.jpg", b"x", "image/jpeg")})
+    assert response.status_code == 422
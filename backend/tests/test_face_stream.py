@@ -0,0 +1,43 @@
+# tests/test_face_stream.py
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from face_stream import FaceTracker, box_iou
+
+
+def test_box_iou():
+    assert box_iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert box_iou((0, 0, 10, 10), (20, 20, 10, 10)) == 0.0
+    assert box_iou((0, 0, 10, 10), (5, 0, 10, 10)) == pytest.approx(50 / 150)
+
+
+def test_tracker_follows_confirms_and_loses_faces():
+    tracker = FaceTracker(iou_threshold=0.3, min_hits=2, max_missed=1)
+
+    visible, _ = tracker.update([(0, 0, 100, 100)])
+    (track,) = visible
+    assert not tracker.confirmed(track)
+
+    # Moved a little: same track, now confirmed; a second face starts its own track
+    visible, _ = tracker.update([(10, 5, 100, 100), (300, 300, 80, 80)])
+    assert [t.track_id for t in visible] == [track.track_id, track.track_id + 1]
+    assert track.box == (10, 5, 100, 100)
+    assert tracker.confirmed(track)
+
+    # The first face disappears: kept for max_missed frames, then lost
+    visible, lost = tracker.update([(300, 300, 80, 80)])
+    assert lost == [] and track.track_id in tracker.tracks
+    visible, lost = tracker.update([(302, 300, 80, 80)])
+    assert lost == [track] and track.lost
+    assert [t.track_id for t in visible] == [track.track_id + 1]
+
+
+def test_stream_refuses_foreign_origins(client):
+    with pytest.raises(WebSocketDisconnect) as refused:
+        with client.websocket_connect("/face/stream", headers={"Origin": "http://evil.example"}):
+            pass
+    assert refused.value.code == 1008
+
+    with client.websocket_connect("/face/stream", headers={"Origin": "http://localhost:5173"}) as ws:
+        ws.send_bytes(b"")
+        assert ws.receive_json()["type"] == "error"
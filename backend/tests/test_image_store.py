@@ -0,0 +1,116 @@
+# tests/test_image_store.py
+import os
+
+import pytest
+
+from database import SessionLocal, ImageBlob
+from image_store import ImageStore
+
+
+@pytest.fixture
+def store(db_clean, relative_dir):
+    return ImageStore(root=relative_dir)
+
+
+def ref_count(path: str):
+    db = SessionLocal()
+    try:
+        blob = db.get(ImageBlob, os.path.splitext(os.path.basename(path))[0])
+        return blob.ref_count if blob else None
+    finally:
+        db.close()
+
+
+def put_committed(store: ImageStore, data: bytes) -> str:
+    db = SessionLocal()
+    try:
+        path = store.put(db, data)
+        db.commit()
+        return path
+    finally:
+        db.close()
+
+
+def release_committed(store: ImageStore, path: str):
+    db = SessionLocal()
+    try:
+        orphaned = store.release(db, path)
+        db.commit()
+        return orphaned
+    finally:
+        db.close()
+
+
+def test_identical_bytes_are_stored_once(store):
+    first = put_committed(store, b"photo")
+    second = put_committed(store, b"photo")
+
+    assert first == second
+    assert store.is_content_addressed(first)
+    assert ref_count(first) == 2
+    assert os.listdir(os.path.dirname(first)) == [os.path.basename(first)]
+
+
+def test_file_removed_with_its_last_reference(store):
+    path = put_committed(store, b"photo")
+    put_committed(store, b"photo")
+
+    assert release_committed(store, path) is None
+    assert ref_count(path) == 1
+
+    orphaned = release_committed(store, path)
+    assert orphaned == path
+    store.remove_unreferenced(orphaned)
+    assert ref_count(path) is None
+    assert not os.path.exists(path)
+
+
+def test_unlink_skipped_when_referenced_again(store):
+    path = put_committed(store, b"photo")
+    orphaned = release_committed(store, path)
+    # A save of the same bytes commits before the delete gets to unlink
+    put_committed(store, b"photo")
+
+    store.remove_unreferenced(orphaned)
+    assert os.path.exists(path)
+    assert ref_count(path) == 1
+
+
+def test_file_rewritten_when_deleted_during_put(store):
+    path = put_committed(store, b"photo")
+    db = SessionLocal()
+    execute = db.execute
+
+    def delete_then_execute(*args, **kwargs):
+        # The delete completes after put() found the file, before its upsert
+        db.execute = execute
+        store.remove_unreferenced(release_committed(store, path))
+        assert not os.path.exists(path)
+        return execute(*args, **kwargs)
+
+    db.execute = delete_then_execute
+    try:
+        assert store.put(db, b"photo") == path
+        db.commit()
+    finally:
+        db.close()
+
+    assert os.path.exists(path)
+    assert ref_count(path) == 1
+
+
+def test_rollback_removes_new_file_only(store):
+    shared = put_committed(store, b"shared")
+    db = SessionLocal()
+    try:
+        new = store.put(db, b"new")
+        assert store.put(db, b"shared") == shared
+        db.rollback()
+        store.rollback_files(db)
+    finally:
+        db.close()
+
+    assert not os.path.exists(new)
+    assert ref_count(new) is None
+    assert os.path.exists(shared)
+    assert ref_count(shared) == 1
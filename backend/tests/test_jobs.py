@@ -0,0 +1,140 @@
+# tests/test_jobs.py
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from database import SessionLocal, OCRJob
+from jobs import JobQueue, JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING
+
+
+@pytest.fixture
+def queue(db_clean):
+    return JobQueue(handlers={"ocr": lambda job: {"ok": True}}, workers=0, max_attempts=2, lease_seconds=60)
+
+
+def set_job(job_id: str, **values):
+    db = SessionLocal()
+    try:
+        db.execute(update(OCRJob).where(OCRJob.id == job_id).values(**values))
+        db.commit()
+    finally:
+        db.close()
+
+
+def load_job(job_id: str) -> OCRJob:
+    db = SessionLocal()
+    try:
+        job = db.get(OCRJob, job_id)
+        db.expunge(job)
+        return job
+    finally:
+        db.close()
+
+
+def test_claim_order_priority_then_age(queue):
+    old = queue.submit("ocr", b"a", "image/jpeg")
+    urgent = queue.submit("ocr", b"b", "image/jpeg", priority=5)
+    new = queue.submit("ocr", b"c", "image/jpeg")
+    set_job(old.id, created_at=datetime.now() - timedelta(minutes=1))
+
+    assert [queue.claim().id for _ in range(3)] == [urgent.id, old.id, new.id]
+    assert queue.claim() is None
+
+
+def test_claim_takes_a_lease(queue):
+    job = queue.submit("ocr", b"a", "image/jpeg")
+    claimed = queue.claim()
+
+    assert claimed.id == job.id
+    assert claimed.status == JOB_RUNNING
+    assert claimed.attempts == 1
+    assert claimed.locked_until > datetime.now()
+    # Leased: nobody else gets it
+    assert queue.claim() is None
+
+
+def test_expired_lease_is_reclaimed(queue):
+    job = queue.submit("ocr", b"a", "image/jpeg")
+    queue.claim()
+    # The worker holding it died: its lease runs out
+    set_job(job.id, locked_until=datetime.now() - timedelta(seconds=1))
+
+    reclaimed = queue.claim()
+    assert reclaimed.id == job.id
+    assert reclaimed.attempts == 2
+
+
+def test_concurrent_claims_are_exclusive(queue):
+    submitted = {queue.submit("ocr", bytes([i]), "image/jpeg").id for i in range(20)}
+    claimed, lock = [], threading.Lock()
+
+    def worker():
+        while (job := queue.claim()) is not None:
+            with lock:
+                claimed.append(job.id)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(submitted)
+
+
+def test_failed_attempt_backs_off_then_fails(db_clean):
+    def broken(job):
+        raise RuntimeError("engine down")
+
+    queue = JobQueue(handlers={"ocr": broken}, workers=0, max_attempts=2)
+    job = queue.submit("ocr", b"a", "image/jpeg")
+
+    assert queue.run_one()
+    retried = load_job(job.id)
+    assert retried.status == JOB_QUEUED
+    assert retried.available_at > datetime.now()
+    assert retried.error == "engine down"
+    assert queue.claim() is None  # still backing off
+
+    set_job(job.id, available_at=datetime.now())
+    assert queue.run_one()
+    failed = load_job(job.id)
+    assert failed.status == JOB_FAILED
+    assert failed.recto is None  # nothing left to save
+
+
+def test_done_job_keeps_its_input_until_released(queue):
+    job = queue.submit("ocr", b"recto", "image/png")
+    assert queue.run_one()
+
+    assert queue.get(job.id)["status"] == JOB_DONE
+    assert queue.get_input(job.id) == (b"recto", "image/png")
+
+    queue.release_input(job.id)
+    assert queue.get_input(job.id) is None
+
+
+def test_purge_drops_unsaved_inputs_past_retention(queue):
+    kept = queue.submit("ocr", b"kept", "image/jpeg")
+    stale = queue.submit("ocr", b"stale", "image/jpeg")
+    assert queue.run_one() and queue.run_one()
+    set_job(stale.id, updated_at=datetime.now() - timedelta(seconds=queue.input_retention_seconds + 1))
+
+    assert queue.purge_inputs() == 1
+    assert queue.get_input(stale.id) is None
+    assert queue.get_input(kept.id) == (b"kept", "image/jpeg")
+
+
+def test_job_endpoints(db_clean, client):
+    response = client.post("/jobs/ocr", files={"file": ("cin.png", b"recto", "image/png")})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert client.get(f"/jobs/{job_id}").json()["status"] == JOB_QUEUED
+    assert client.get("/jobs/unknown").status_code == 404
+
+    set_job(job_id, status=JOB_FAILED, error="engine down")
+    events = client.get(f"/jobs/{job_id}/events").text
+    assert events.count("event: status") == 1
+    assert '"engine down"' in events
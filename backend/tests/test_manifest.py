@@ -0,0 +1,65 @@
+# tests/test_manifest.py
+import base64
+import json
+import os
+
+import pytest
+
+from ocr import DocumentStorage
+
+IMAGE = base64.b64encode(b"jpeg").decode("ascii")
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return DocumentStorage(str(tmp_path / "documents"))
+
+
+def save(storage: DocumentStorage, cin: str, doc_type: str = "CIN Madagascar") -> str:
+    return storage.save_document({"type_document": doc_type, "numero_cin": cin, "nom": f"NOM {cin}"}, IMAGE, "cin.jpg")
+
+
+def test_list_keeps_the_data_key_and_filters(storage):
+    save(storage, "101")
+    save(storage, "102", doc_type="Facture")
+
+    documents = storage.list_documents()
+    assert len(documents) == 2
+    assert {doc["data"]["numero_cin"] for doc in documents} == {"101", "102"}
+    assert set(documents[0]) >= {"folder", "type", "date", "path", "data"}
+
+    assert [doc["numero_cin"] for doc in storage.list_documents(doc_type="Facture")] == ["102"]
+    assert "data" not in storage.list_documents(numero_cin="101", include_data=False)[0]
+    assert storage.count_documents(doc_type="CIN Madagascar") == 1
+    assert len(storage.list_documents(limit=1, offset=1)) == 1
+
+
+def test_existing_archive_is_indexed_on_first_start(storage):
+    save(storage, "201")
+    os.remove(storage.manifest_path)
+    reopened = DocumentStorage(str(storage.save_root))
+    assert [doc["numero_cin"] for doc in reopened.list_documents()] == ["201"]
+
+
+def test_verify_picks_up_changes_made_outside_the_api(storage):
+    kept = save(storage, "301")
+    edited = save(storage, "302")
+    removed = save(storage, "303")
+
+    json_path = os.path.join(edited, "document.json")
+    with open(json_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    metadata["numero_cin"] = "399"
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+    os.utime(json_path, ns=(0, os.stat(json_path).st_mtime_ns + 1_000_000))
+    os.remove(os.path.join(removed, "document.json"))
+
+    report = storage.verify_manifest(repair=False)
+    assert report == {"added": [], "updated": [os.path.basename(edited)], "removed": [os.path.basename(removed)]}
+    assert storage.count_documents() == 3
+
+    storage.verify_manifest()
+    assert sorted(doc["numero_cin"] for doc in storage.list_documents()) == ["301", "399"]
+    assert storage.verify_manifest(repair=False) == {"added": [], "updated": [], "removed": []}
+    assert os.path.basename(kept) in {doc["folder"] for doc in storage.list_documents()}
@@ -0,0 +1,66 @@
+# tests/test_ocr_parser.py
+import pytest
+
+from ocr import OCRExtractor, TesseractOCRExtractor, field_coverage
+
+
+@pytest.fixture
+def parser():
+    # parse_fields needs no Tesseract binary: skip the constructor's check
+    return TesseractOCRExtractor.__new__(TesseractOCRExtractor)
+
+
+def test_malagasy_labels(parser):
+    lines = [
+        "REPOBLIKAN'I MADAGASIKARA",
+        "KARAPANONDROM-PIRENENA",
+        "101 211 123 456",
+        "Anarana : RAKOTO",
+        "Fanampin'anarana : Jean Marie",
+        "Teraka tamin'ny : 3/7/1990",
+        "Tao : Fénérive Est",
+        "Lahy",
+    ]
+    data = parser.parse_fields(lines)
+    assert data["numero_cin"] == "101 211 123 456"
+    assert data["nom"] == "RAKOTO"
+    assert data["prenoms"] == "Jean Marie"
+    assert data["date_naissance"] == "03/07/1990"
+    assert data["lieu_naissance"] == "Fénérive Est"
+    assert data["sexe"] == "M"
+    assert data["type_document"] == "CIN Madagascar"
+    assert field_coverage(data) == 1.0
+
+
+def test_french_labels_and_value_on_next_line(parser):
+    lines = [
+        "Carte nationale d'identité",
+        "Nom :",
+        "RASOA",
+        "Prénoms : Marie",
+        "Délivrée le 12.01.2015",
+        "Domicile : Lot II A 45 Antananarivo",
+        "Sexe : F",
+    ]
+    data = parser.parse_fields(lines)
+    assert data["nom"] == "RASOA"
+    assert data["prenoms"] == "Marie"
+    assert data["date_delivrance"] == "12/01/2015"
+    assert data["adresse"] == "Lot II A 45 Antananarivo"
+    assert data["sexe"] == "F"
+    assert data["numero_cin"] == ""
+    assert data["type_document"] == "CIN Madagascar"
+
+
+def test_unreadable_date_is_left_empty(parser):
+    data = parser.parse_fields(["Teraka tamin'ny : illisible", "facture n° 42"])
+    assert data["date_naissance"] == ""
+    assert data["type_document"] == "Document inconnu"
+
+
+def test_engines_must_implement_extract():
+    class Incomplete(OCRExtractor):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,51 @@
+# tests/test_query_cache.py
+import numpy as np
+
+from query_cache import QueryEmbeddingCache, NO_FACE
+
+
+def embedding(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=128)
+
+
+def test_lru_bounds_and_no_face():
+    cache = QueryEmbeddingCache("v1", max_entries=2)
+    cache.put("a", embedding(0))
+    cache.put("b", None)
+    assert cache.get("b") is NO_FACE
+    assert cache.get("a") is not None  # a is now the most recent
+    cache.put("c", embedding(2))
+    assert cache.get("b") is None
+    assert cache.stats()["entries"] == 2
+
+    by_bytes = QueryEmbeddingCache("v1", max_bytes=embedding(0).nbytes)
+    by_bytes.put("a", embedding(0))
+    by_bytes.put("b", embedding(1))
+    assert by_bytes.get("a") is None and by_bytes.get("b") is not None
+
+
+def test_model_version_is_part_of_the_key(tmp_path):
+    shared = str(tmp_path / "shared.sqlite")
+    QueryEmbeddingCache("v1", shared_db=shared).put("a", embedding(0))
+    assert QueryEmbeddingCache("v2", shared_db=shared).get("a") is None
+
+
+def test_shared_between_workers(tmp_path):
+    shared = str(tmp_path / "shared.sqlite")
+    first = QueryEmbeddingCache("v1", max_entries=2, shared_db=shared)
+    second = QueryEmbeddingCache("v1", max_entries=2, shared_db=shared)
+
+    vector = embedding(0).astype(np.float32)
+    first.put("a", vector)
+    first.put("b", None)
+    found = second.get("a")
+    assert found.dtype == np.float32 and np.array_equal(found, vector)
+    assert second.get("b") is NO_FACE
+    assert second.stats()["entries"] == 2  # copied into its own LRU
+
+    # The shared table keeps the most recently used entries: reads count
+    first.put("c", embedding(2))
+    third = QueryEmbeddingCache("v1", shared_db=shared)
+    assert third.get("a") is None
+    assert third.get("b") is NO_FACE
+    assert first.stats()["shared_entries"] == 2
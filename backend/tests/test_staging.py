@@ -0,0 +1,56 @@
+# tests/test_staging.py
+import time
+
+import pytest
+
+from staging import UploadStaging, UploadTooLarge
+
+
+@pytest.fixture
+def staging(tmp_path):
+    return UploadStaging(directory=str(tmp_path), ttl_seconds=60, max_bytes=100)
+
+
+def test_shared_between_instances_with_face_reuse(staging):
+    staged = staging.put(b"image", "image/png")
+    calls = []
+    assert staged.face_photo(lambda data: calls.append(data) or b"face") == b"face"
+
+    # Another worker: same directory, own connection
+    other = UploadStaging(directory=staging.directory, ttl_seconds=60, max_bytes=100)
+    again = other.get(staged.upload_id)
+    assert again.image_bytes == b"image" and again.content_type == "image/png"
+    assert again.face_photo(lambda data: calls.append(data) or b"other") == b"face"
+    assert calls == [b"image"]
+
+
+def test_expired_uploads_are_dropped(staging):
+    staged = staging.put(b"image")
+    staging.ttl_seconds = 0.01
+    time.sleep(0.02)
+    assert staging.get(staged.upload_id) is None
+    assert staging.total_bytes() == 0
+
+
+def test_oldest_evicted_never_the_new_one(staging):
+    first = staging.put(b"a" * 40)
+    second = staging.put(b"b" * 40)
+    third = staging.put(b"c" * 40)
+    assert staging.get(first.upload_id) is None
+    assert staging.get(second.upload_id) is not None
+    assert staging.get(third.upload_id) is not None
+
+    # Fits alone: everything else goes, the upload itself stays
+    full = staging.put(b"d" * 100)
+    assert staging.get(full.upload_id).image_bytes == b"d" * 100
+    assert staging.total_bytes() == 100
+
+
+def test_upload_larger_than_staging_is_refused(staging, main_module, client, monkeypatch):
+    with pytest.raises(UploadTooLarge):
+        staging.put(b"x" * 101)
+    assert staging.total_bytes() == 0
+
+    monkeypatch.setattr(main_module, "upload_staging", staging)
+    response = client.post("/ocr", files={"file": ("big.png", b"x" * 101, "image/png")})
+    assert response.status_code == 413
@@ -0,0 +1,58 @@
+# tests/test_thumbnails.py
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from database import SessionLocal
+from image_store import ImageStore
+from thumbnails import ThumbnailCache
+
+
+@pytest.fixture
+def cache(db_clean, relative_dir):
+    store = ImageStore(root=os.path.join(relative_dir, "images"))
+    return ThumbnailCache(store, cache_root=os.path.join(relative_dir, "thumbnails"))
+
+
+def put_photo(cache: ThumbnailCache) -> str:
+    """Stored JPEG, as a path relative to the images folder"""
+    ok, encoded = cv2.imencode(".jpg", np.full((400, 300, 3), 128, dtype=np.uint8))
+    assert ok
+    db = SessionLocal()
+    try:
+        path = cache.image_store.put(db, encoded.tobytes())
+        db.commit()
+    finally:
+        db.close()
+    return os.path.relpath(path, cache.image_store.root).replace(os.sep, "/")
+
+
+def test_thumbnail_is_resized_and_cached(cache):
+    relative = put_photo(cache)
+    thumbnail = cache.get(relative, 128)
+    assert thumbnail == cache.thumbnail_path(relative, 128)
+    assert max(cv2.imread(thumbnail).shape[:2]) == 128
+    assert cache.get(relative, 128) == thumbnail
+
+
+def test_dot_dot_paths_stay_in_the_cache(cache):
+    relative = put_photo(cache)
+    expected = cache.thumbnail_path(relative, 128)
+    # Detours that resolve to a stored photo share its canonical cache entry
+    images = os.path.basename(cache.image_store.root)
+    assert cache.get(f"{relative.split('/')[0]}/../{relative}", 128) == expected
+    assert cache.get(f"../{images}/{relative}", 128) == expected
+
+    # Escaping the images folder is refused and nothing is written
+    assert cache.get(f"../../{relative}", 128) is None
+    cache_root = os.path.realpath(cache.cache_root)
+    written = [os.path.join(root, name) for root, _, files in os.walk(os.path.dirname(cache_root)) for name in files if name.endswith(".webp")]
+    assert [os.path.realpath(path) for path in written] == [os.path.realpath(expected)]
+    assert os.path.realpath(expected).startswith(cache_root + os.sep)
+
+    with pytest.raises(ValueError):
+        cache.thumbnail_path("../../etc/passwd", 128)
+    with pytest.raises(ValueError):
+        cache.thumbnail_path("/etc/passwd", 128)
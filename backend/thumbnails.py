@@ -0,0 +1,152 @@
+# thumbnails.py
+import hashlib
+import os
+import uuid
+from typing import Optional, Tuple
+
+from fastapi.staticfiles import StaticFiles
+
+from metrics import metrics, log
+
+# Fixed sizes only - arbitrary sizes would let clients fill the disk cache
+THUMBNAIL_SIZES = (128, 256, 512)
+
+# Content-addressed files never change: browsers may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Legacy flat files can be replaced, revalidate them regularly
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+
+class ThumbnailCache:
+    """
+    On-demand WebP thumbnails of stored photos, cached on disk.
+
+    `images/ab/cd/<sha256>.jpg` at size 256 is cached as
+    `thumbnails/256/ab/cd/<sha256>.webp`. Each thumbnail fits inside a
+    size x size box, keeping the aspect ratio, and is never upscaled.
+    """
+
+    def __init__(self, image_store, cache_root: str = "thumbnails", quality: int = 80):
+        self.image_store = image_store
+        self.cache_root = cache_root
+        self.quality = quality
+        os.makedirs(self.cache_root, exist_ok=True)
+
+    def source_path(self, relative_path: str) -> Optional[str]:
+        """Resolve a path relative to the images folder, refusing anything outside it"""
+        root = os.path.realpath(self.image_store.root)
+        full_path = os.path.realpath(os.path.join(root, relative_path))
+        if os.path.commonpath([root, full_path]) != root or not os.path.isfile(full_path):
+            return None
+        return full_path
+
+    def canonical_path(self, relative_path: str) -> Optional[str]:
+        """
+        Normalized form of a path relative to the images folder, rebuilt from
+        the resolved file: "a/../b.jpg" and "b.jpg" share one cache entry.
+        """
+        source = self.source_path(relative_path)
+        if source is None:
+            return None
+        return os.path.relpath(source, os.path.realpath(self.image_store.root)).replace(os.sep, "/")
+
+    def thumbnail_path(self, relative_path: str, size: int) -> str:
+        """Cache file of a canonical relative path - never outside the cache root"""
+        stem = os.path.splitext(os.path.normpath(relative_path).replace("\\", "/"))[0]
+        if os.path.isabs(stem) or stem == ".." or stem.startswith("../"):
+            raise ValueError(f"Invalid image path: {relative_path}")
+        return os.path.join(self.cache_root, str(size), f"{stem}.webp")
+
+    def get(self, relative_path: str, size: int) -> Optional[str]:
+        """
+        Path of the cached thumbnail for `relative_path`, generating it on
+        first request (or when a legacy source changed since).
+        """
+        source = self.source_path(relative_path)
+        if source is None:
+            return None
+
+        # Built from the resolved source, never from the raw request path
+        thumbnail = self.thumbnail_path(self.canonical_path(relative_path), size)
+        if os.path.exists(thumbnail) and os.path.getmtime(thumbnail) >= os.path.getmtime(source):
+            metrics.inc("thumbnail_cache_hit")
+            return thumbnail
+
+        metrics.inc("thumbnail_cache_miss")
+        with metrics.timer("thumbnail_generate"):
+            data = self._render(source, size)
+        if data is None:
+            return None
+        self._atomic_write(thumbnail, data)
+        return thumbnail
+
+    def invalidate(self, photo_path: str):
+        """Remove every cached size of a stored photo (called when the photo is deleted)"""
+        relative_path = os.path.relpath(photo_path, self.image_store.root)
+        for size in THUMBNAIL_SIZES:
+            try:
+                thumbnail = self.thumbnail_path(relative_path, size)
+                if os.path.exists(thumbnail):
+                    os.remove(thumbnail)
+            except (OSError, ValueError) as e:
+                log(f"⚠️ Warning: Could not delete thumbnail: {str(e)}")
+
+    def etag(self, relative_path: str, size: int) -> str:
+        """Strong ETag: the content hash for content-addressed photos, else mtime/size based"""
+        relative_path = self.canonical_path(relative_path)
+        if self.image_store.is_content_addressed(f"{self.image_store.root}/{relative_path}"):
+            digest = os.path.splitext(os.path.basename(relative_path))[0]
+            return f'"{digest}-{size}-webp"'
+        stat = os.stat(self.source_path(relative_path))
+        fingerprint = hashlib.md5(f"{relative_path}-{stat.st_mtime_ns}-{stat.st_size}".encode()).hexdigest()
+        return f'"{fingerprint}-{size}-webp"'
+
+    def cache_control(self, relative_path: str) -> str:
+        relative_path = self.canonical_path(relative_path)
+        if self.image_store.is_content_addressed(f"{self.image_store.root}/{relative_path}"):
+            return IMMUTABLE_CACHE_CONTROL
+        return DEFAULT_CACHE_CONTROL
+
+    def _render(self, source: str, size: int) -> Optional[bytes]:
+        import cv2  # loaded on the first thumbnail rendered, not at startup
+        img = cv2.imread(source, cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+
+        height, width = img.shape[:2]
+        scale = min(size / width, size / height, 1.0)
+        if scale < 1.0:
+            new_size: Tuple[int, int] = (max(1, round(width * scale)), max(1, round(height * scale)))
+            img = cv2.resize(img, new_size, interpolation=cv2.INTER_AREA)
+
+        success, encoded = cv2.imencode(".webp", img, [cv2.IMWRITE_WEBP_QUALITY, self.quality])
+        return encoded.tobytes() if success else None
+
+    def _atomic_write(self, path: str, data: bytes):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        temp_path = os.path.join(directory, f".tmp-{uuid.uuid4().hex}")
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that marks content-addressed files as immutable"""
+
+    def __init__(self, *args, image_store=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.image_store = image_store
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        relative_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        if self.image_store and self.image_store.is_content_addressed(f"{self.image_store.root}/{relative_path}"):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = DEFAULT_CACHE_CONTROL
+        return response
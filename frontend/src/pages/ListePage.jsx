@@ -17,6 +17,7 @@ export default function ListePage() {
   // Photo Search States
   const [photoSearchMode, setPhotoSearchMode] = useState(false);
   const [photoFile, setPhotoFile] = useState(null);
+  const [photoQueryId, setPhotoQueryId] = useState(null); // reuse the server-side embedding
   const [photoPreview, setPhotoPreview] = useState(null);
   const [photoSearchResults, setPhotoSearchResults] = useState([]);
   const [photoSearchLoading, setPhotoSearchLoading] = useState(false);
@@ -110,6 +111,7 @@ export default function ListePage() {
     }
 
     setPhotoFile(file);
+    setPhotoQueryId(null);
     setPhotoSearchResults([]);
 
     // Create preview
@@ -130,19 +132,32 @@ export default function ListePage() {
     setError("");
 
     try {
-      const formData = new FormData();
-      formData.append("file", photoFile);
-
-      const response = await axios.post(
-        `${API_URL}/face/search?threshold=0.65&top_k=10`, // 0.65 = 65%
-        formData,
-        {
-          headers: {
-            "Content-Type": "multipart/form-data",
-          },
-        }
-      );
+      const searchFace = (field, value) => {
+        const formData = new FormData();
+        formData.append(field, value);
+        return axios.post(
+          `${API_URL}/face/search?threshold=0.65&top_k=10`, // 0.65 = 65%
+          formData,
+          {
+            headers: {
+              "Content-Type": "multipart/form-data",
+            },
+          }
+        );
+      };
+
+      // Same photo again: send its query_id, re-upload only if the server forgot it
+      let response;
+      try {
+        response = photoQueryId
+          ? await searchFace("query_id", photoQueryId)
+          : await searchFace("file", photoFile);
+      } catch (err) {
+        if (!photoQueryId || err.response?.status !== 404) throw err;
+        response = await searchFace("file", photoFile);
+      }
 
+      setPhotoQueryId(response.data.query_id);
       setPhotoSearchResults(response.data.matches);
 
       // Highlight matching documents in the list
@@ -168,6 +183,7 @@ export default function ListePage() {
   const resetPhotoSearch = () => {
     setPhotoSearchMode(false);
     setPhotoFile(null);
+    setPhotoQueryId(null);
     setPhotoPreview(null);
     setPhotoSearchResults([]);
     if (fileInputRef.current) {
@@ -244,12 +260,15 @@ export default function ListePage() {
     }
   };
 
-  // Function to get photo URL
-  const getPhotoUrl = (photoPath) => {
+  // Function to get photo URL (a cached WebP thumbnail when size is given)
+  const getPhotoUrl = (photoPath, size) => {
     if (!photoPath) return null;
 
     // If it's a relative path, construct the full URL
     if (photoPath.startsWith("images/") || !photoPath.includes("http")) {
+      if (size && photoPath.startsWith("images/")) {
+        return `${API_URL}/thumbnails/${size}/${photoPath.slice("images/".length)}`;
+      }
       return `${API_URL}/${photoPath}`;
     }
 
@@ -479,7 +498,7 @@ export default function ListePage() {
             const photoMatch = photoSearchResults.find(
               (result) => result.document_id === doc.id
             );
-            const photoUrl = getPhotoUrl(doc.photo_visage_path);
+            const photoUrl = getPhotoUrl(doc.photo_visage_path, 256);
 
             return (
               <div
@@ -806,7 +825,8 @@ export default function ListePage() {
                             <div className="w-48 h-48 bg-gray-100 rounded-lg overflow-hidden">
                               <img
                                 src={getPhotoUrl(
-                                  selectedDocument.photo_visage_path
+                                  selectedDocument.photo_visage_path,
+                                  512
                                 )}
                                 alt="Face photo"
                                 className="w-full h-full object-cover"
@@ -10,9 +10,10 @@ export default function OrcPage() {
   const [facePhoto64, setFacePhoto64] = useState("");
   const [combinedData, setCombinedData] = useState({});
   const [imageRecto, setImageRecto] = useState(null);
+  const [rectoFile, setRectoFile] = useState(null);
   const [imageVerso, setImageVerso] = useState(null);
-  const [image64Recto, setImage64Recto] = useState("");
-  const [image64Verso, setImage64Verso] = useState("");
+  // Upload id returned by /ocr: the recto stays on the server
+  const [uploadIdRecto, setUploadIdRecto] = useState("");
   const [currentStep, setCurrentStep] = useState("recto");
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
@@ -56,18 +57,10 @@ export default function OrcPage() {
     return combined;
   };
 
-  const extractFacePhoto = async (imageBase64) => {
+  const extractFacePhoto = async (uploadId) => {
     try {
-      const byteCharacters = atob(imageBase64);
-      const byteNumbers = new Array(byteCharacters.length);
-      for (let i = 0; i < byteCharacters.length; i++) {
-        byteNumbers[i] = byteCharacters.charCodeAt(i);
-      }
-      const byteArray = new Uint8Array(byteNumbers);
-      const blob = new Blob([byteArray], { type: "image/jpeg" });
-
       const form = new FormData();
-      form.append("file", blob, "cin_image.jpg");
+      form.append("upload_id", uploadId);
 
       const res = await axios.post(`${API_URL}/extract-photo`, form, {
         headers: { "Content-Type": "multipart/form-data" },
@@ -163,65 +156,56 @@ export default function OrcPage() {
       return;
     }
 
+    const reader = new FileReader();
+    reader.onload = (e) => {
+      if (side === "recto") {
+        setImageRecto(e.target.result);
+      } else {
+        setImageVerso(e.target.result);
+      }
+    };
+    reader.readAsDataURL(file);
+
+    // The recto is only sent once the verso is known: both sides are
+    // extracted in a single /ocr/card call
+    if (side === "recto") {
+      setRectoFile(file);
+      setError("");
+      setSuccess("✅ Recto chargé! Maintenant, uploadez le verso.");
+      setCurrentStep("verso");
+      return;
+    }
+
     setLoading(true);
     setError("");
     setSuccess("");
 
     try {
-      const reader = new FileReader();
-      reader.onload = (e) => {
-        if (side === "recto") {
-          setImageRecto(e.target.result);
-        } else {
-          setImageVerso(e.target.result);
-        }
-      };
-      reader.readAsDataURL(file);
-
       const form = new FormData();
-      form.append("file", file);
+      form.append("recto", rectoFile);
+      form.append("verso", file);
 
-      console.log(`📤 Uploading ${side}...`);
-      const res = await axios.post(`${API_URL}/ocr`, form, {
+      console.log("📤 Uploading recto + verso...");
+      const res = await axios.post(`${API_URL}/ocr/card`, form, {
         headers: { "Content-Type": "multipart/form-data" },
       });
-      console.log(`✅ ${side} OCR response:`, res.data.data);
+      console.log("✅ Card OCR response:", res.data.data);
 
-      if (side === "recto") {
-        const rectoInfo = res.data.data;
-        const rectoImage = res.data.image_base64;
-
-        // Update recto data immediately
-        setRectoData(rectoInfo);
-        setImage64Recto(rectoImage);
-
-        // Extract face photo and wait for it
-        if (rectoImage) {
-          console.log("🔍 Extracting face photo...");
-          await extractFacePhoto(rectoImage);
-          console.log("✅ Face extraction completed");
-        }
-
-        setSuccess("✅ Recto extrait! Maintenant, uploadez le verso.");
-        setCurrentStep("verso");
-      } else {
-        const versoInfo = res.data.data;
-        const versoImage = res.data.image_base64;
-
-        // Update verso data
-        setVersoData(versoInfo);
-        setImage64Verso(versoImage);
-
-        // Combine data using the LATEST recto data
-        const combined = combineData(rectoData, versoInfo);
-        console.log("📋 Combined data:", combined);
-        setCombinedData(combined);
-
-        setSuccess(
-          "✅ Verso extrait! Données combinées. Vous pouvez maintenant éditer."
-        );
-        setCurrentStep("edit");
-      }
+      setRectoData(res.data.recto);
+      setVersoData(res.data.verso);
+      setUploadIdRecto(res.data.upload_id);
+
+      // Recto and verso are merged server-side
+      setCombinedData(res.data.data);
+
+      console.log("🔍 Extracting face photo...");
+      await extractFacePhoto(res.data.upload_id);
+      console.log("✅ Face extraction completed");
+
+      setSuccess(
+        "✅ Recto et verso extraits! Données combinées. Vous pouvez maintenant éditer."
+      );
+      setCurrentStep("edit");
     } catch (err) {
       setError(err.response?.data?.detail || "Erreur lors de l'extraction");
       console.error("❌ Erreur OCR:", err);
@@ -230,11 +214,35 @@ export default function OrcPage() {
     }
   };
 
-  const handleSkipVerso = () => {
-    const combined = combineData(rectoData, {});
-    setCombinedData(combined);
-    setCurrentStep("edit");
-    setSuccess("✅ Recto seulement. Vous pouvez maintenant éditer.");
+  const handleSkipVerso = async () => {
+    if (!rectoFile) return;
+
+    setLoading(true);
+    setError("");
+    setSuccess("");
+
+    try {
+      const form = new FormData();
+      form.append("file", rectoFile);
+
+      const res = await axios.post(`${API_URL}/ocr`, form, {
+        headers: { "Content-Type": "multipart/form-data" },
+      });
+
+      setRectoData(res.data.data);
+      setUploadIdRecto(res.data.upload_id);
+      await extractFacePhoto(res.data.upload_id);
+
+      const combined = combineData(res.data.data, {});
+      setCombinedData(combined);
+      setCurrentStep("edit");
+      setSuccess("✅ Recto seulement. Vous pouvez maintenant éditer.");
+    } catch (err) {
+      setError(err.response?.data?.detail || "Erreur lors de l'extraction");
+      console.error("❌ Erreur OCR:", err);
+    } finally {
+      setLoading(false);
+    }
   };
 
   const handleFieldChange = (key, value) => {
@@ -242,7 +250,7 @@ export default function OrcPage() {
   };
 
   const handleSave = async () => {
-    if (!image64Recto || Object.keys(combinedData).length === 0) {
+    if (!uploadIdRecto || Object.keys(combinedData).length === 0) {
       setError("Aucun document à enregistrer");
       return;
     }
@@ -266,12 +274,23 @@ export default function OrcPage() {
         adresse: combinedData.adresse || "",
       };
 
-      // Save ONCE with the recto image (face will be extracted server-side)
-      const saveResponse = await axios.post(`${API_URL}/save`, {
-        data: finalData,
-        image_base64: image64Recto,
-        filename: "cin_document.jpg",
-      });
+      // Save ONCE with the staged recto image (face already extracted server-side)
+      let saveResponse;
+      try {
+        saveResponse = await axios.post(`${API_URL}/save`, {
+          data: finalData,
+          upload_id: uploadIdRecto,
+          filename: "cin_document.jpg",
+        });
+      } catch (err) {
+        // Staged copy expired or evicted: send the recto we still hold instead
+        if (err.response?.status !== 404 || !imageRecto) throw err;
+        saveResponse = await axios.post(`${API_URL}/save`, {
+          data: finalData,
+          image_base64: imageRecto.split(",")[1],
+          filename: "cin_document.jpg",
+        });
+      }
 
       setSuccess(
         `✅ Document enregistré avec succès!${
@@ -300,9 +319,9 @@ export default function OrcPage() {
     setFacePhoto(null);
     setFacePhoto64("");
     setImageRecto(null);
+    setRectoFile(null);
     setImageVerso(null);
-    setImage64Recto("");
-    setImage64Verso("");
+    setUploadIdRecto("");
     setCurrentStep("recto");
     setError("");
     setSuccess("");
@@ -612,7 +631,8 @@ export default function OrcPage() {
               />
               <button
                 onClick={handleSkipVerso}
-                className="mt-4 w-full bg-gradient-to-r from-gray-600 to-gray-500 text-white py-3 rounded-xl hover:from-gray-700 hover:to-gray-600 font-medium shadow-sm"
+                disabled={loading}
+                className="mt-4 w-full bg-gradient-to-r from-gray-600 to-gray-500 text-white py-3 rounded-xl hover:from-gray-700 hover:to-gray-600 font-medium shadow-sm disabled:opacity-50"
               >
                 Passer sans verso (utiliser seulement le recto)
               </button>